@@ -0,0 +1,89 @@
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Kernels de agregação vetorizados (NumPy `bincount`) sobre códigos de grupo inteiros 0..n_grupos-1.
+# Códigos negativos (ex: valores em falta no `pd.factorize`) e valores NaN são ignorados, como no `groupby`.
+# Cada kernel devolve um array com uma posição por grupo (grupos sem linhas incluídos).
+
+
+# Códigos inteiros e categorias de uma coluna (ordenadas, para desempates estáveis)
+def codificar(valores, ordenar: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    codigos, categorias = pd.factorize(pd.Series(valores), sort=ordenar)
+    return codigos.astype(np.int64), np.asarray(categorias)
+
+
+def _numerico(valores) -> np.ndarray:
+    return pd.to_numeric(pd.Series(valores), errors="coerce").to_numpy(dtype=float)
+
+
+def contagem(codigos: np.ndarray, n_grupos: int) -> np.ndarray:
+    return np.bincount(codigos[codigos >= 0], minlength=n_grupos)
+
+
+# Nº de valores não nulos por grupo (equivalente ao "count" do pandas)
+def contagem_validos(codigos: np.ndarray, valores, n_grupos: int) -> np.ndarray:
+    valores = _numerico(valores)
+    return np.bincount(codigos[(codigos >= 0) & ~np.isnan(valores)], minlength=n_grupos)
+
+
+def soma(codigos: np.ndarray, valores, n_grupos: int) -> np.ndarray:
+    valores = _numerico(valores)
+    mask = (codigos >= 0) & ~np.isnan(valores)
+    return np.bincount(codigos[mask], weights=valores[mask], minlength=n_grupos)
+
+
+# Divisão elemento a elemento com `omissao` onde o denominador é 0 (ex: média = soma / contagem)
+def dividir(numerador, denominador, omissao: float = 0.0) -> np.ndarray:
+    numerador = np.asarray(numerador, dtype=float); denominador = np.asarray(denominador, dtype=float)
+    resultado = np.full(np.broadcast(numerador, denominador).shape, omissao, dtype=float)
+    np.divide(numerador, denominador, out=resultado, where=denominador > 0)
+    return resultado
+
+
+# Média por grupo (NaN nos grupos sem valores)
+def media(codigos: np.ndarray, valores, n_grupos: int) -> np.ndarray:
+    return dividir(soma(codigos, valores, n_grupos), contagem_validos(codigos, valores, n_grupos), omissao=np.nan)
+
+
+# Desvio-padrão amostral por grupo (NaN com menos de ddof + 1 valores), em duas passagens para estabilidade numérica
+def desvio_padrao(codigos: np.ndarray, valores, n_grupos: int, ddof: int = 1) -> np.ndarray:
+    valores = _numerico(valores)
+    mask = (codigos >= 0) & ~np.isnan(valores)
+    codigos, valores = codigos[mask], valores[mask]
+    n = np.bincount(codigos, minlength=n_grupos)
+    medias = dividir(np.bincount(codigos, weights=valores, minlength=n_grupos), n)
+    desvios2 = np.bincount(codigos, weights=(valores - medias[codigos]) ** 2, minlength=n_grupos)
+    return np.sqrt(dividir(desvios2, n - ddof, omissao=np.nan))
+
+
+# Desvio-padrão amostral a partir de acumuladores (contagem, soma, soma dos quadrados), que se somam entre grupos
+# sem perda: var = (Σx² − (Σx)²/n) / (n − ddof). NaN com menos de ddof + 1 valores; a diferença é limitada a 0
+# (arredondamentos quando todos os valores são iguais).
+def desvio_padrao_acumulado(n, soma_valores, soma_quadrados, ddof: int = 1) -> np.ndarray:
+    n = np.asarray(n, dtype=float); soma_valores = np.asarray(soma_valores, dtype=float)
+    desvios2 = np.maximum(np.asarray(soma_quadrados, dtype=float) - soma_valores * dividir(soma_valores, n), 0.0)
+    return np.sqrt(dividir(desvios2, n - ddof, omissao=np.nan))
+
+
+# Moda por grupo: código da categoria mais frequente (a de menor código em caso de empate; -1 nos grupos vazios).
+# Contagem conjunta (grupo, categoria) num só `bincount` 2-D seguida de `argmax` por linha.
+def moda(codigos: np.ndarray, codigos_categoria: np.ndarray, n_grupos: int, n_categorias: int) -> np.ndarray:
+    if n_categorias == 0:
+        return np.full(n_grupos, -1, dtype=np.int64)
+    mask = (codigos >= 0) & (codigos_categoria >= 0)
+    conjunta = np.bincount(codigos[mask] * n_categorias + codigos_categoria[mask], minlength=n_grupos * n_categorias)
+    conjunta = conjunta.reshape(n_grupos, n_categorias)
+    return np.where(conjunta.any(axis=1), conjunta.argmax(axis=1), -1)
+
+
+# Categoria predominante (moda) de `coluna` por valor de `chave`, ex: tipo, tipo de causa ou família de causa
+# por distrito/concelho. Índice ordenado como o do `groupby(chave)`; empates resolvidos pela menor categoria
+# (como `Series.mode()[0]`) e grupos só com valores em falta ficam com `omissao`.
+def predominante(df: pd.DataFrame, chave: str, coluna: str, omissao: str = "desconhecido") -> pd.Series:
+    codigos, grupos = codificar(df[chave])
+    codigos_categoria, categorias = codificar(df[coluna])
+    modas = moda(codigos, codigos_categoria, len(grupos), len(categorias))
+    rotulos = np.append(np.asarray(categorias, dtype=object), omissao) # código -1 (grupo sem moda) -> `omissao`
+    return pd.Series(rotulos[modas], index=pd.Index(grupos, name=chave), name=coluna)
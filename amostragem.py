@@ -0,0 +1,101 @@
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+# Redução de séries/pontos para um orçamento fixo antes de os enviar ao browser.
+
+# constantes
+N_CELULAS_AMOSTRA = 24 # células por eixo da grelha de densidade da amostra estratificada
+FATOR_OUTLIER = 1.5 # outliers: fora de [Q1 - 1,5 × IQR, Q3 + 1,5 × IQR] (critério de Tukey, como nos bigodes do boxplot)
+
+
+# Largest-Triangle-Three-Buckets (Steinarsson, 2013): índices de `n_pontos` pontos que preservam a forma da série.
+# O primeiro e o último ponto ficam sempre; o interior é dividido em `n_pontos - 2` grupos consecutivos e de cada um
+# fica o ponto que forma o triângulo de maior área com o ponto já escolhido e a média do grupo seguinte
+# (mantém picos e vales, ao contrário de uma média ou de uma amostra a cada k pontos).
+# `x` tem de estar ordenado; devolve todos os índices se a série já couber no orçamento.
+def lttb(x, y, n_pontos: int) -> np.ndarray:
+    x = np.asarray(x, dtype=float); y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_pontos >= n or n_pontos < 3:
+        return np.arange(n)
+    limites = 1 + np.arange(n_pontos - 1) * (n - 2) // (n_pontos - 2) # limites dos grupos interiores [1, n - 1), em inteiros exatos
+    indices = np.empty(n_pontos, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_pontos - 2):
+        ini, fim = limites[i], limites[i + 1]
+        seguinte_fim = limites[i + 2] if i + 2 < len(limites) else n # último grupo: o "seguinte" é o último ponto
+        mx, my = x[fim:seguinte_fim].mean(), y[fim:seguinte_fim].mean()
+        areas = np.abs((x[a] - mx) * (y[ini:fim] - y[a]) - (x[a] - x[ini:fim]) * (my - y[a]))
+        a = ini + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+# Pontos que a amostra nunca perde: o mínimo e o máximo de cada coluna em cada estrato e os outliers de cada coluna,
+# no máximo `n_max`. Primeiro os extremos e depois os outliers; dentro de cada um, os mais afastados da mediana (em IQRs).
+def _obrigatorios(colunas: Sequence[np.ndarray], estratos: np.ndarray, n_max: int) -> np.ndarray:
+    extremos = set()
+    afastamento = np.zeros(len(estratos)); outlier = np.zeros(len(estratos), dtype=bool)
+    for valores in colunas:
+        por_estrato = pd.Series(valores).groupby(estratos)
+        extremos.update(por_estrato.idxmin().dropna().astype(np.int64)); extremos.update(por_estrato.idxmax().dropna().astype(np.int64))
+        q1, mediana, q3 = np.nanquantile(valores, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        if iqr > 0:
+            outlier |= (valores < q1 - FATOR_OUTLIER * iqr) | (valores > q3 + FATOR_OUTLIER * iqr)
+            afastamento = np.fmax(afastamento, np.abs(valores - mediana) / iqr)
+    extremos = np.fromiter(extremos, dtype=np.int64)
+    outliers = np.setdiff1d(np.flatnonzero(outlier), extremos)
+    por_afastamento = lambda indices: indices[np.argsort(-afastamento[indices], kind="stable")]
+    escolhidos = np.concatenate([por_afastamento(extremos), por_afastamento(outliers)])[:max(n_max, 0)]
+    return np.unique(escolhidos)
+
+
+# Amostra estratificada e sensível à densidade de uma nuvem de pontos: índices (ordenados) de no máximo `n_pontos` pontos.
+# Os pontos são agrupados por estrato (ex: tipo × classe de vento) e por célula de uma grelha sobre as duas primeiras
+# colunas (ex: temperatura × humidade); cada grupo com c pontos fica com min(c, ⌈λ·√c⌉), com λ ajustado ao orçamento:
+# as zonas densas são reduzidas mais do que as esparsas (as caudas ficam quase inteiras) sem inverter a ordem das densidades.
+# Se houver mais grupos do que orçamento (λ iria a 0 e não ficaria nenhum), cada grupo sorteado fica com um ponto,
+# com probabilidade proporcional ao seu tamanho. Extremos e outliers de todas as colunas entram até metade do orçamento
+# (`_obrigatorios`). Dentro de cada grupo a escolha é aleatória, com semente fixa (a mesma seleção dá sempre a mesma
+# amostra). Devolve todos os índices se os pontos já couberem.
+def amostra_estratificada(colunas: Sequence[np.ndarray], estratos: np.ndarray, n_pontos: int,
+                          n_celulas: int = N_CELULAS_AMOSTRA, semente: int = 0) -> np.ndarray:
+    colunas = [np.asarray(c, dtype=float) for c in colunas]; estratos = np.asarray(estratos, dtype=np.int64)
+    n = len(estratos)
+    if n <= n_pontos:
+        return np.arange(n)
+    obrigatorios = _obrigatorios(colunas, estratos, n_pontos // 2)
+
+    celula = np.zeros(n, dtype=np.int64)
+    for valores in colunas[:2]: # célula da grelha (NaN -> célula 0)
+        minimo, maximo = np.nanmin(valores), np.nanmax(valores)
+        passo = (maximo - minimo) / n_celulas if maximo > minimo else 1.0
+        celula = celula * n_celulas + np.nan_to_num(np.clip((valores - minimo) // passo, 0, n_celulas - 1)).astype(np.int64)
+    livres = np.ones(n, dtype=bool); livres[obrigatorios] = False
+    grupos, contagens = np.unique((estratos * n_celulas ** 2 + celula)[livres], return_inverse=True, return_counts=True)[1:]
+
+    orcamento = n_pontos - len(obrigatorios)
+    rng = np.random.default_rng(semente)
+    if len(contagens) > orcamento: # qualquer λ > 0 já daria um ponto a cada grupo: sorteiam-se os grupos
+        quotas = np.zeros(len(contagens), dtype=np.int64)
+        quotas[rng.choice(len(contagens), size=orcamento, replace=False, p=contagens / contagens.sum())] = 1
+    else: # λ por bisseção: o nº de pontos escolhidos cresce com λ
+        raiz = np.sqrt(contagens)
+        quota = lambda lam: np.minimum(contagens, np.ceil(lam * raiz)).astype(np.int64)
+        baixo, alto = 0.0, float(raiz.max())
+        for _ in range(40):
+            meio = (baixo + alto) / 2
+            baixo, alto = (meio, alto) if quota(meio).sum() <= orcamento else (baixo, meio)
+        quotas = quota(baixo)
+
+    # ordem aleatória dentro de cada grupo; ficam as primeiras `quota` posições de cada um
+    indices_livres = np.flatnonzero(livres)
+    ordem = np.lexsort((rng.random(len(indices_livres)), grupos))
+    inicio_grupo = np.r_[0, np.cumsum(contagens)[:-1]]
+    posicao = np.arange(len(ordem)) - inicio_grupo[grupos[ordem]]
+    escolhidos = indices_livres[ordem[posicao < quotas[grupos[ordem]]]]
+    return np.union1d(obrigatorios, escolhidos)
@@ -0,0 +1,54 @@
+// Clique no calendário diário: o mês do dia clicado passa para o filtro de mês e o mapa meteo salta para o frame desse dia.
+// O frame já vem na animação do mapa (um por dia, com o nome do dia): basta esperar que o mapa do mês chegue e animar até ele.
+(function () {
+    const INTERVALO_MS = 200;
+    const MAX_TENTATIVAS = 75; // ~15 s à espera do mapa do mês
+    let geracao = 0;
+
+    // Div do plotly dentro do dcc.Graph do mapa meteo, se já tiver a figura do (ano, mês) pedido e o frame do dia
+    function mapaPronto(ano, mes, dia) {
+        const contentor = document.getElementById("g-meteo-map");
+        const gd = contentor && (contentor.classList.contains("js-plotly-plot") ? contentor : contentor.querySelector(".js-plotly-plot"));
+        if (!gd || !gd.layout || String(gd.layout.uirevision || "").indexOf("-" + ano + "-" + mes + "-") < 0) {
+            return null;
+        }
+        const frames = gd._transitionData && gd._transitionData._frameHash;
+        return frames && frames[String(dia)] ? gd : null;
+    }
+
+    window.dash_clientside = window.dash_clientside || {};
+    window.dash_clientside.cronofogo = Object.assign({}, window.dash_clientside.cronofogo, {
+        saltar_para_dia: function (clickData, ano) {
+            const ponto = clickData && clickData.points && clickData.points[0];
+            if (!ponto || !ponto.customdata || !ponto.customdata[0]) {
+                return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+            }
+            const mes = ponto.customdata[0], dia = ponto.customdata[1];
+            return [mes, {ano: ano, mes: mes, dia: dia}];
+        },
+        animar_dia: function (pedido) {
+            if (!pedido) {
+                return window.dash_clientside.no_update;
+            }
+            const minha = ++geracao; // um clique mais recente cancela a espera deste
+            return new Promise(function (resolver) {
+                let tentativas = 0;
+                (function tentar() {
+                    if (minha !== geracao) {
+                        return resolver(window.dash_clientside.no_update);
+                    }
+                    const gd = mapaPronto(pedido.ano, pedido.mes, pedido.dia);
+                    if (gd) {
+                        window.Plotly.animate(gd, [String(pedido.dia)],
+                            {mode: "immediate", frame: {duration: 0, redraw: true}, transition: {duration: 0}});
+                        return resolver(null);
+                    }
+                    if (++tentativas >= MAX_TENTATIVAS) { // dia sem dados meteo (sem frame) ou mapa sem animação
+                        return resolver(null);
+                    }
+                    setTimeout(tentar, INTERVALO_MS);
+                })();
+            });
+        },
+    });
+})();
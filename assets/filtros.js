@@ -0,0 +1,24 @@
+// Atraso (debounce) dos filtros de ano e mês: cada mudança adia a atualização do store correspondente;
+// se entretanto houver outra mudança, a anterior é descartada e só a última chega às callbacks do servidor.
+(function () {
+    const geracoes = {};
+
+    function adiar(chave, valor, atrasoMs) {
+        const geracao = (geracoes[chave] || 0) + 1;
+        geracoes[chave] = geracao;
+        if (!atrasoMs) {
+            return valor;
+        }
+        return new Promise(function (resolver) {
+            setTimeout(function () {
+                resolver(geracoes[chave] === geracao ? valor : window.dash_clientside.no_update);
+            }, atrasoMs);
+        });
+    }
+
+    window.dash_clientside = window.dash_clientside || {};
+    window.dash_clientside.cronofogo = Object.assign({}, window.dash_clientside.cronofogo, {
+        adiar_ano: function (valor, atrasoMs) { return adiar("ano", valor, atrasoMs); },
+        adiar_mes: function (valor, atrasoMs) { return adiar("mes", valor, atrasoMs); },
+    });
+})();
@@ -0,0 +1,44 @@
+// Hover compacto: as colunas de texto do customdata chegam como códigos inteiros e os rótulos de cada uma
+// uma só vez em layout.meta.rotulos (índice da coluna -> rótulos); aqui os códigos são trocados pelos rótulos,
+// em todos os traços e frames da animação, antes de o hover (e o clique) os usarem.
+(function () {
+    function resolverTracos(tracos, rotulos) {
+        const colunas = Object.keys(rotulos);
+        return (tracos || []).map(function (traco) {
+            if (!Array.isArray(traco.customdata)) {
+                return traco;
+            }
+            const customdata = traco.customdata.map(function (linha) {
+                const nova = linha.slice();
+                colunas.forEach(function (coluna) {
+                    const rotulo = rotulos[coluna][nova[coluna]];
+                    nova[coluna] = rotulo === undefined ? "n/a" : rotulo;
+                });
+                return nova;
+            });
+            return Object.assign({}, traco, { customdata: customdata });
+        });
+    }
+
+    function resolverRotulos(figura) {
+        const meta = figura && figura.layout && figura.layout.meta;
+        if (!meta || !meta.rotulos || meta.rotulos_resolvidos) {
+            return window.dash_clientside.no_update;
+        }
+        const resolvida = Object.assign({}, figura, {
+            data: resolverTracos(figura.data, meta.rotulos),
+            layout: Object.assign({}, figura.layout, { meta: Object.assign({}, meta, { rotulos_resolvidos: true }) }),
+        });
+        if (figura.frames) {
+            resolvida.frames = figura.frames.map(function (frame) {
+                return Object.assign({}, frame, { data: resolverTracos(frame.data, meta.rotulos) });
+            });
+        }
+        return resolvida;
+    }
+
+    window.dash_clientside = window.dash_clientside || {};
+    window.dash_clientside.cronofogo = Object.assign({}, window.dash_clientside.cronofogo, {
+        resolver_rotulos: resolverRotulos,
+    });
+})();
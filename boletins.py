@@ -0,0 +1,123 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import plotly.io as pio
+
+# Só a camada de dados e as figuras: o layout e o servidor Dash não são construídos
+import dados
+from figuras import (METEO_LABELS_MAP, fig_mapa, fig_meteo_map, fig_pie_causas, fig_relacao_metricas,
+                     fig_violin_distribution)
+
+# constantes
+BOLETINS_DIR = Path(__file__).resolve().parent / "boletins"
+FORMATOS_IMAGEM = ["png", "pdf", "svg"]
+ESCALA_IMAGEM = 2 # fator de resolução das imagens PNG
+DIMENSOES_FIGURA: Dict[str, tuple] = { # largura x altura (px) de cada figura do boletim
+    "mapa": (700, 600), "relacao": (900, 350), "causas": (600, 400), "violino": (700, 400), "meteo": (700, 650),
+}
+
+
+def _nome_ficheiro(texto: str) -> str:
+    return str(texto).replace(" ", "_").replace("/", "-")
+
+
+# Inicialização de cada processo: arranca o motor de renderização uma vez e reutiliza-o em todas as figuras.
+# (o kaleido mantém o browser headless vivo entre chamadas; o primeiro `to_image` é o mais lento)
+def _iniciar_renderizador() -> None:
+    try:
+        import kaleido
+    except ImportError as erro:
+        raise SystemExit("O kaleido é necessário para exportar imagens: pip install kaleido") from erro
+    arrancar = getattr(kaleido, "start_sync_server", None) # kaleido >= 1.0
+    if arrancar is not None:
+        arrancar(silence_warnings=True)
+    pio.to_image({"data": [], "layout": {}}, format="png", width=10, height=10)
+
+
+# Grava uma figura; uma falha (ex: mosaicos do mapa base inacessíveis) é reportada sem parar o lote
+def _gravar(fig, destino: Path, formato: str, dimensoes: tuple) -> Optional[Path]:
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    caminho = destino.with_suffix(f".{formato}")
+    largura, altura = dimensoes
+    fig.update_layout(width=largura, height=altura)
+    try:
+        pio.write_image(fig, caminho, format=formato, width=largura, height=altura, scale=ESCALA_IMAGEM if formato == "png" else 1)
+    except ValueError as erro:
+        print(f"Falha ao gerar {caminho}: {erro}", flush=True)
+        return None
+    return caminho
+
+
+# Tarefa de um mês: a fatia (ano, mês) é filtrada uma vez e dividida por distrito numa só passagem;
+# o mapa nacional é igual para todos os distritos e é renderizado uma única vez.
+def renderizar_mes(ano: int, mes_val: int, distritos: Sequence[str], destino: Path, formato: str,
+                   metrica: str, variavel_meteo: Optional[str]) -> List[Optional[Path]]:
+    df_mes = dados.fatia_ano_mes(ano, mes_val)
+    pasta_mes = destino / str(ano) / f"{mes_val:02d}"
+    gerados = [_gravar(fig_mapa(df_mes, metrica, ano, mes_val, False, "DISTRITO"), pasta_mes / "mapa", formato, DIMENSOES_FIGURA["mapa"])]
+
+    por_distrito = dict(tuple(df_mes.groupby("DISTRITO", sort=False)))
+    for distrito in distritos:
+        df_dist = por_distrito.get(distrito, df_mes.iloc[0:0])
+        nome = f"distrito de {distrito}"
+        pasta = pasta_mes / _nome_ficheiro(distrito)
+        gerados.append(_gravar(fig_pie_causas(df_dist, metrica, nome, ano, mes_val), pasta / "causas", formato, DIMENSOES_FIGURA["causas"]))
+        gerados.append(_gravar(fig_violin_distribution(df_dist, nome, ano, mes_val), pasta / "violino", formato, DIMENSOES_FIGURA["violino"]))
+        if variavel_meteo: # o mapa meteorológico filtra pelo distrito; recebe já a fatia do distrito
+            fig = fig_meteo_map(df_dist, variavel_meteo, distrito, "Todos", ano, mes_val)
+            gerados.append(_gravar(fig, pasta / f"meteo_{variavel_meteo.lower()}", formato, DIMENSOES_FIGURA["meteo"]))
+    return gerados
+
+
+# Tarefa de um ano: o gráfico de relação mostra os 12 meses, por isso é um por distrito e ano (e não por mês)
+def renderizar_ano(ano: int, distritos: Sequence[str], destino: Path, formato: str) -> List[Optional[Path]]:
+    mensal = dados.FEATURES.consultar("mensal", ano=ano)
+    por_distrito = dict(tuple(mensal.groupby("DISTRITO", sort=False)))
+    gerados = []
+    for distrito in distritos:
+        fig = fig_relacao_metricas(por_distrito.get(distrito, mensal.iloc[0:0]), ano, f"Distrito de {distrito}")
+        gerados.append(_gravar(fig, destino / str(ano) / "anual" / _nome_ficheiro(distrito) / "relacao", formato, DIMENSOES_FIGURA["relacao"]))
+    return gerados
+
+
+# Gera todas as combinações distrito x mês em processos paralelos e devolve os ficheiros criados
+def gerar_boletins(anos: Sequence[int], meses: Sequence[int], distritos: Sequence[str], destino: Path = BOLETINS_DIR,
+                   formato: str = "png", metrica: str = "NUM_INCENDIOS", variavel_meteo: Optional[str] = "TEMPERATURA",
+                   processos: Optional[int] = None) -> List[Path]:
+    gerados: List[Path] = []
+    # Carrega os dados e as agregações neste processo; com `fork` os trabalhadores herdam-nos sem os voltar a ler
+    dados.FEATURES.get("mensal")
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_renderizador) as executor:
+        tarefas = [executor.submit(renderizar_ano, ano, distritos, destino, formato) for ano in anos]
+        tarefas += [executor.submit(renderizar_mes, ano, mes, distritos, destino, formato, metrica, variavel_meteo)
+                    for ano in anos for mes in meses]
+        for i, tarefa in enumerate(as_completed(tarefas), start=1):
+            gerados.extend(c for c in tarefa.result() if c is not None)
+            print(f"[{i}/{len(tarefas)}] {len(gerados)} figuras", flush=True)
+    return gerados
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Gera as figuras dos boletins (distrito x mês) sem arrancar o dashboard.")
+    parser.add_argument("--anos", type=int, nargs="+", default=[dados.ANOS[-1]] if dados.ANOS else [], help="anos a gerar (por omissão, o último)")
+    parser.add_argument("--meses", type=int, nargs="+", default=list(range(1, 13)), choices=range(1, 13), metavar="MES")
+    parser.add_argument("--distritos", nargs="+", default=[d for d in dados.DISTRITOS if d != "Todos"], help="por omissão, todos")
+    parser.add_argument("--formato", choices=FORMATOS_IMAGEM, default="png")
+    parser.add_argument("--metrica", choices=["NUM_INCENDIOS", "AREA_ARDIDA", "DURACAO_MEDIA"], default="NUM_INCENDIOS")
+    parser.add_argument("--meteo", choices=[*METEO_LABELS_MAP, "nenhuma"], default="TEMPERATURA", help="variável do mapa meteorológico")
+    parser.add_argument("--destino", type=Path, default=BOLETINS_DIR)
+    parser.add_argument("--processos", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    gerados = gerar_boletins(args.anos, args.meses, args.distritos, args.destino, args.formato, args.metrica,
+                             None if args.meteo == "nenhuma" else args.meteo, args.processos)
+    print(f"{len(gerados)} figuras em {args.destino} ({time.perf_counter() - inicio:.0f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import codificar, dividir
+
+# constantes
+N_DIAS = 366 # posições por ano (dia do ano 0..365); fora dos anos bissextos a última fica a zero
+MEDIDAS = ["NUM_INCENDIOS", "AREA_ARDIDA_TOTAL", "DURACAO_SOMA_MIN", "DURACAO_CONTAGEM_VALIDA"]
+
+
+# Calendário diário denso por local, a partir da agregação diária da feature store: para cada granularidade,
+# um array (medida, local, ano, dia do ano) construído no primeiro pedido; o país tem o seu próprio array.
+# O calendário de um ano e local é uma fatia desse array (sem filtrar nem agrupar a cada pedido).
+# float32: metade da memória (o calendário dos concelhos tem ~300 locais × anos × 366 dias × 4 medidas).
+class CalendarioIncendios:
+    def __init__(self, diario: pd.DataFrame):
+        datas = pd.to_datetime(pd.DataFrame({"year": diario["ANO"], "month": diario["MES"], "day": diario["DIA"]}), errors="coerce")
+        validos = datas.notna().to_numpy()
+        self._diario = diario.loc[validos]
+        self.anos = sorted(int(ano) for ano in self._diario["ANO"].unique())
+        self._dia = datas[validos].dt.dayofyear.to_numpy(dtype=np.int64) - 1
+        self._i_ano = np.searchsorted(self.anos, self._diario["ANO"].to_numpy(dtype=np.int64))
+        self._grelhas: Dict[str, Tuple[np.ndarray, Dict[str, int]]] = {}
+        self._pais = self._somar(np.zeros(len(self._dia), dtype=np.int64), 1)[:, 0]
+
+    # Soma de cada medida por célula (local, ano, dia) com `bincount`
+    def _somar(self, codigos: np.ndarray, n_locais: int) -> np.ndarray:
+        mask = codigos >= 0
+        celula = ((codigos * len(self.anos) + self._i_ano) * N_DIAS + self._dia)[mask]
+        n_celulas = n_locais * len(self.anos) * N_DIAS
+        return np.stack([np.bincount(celula, weights=self._diario[m].to_numpy(dtype=float)[mask], minlength=n_celulas)
+                         for m in MEDIDAS]).astype(np.float32).reshape(len(MEDIDAS), n_locais, len(self.anos), N_DIAS)
+
+    def _grelha(self, granularity: str) -> Tuple[np.ndarray, Dict[str, int]]:
+        if granularity not in self._grelhas:
+            codigos, locais = codificar(self._diario[granularity].to_numpy())
+            self._grelhas[granularity] = (self._somar(codigos, len(locais)), {str(l).lower(): i for i, l in enumerate(locais)})
+        return self._grelhas[granularity]
+
+    # Medidas diárias (medida -> array com um valor por dia do ano) de um ano, para os filtros do dashboard:
+    # concelho (prioritário), distrito ou o país ("Todos"). Anos ou locais sem incêndios dão zeros.
+    def medidas(self, ano: int, sel_dist: str = "Todos", sel_conc: str = "Todos") -> Dict[str, np.ndarray]:
+        n_dias = 366 if pd.Timestamp(int(ano), 1, 1).is_leap_year else 365
+        i_ano = np.searchsorted(self.anos, int(ano))
+        if i_ano >= len(self.anos) or self.anos[i_ano] != int(ano):
+            return {m: np.zeros(n_dias) for m in MEDIDAS}
+        if sel_conc != "Todos" or sel_dist != "Todos":
+            granularity, local = ("CONCELHO", sel_conc) if sel_conc != "Todos" else ("DISTRITO", sel_dist)
+            grelha, indices = self._grelha(granularity)
+            if str(local).lower() not in indices:
+                return {m: np.zeros(n_dias) for m in MEDIDAS}
+            valores = grelha[:, indices[str(local).lower()], i_ano, :n_dias]
+        else:
+            valores = self._pais[:, i_ano, :n_dias]
+        return {m: valores[i].astype(float) for i, m in enumerate(MEDIDAS)}
+
+    # Valor diário da métrica do dashboard: nº de incêndios, área ardida ou duração média em horas (NaN sem durações)
+    def valores(self, ano: int, metric: str, sel_dist: str = "Todos", sel_conc: str = "Todos") -> np.ndarray:
+        medidas = self.medidas(ano, sel_dist, sel_conc)
+        if metric == "AREA_ARDIDA":
+            return medidas["AREA_ARDIDA_TOTAL"]
+        if metric == "DURACAO_MEDIA":
+            return dividir(medidas["DURACAO_SOMA_MIN"], medidas["DURACAO_CONTAGEM_VALIDA"], omissao=np.nan) / 60
+        return medidas["NUM_INCENDIOS"]
+
+
+# Datas (dd/mm/aaaa) de cada dia de um ano, para o hover do calendário
+def datas_do_ano(ano: int) -> List[str]:
+    return list(pd.date_range(f"{int(ano)}-01-01", f"{int(ano)}-12-31", freq="D").strftime("%d/%m/%Y"))
@@ -0,0 +1,109 @@
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import codificar
+from execucao import CacheLRU
+
+# constantes
+MAX_LINHAS_CACHE = 32 # linhas temporais (ano, mês) guardadas em memória
+COLUNAS_LINHA = ["DHINICIO", "DHFIM", "DISTRITO", "CONCELHO"] # colunas lidas de cada fatia
+
+
+# Intervalos [início, fim) válidos (ambas as datas e fim depois do início), em nanossegundos
+def intervalos(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    inicio = df["DHINICIO"].to_numpy(dtype="datetime64[ns]")
+    fim = df["DHFIM"].to_numpy(dtype="datetime64[ns]")
+    validos = ~np.isnat(inicio) & ~np.isnat(fim) & (fim > inicio)
+    return inicio[validos].astype(np.int64), fim[validos].astype(np.int64), validos
+
+
+# Varrimento (sweep line): cada incêndio gera +1 no início e -1 no fim; com os eventos ordenados por tempo
+# a soma acumulada é o nº de incêndios ativos após cada evento. No mesmo instante os fins vêm antes dos inícios
+# (um incêndio que termina quando outro começa não conta como simultâneo).
+# Com `codigos` (ex: distrito) os eventos são ordenados primeiro por grupo; como cada grupo soma zero,
+# a mesma soma acumulada dá os ativos de cada grupo. O(n log n) pela ordenação.
+def varrer(inicio: np.ndarray, fim: np.ndarray, codigos: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    tempos = np.concatenate([inicio, fim])
+    deltas = np.concatenate([np.ones(len(inicio), dtype=np.int64), -np.ones(len(fim), dtype=np.int64)])
+    grupos = np.zeros(len(tempos), dtype=np.int64) if codigos is None else np.concatenate([codigos, codigos])
+    ordem = np.lexsort((deltas, tempos, grupos))
+    return tempos[ordem], np.cumsum(deltas[ordem]), grupos[ordem]
+
+
+# Linha temporal dos incêndios ativos de uma fatia (ano, mês): intervalos válidos, locais codificados e a linha nacional.
+# Construída uma vez por fatia; a linha de um distrito/concelho e os picos por local só ordenam os eventos desse subconjunto.
+class LinhaConcorrencia:
+    def __init__(self, df: pd.DataFrame):
+        inicio, fim, validos = intervalos(df)
+        self.n_incendios, self.n_ignorados = int(validos.sum()), int((~validos).sum())
+        self._inicio, self._fim = inicio, fim
+        self._locais: Dict[str, Tuple[np.ndarray, np.ndarray]] = { # códigos e nomes do local de cada intervalo
+            coluna: codificar(df[coluna].to_numpy()[validos]) for coluna in ("DISTRITO", "CONCELHO")}
+        self._tempos, self._ativos, _ = varrer(inicio, fim) # linha nacional, a mais pedida
+
+    # Máscara dos intervalos de um local (comparação sem maiúsculas, como nos filtros do dashboard)
+    def _mascara(self, coluna: str, valor: str) -> np.ndarray:
+        codigos, categorias = self._locais[coluna]
+        return np.isin(codigos, np.flatnonzero(pd.Series(categorias, dtype=object).str.lower() == str(valor).lower()))
+
+    # Nº de ativos após cada instante com eventos (o último evento de cada instante), para um local opcional
+    def linha(self, coluna: Optional[str] = None, valor: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if coluna is None:
+            tempos, ativos = self._tempos, self._ativos
+        else:
+            mask = self._mascara(coluna, valor)
+            tempos, ativos, _ = varrer(self._inicio[mask], self._fim[mask])
+        ultimo = np.r_[tempos[1:] != tempos[:-1], True] if len(tempos) else np.zeros(0, dtype=bool)
+        return tempos[ultimo].astype("datetime64[ns]"), ativos[ultimo]
+
+    # Pico de incêndios simultâneos por local (e o primeiro instante em que foi atingido), por ordem decrescente
+    def picos(self, coluna: str = "DISTRITO", dentro: Optional[Tuple[str, str]] = None) -> pd.DataFrame:
+        codigos, categorias = self._locais[coluna]
+        mask = codigos >= 0
+        if dentro is not None: # ex: concelhos de um distrito
+            mask &= self._mascara(*dentro)
+        tempos, ativos, grupos = varrer(self._inicio[mask], self._fim[mask], codigos[mask])
+        if not len(tempos):
+            return pd.DataFrame({coluna: [], "PICO_ATIVOS": [], "PICO_EM": pd.to_datetime([])})
+        inicios_grupo = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+        picos = np.maximum.reduceat(ativos, inicios_grupo)
+        id_grupo = np.repeat(np.arange(len(inicios_grupo)), np.diff(np.r_[inicios_grupo, len(ativos)]))
+        posicoes = np.flatnonzero(ativos == picos[id_grupo]) # eventos em que cada grupo está no seu pico
+        posicao_pico = posicoes[np.unique(id_grupo[posicoes], return_index=True)[1]] # o primeiro de cada grupo
+        resultado = pd.DataFrame({coluna: categorias[grupos[inicios_grupo]], "PICO_ATIVOS": picos,
+                                  "PICO_EM": tempos[posicao_pico].astype("datetime64[ns]")})
+        return resultado.sort_values(["PICO_ATIVOS", coluna], ascending=[False, True], ignore_index=True)
+
+    # Linha e picos para os filtros do dashboard: país -> picos por distrito; distrito ou concelho -> picos por concelho
+    def para_local(self, sel_dist: str = "Todos", sel_conc: str = "Todos") -> Tuple[np.ndarray, np.ndarray, pd.DataFrame]:
+        if sel_conc != "Todos":
+            return (*self.linha("CONCELHO", sel_conc), self.picos("CONCELHO", dentro=("CONCELHO", sel_conc)))
+        if sel_dist != "Todos":
+            return (*self.linha("DISTRITO", sel_dist), self.picos("CONCELHO", dentro=("DISTRITO", sel_dist)))
+        return (*self.linha(), self.picos("DISTRITO"))
+
+
+# Linhas temporais por (ano, mês; 0 = todos os meses), construídas no primeiro pedido de cada fatia
+# e guardadas numa cache LRU (o pico da época de 2017 não volta a ordenar os eventos a cada pedido).
+# Com `motor` (`consultas_sql.MotorSQL`) cada fatia é lida dos ficheiros Parquet, só com as colunas necessárias.
+class ConcorrenciaIncendios:
+    def __init__(self, df: Optional[pd.DataFrame] = None, max_linhas: int = MAX_LINHAS_CACHE, motor: Optional[Any] = None):
+        self._df = df
+        self._motor = motor
+        self._linhas = CacheLRU(max_linhas)
+
+    def _fatia(self, ano: int, mes_val: int) -> pd.DataFrame:
+        if self._motor is not None:
+            return self._motor.fatia(ano, mes_val, colunas=COLUNAS_LINHA)
+        fatia = self._df[self._df["ANO"] == ano]
+        return fatia[fatia["MES"] == mes_val] if mes_val else fatia
+
+    def get(self, ano: int, mes_val: int = 0) -> LinhaConcorrencia:
+        chave = (int(ano), int(mes_val))
+        linha = self._linhas.obter(chave)
+        if linha is None:
+            linha = LinhaConcorrencia(self._fatia(*chave))
+            self._linhas.guardar(chave, linha)
+        return linha
@@ -0,0 +1,210 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+from exportacao import PADRAO_FICHEIROS_ANO, impressoes_guardadas
+from feature_store import FREQUENCIAS, GEO_KEYS, METEO_COLS
+from map_lod import CHAVES_LOD, coluna_tipo
+
+# DuckDB é opcional: sem ele (ou com o backend "pandas") os filtros e agregações correm sobre o DF em memória
+try:
+    import duckdb
+    DUCKDB_DISPONIVEL = True
+except ImportError:
+    DUCKDB_DISPONIVEL = False
+
+# constantes
+BACKEND = os.environ.get("CRONOFOGO_BACKEND", "pandas").lower() # "duckdb" ativa o motor SQL sobre os ficheiros Parquet
+MAX_LIGACOES = int(os.environ.get("CRONOFOGO_LIGACOES_SQL", 4)) # ligações (cursores) DuckDB por processo
+GRANULARIDADES = ["DISTRITO", "CONCELHO"]
+# Chaves temporais das agregações da feature store como expressões SQL (mesmas conversões que `agregar_frequencia`)
+EXPRESSOES_CHAVE = {"ANO": "ANO", "MES": "MES", "DIA": "CAST(trunc(DIA) AS BIGINT)",
+                    "HORA": "least(greatest(CAST(trunc(HORA) AS BIGINT), 0), 23)"}
+COLUNAS_TIPO = {"Florestal": "FLORESTAL", "Agrícola": "AGRICOLA", "Urbano": "URBANO", "Desconhecido": "DESCONHECIDO"}
+
+
+def backend_sql_ativo() -> bool:
+    return BACKEND == "duckdb" and DUCKDB_DISPONIVEL
+
+
+# Condições WHERE (e parâmetros) dos filtros do dashboard; o concelho tem prioridade sobre o distrito
+def _filtros(ano: int, mes_val: int = 0, sel_dist: str = "Todos", sel_conc: str = "Todos",
+             viewport: Optional[Dict[str, Any]] = None) -> tuple:
+    condicoes, parametros = ["ANO = ?"], [int(ano)]
+    if mes_val:
+        condicoes.append("MES = ?"); parametros.append(int(mes_val))
+    if sel_conc != "Todos":
+        condicoes.append("lower(CONCELHO) = lower(?)"); parametros.append(sel_conc)
+    elif sel_dist != "Todos":
+        condicoes.append("lower(DISTRITO) = lower(?)"); parametros.append(sel_dist)
+    if viewport is not None and "lat_min" in viewport:
+        condicoes.append("LAT BETWEEN ? AND ? AND LON BETWEEN ? AND ?")
+        parametros += [viewport["lat_min"], viewport["lat_max"], viewport["lon_min"], viewport["lon_max"]]
+    return " AND ".join(condicoes), parametros
+
+
+# Motor SQL embebido (DuckDB) sobre o armazém Parquet dos incêndios.
+# Os filtros seguem para a leitura dos ficheiros (só os anos/grupos de linhas que os cumprem são lidos)
+# e as agregações devolvem só o resultado agregado, sem carregar o DF completo em memória.
+# Cada thread usa um cursor do conjunto; depois de um `fork` (processos do ExecutorFiguras) as ligações são recriadas.
+class MotorSQL:
+    def __init__(self, pasta: Path, max_ligacoes: int = MAX_LIGACOES):
+        self._pasta = Path(pasta)
+        self._max_ligacoes = max_ligacoes
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._base = None
+        self._livres: "queue.Queue" = queue.Queue()
+        self._colunas: List[str] = []
+
+    def _abrir(self) -> None:
+        base = duckdb.connect(":memory:")
+        ficheiros = (self._pasta / PADRAO_FICHEIROS_ANO).as_posix().replace("'", "''")
+        base.execute(f"CREATE VIEW incendios AS SELECT * FROM read_parquet('{ficheiros}', union_by_name = true)")
+        self._colunas = [linha[0] for linha in base.execute("DESCRIBE incendios").fetchall()]
+        self._livres = queue.Queue()
+        for _ in range(self._max_ligacoes):
+            self._livres.put(base.cursor())
+        self._base, self._pid = base, os.getpid()
+
+    @contextmanager
+    def _ligacao(self) -> Iterator[Any]:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._abrir()
+            livres = self._livres
+        cursor = livres.get()
+        try:
+            yield cursor
+        finally:
+            livres.put(cursor)
+
+    def consultar(self, sql: str, parametros: Sequence[Any] = ()) -> pd.DataFrame:
+        with self._ligacao() as cursor:
+            return cursor.execute(sql, list(parametros)).df()
+
+    def colunas(self) -> List[str]:
+        with self._ligacao():
+            return list(self._colunas)
+
+    # Incêndios filtrados (ano, mês, local e, opcionalmente, vista do mapa), só com as colunas pedidas
+    def fatia(self, ano: int, mes_val: int = 0, sel_dist: str = "Todos", sel_conc: str = "Todos",
+              colunas: Optional[List[str]] = None, viewport: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        existentes = self.colunas()
+        selecao = ", ".join(f'"{c}"' for c in (colunas or existentes) if c in existentes)
+        where, parametros = _filtros(ano, mes_val, sel_dist, sel_conc, viewport)
+        return self.consultar(f"SELECT {selecao} FROM incendios WHERE {where}", parametros)
+
+    # Valores distintos (ordenados, sem nulos) de uma coluna, ex: anos e distritos dos filtros
+    def distintos(self, coluna: str) -> List[Any]:
+        if coluna not in self.colunas():
+            raise ValueError(f"Coluna desconhecida: {coluna}")
+        df = self.consultar(f'SELECT DISTINCT "{coluna}" AS v FROM incendios WHERE "{coluna}" IS NOT NULL ORDER BY v')
+        return df["v"].tolist()
+
+    def maximo(self, coluna: str) -> Any:
+        if coluna not in self.colunas():
+            raise ValueError(f"Coluna desconhecida: {coluna}")
+        return self.consultar(f'SELECT max(TRY_CAST("{coluna}" AS DOUBLE)) AS v FROM incendios')["v"].iloc[0]
+
+    # Impressão digital de cada ano: a do manifesto do armazém (a mesma calculada a partir do DF) ou, para ficheiros
+    # sem manifesto, o tamanho e a data de modificação do ficheiro
+    def impressoes_por_ano(self) -> Dict[int, str]:
+        guardadas = impressoes_guardadas(self._pasta)
+        impressoes = {}
+        for ficheiro in sorted(self._pasta.glob(PADRAO_FICHEIROS_ANO)):
+            ano = int(ficheiro.stem.split("=", 1)[1])
+            estado = ficheiro.stat()
+            impressoes[ano] = guardadas.get(ano) or f"{estado.st_size:x}-{estado.st_mtime_ns:x}"
+        return impressoes
+
+    # Agregação de uma frequência da feature store para os anos pedidos, com as colunas de `feature_store.agregar_frequencia`
+    def agregar_frequencia(self, freq: str, anos: Sequence[int]) -> pd.DataFrame:
+        chaves = FREQUENCIAS[freq] + GEO_KEYS
+        condicoes = [f"ANO IN ({', '.join('?' for _ in anos)})" if anos else "false"]
+        if freq == "diario":
+            condicoes.append("DIA IS NOT NULL")
+        elif freq == "horario": # perfil horário ignora incêndios sem hora de início válida
+            condicoes.append("HORA IS NOT NULL")
+        medidas = ["count(id) AS NUM_INCENDIOS", "coalesce(sum(AREATOTAL), 0) AS AREA_ARDIDA_TOTAL",
+                   "coalesce(sum(DURACAO), 0) AS DURACAO_SOMA_MIN", "count(DURACAO) AS DURACAO_CONTAGEM_VALIDA"]
+        for col in METEO_COLS:
+            medidas += [f"coalesce(sum({col}), 0) AS {col}_SOMA", f"count({col}) AS {col}_CONTAGEM"]
+        if freq == "horario":
+            medidas += ["count(AREATOTAL) AS AREA_ARDIDA_CONTAGEM", "coalesce(sum(AREATOTAL * AREATOTAL), 0) AS AREA_ARDIDA_SOMA2",
+                        "coalesce(sum(DURACAO * DURACAO), 0) AS DURACAO_SOMA2_MIN"]
+        selecao = ", ".join(f"{EXPRESSOES_CHAVE.get(c, c)} AS {c}" for c in chaves)
+        ordem = ", ".join(f"{c} NULLS LAST" for c in chaves)
+        sql = f"SELECT {selecao}, {', '.join(medidas)} FROM incendios WHERE {' AND '.join(condicoes)} GROUP BY ALL ORDER BY {ordem}"
+        return self.consultar(sql, [int(a) for a in anos])
+
+    # Tabela de um nível agregado do mapa principal por (ANO, MES, local), com as colunas de `map_lod.AgregadosLOD`
+    def agregar_lod(self, nivel: str, tipos: Sequence[str]) -> pd.DataFrame:
+        chaves = CHAVES_LOD[nivel]
+        grupos = ", ".join(["ANO", "MES", *chaves])
+        por_tipo = "".join(f", count(*) FILTER (WHERE TIPO = ?) AS {coluna_tipo(t)}" for t in tipos)
+        total = f"count(*) FILTER (WHERE TIPO IN ({', '.join('?' for _ in tipos)}))" if tipos else "0"
+        sql = f"""
+            SELECT {grupos}, sum(LAT) AS LAT_SOMA, sum(LON) AS LON_SOMA, coalesce(sum(AREATOTAL), 0) AS AREA_ARDIDA_TOTAL,
+                   coalesce(sum(DURACAO), 0) AS DURACAO_SOMA_MIN, count(DURACAO) AS DURACAO_CONTAGEM_VALIDA{por_tipo},
+                   {total} AS NUM_INCENDIOS_TOTAL
+            FROM incendios WHERE LAT IS NOT NULL AND LON IS NOT NULL AND {chaves[-1]} IS NOT NULL
+            GROUP BY {grupos} ORDER BY {', '.join(f'{c} NULLS LAST' for c in ["ANO", "MES", *chaves])}
+        """
+        return self.consultar(sql, [*tipos, *tipos])
+
+    # Células (local, ano, mês, tipo) com as somas e contagens do `indice_temporal.IndiceTemporal`
+    def celulas_temporais(self, granularity: str) -> pd.DataFrame:
+        if granularity not in GRANULARIDADES:
+            raise ValueError(f"Granularidade desconhecida: {granularity}")
+        return self.consultar(f"""
+            SELECT {granularity} AS LOCAL, ANO, MES, TIPO, count(*) AS N, sum(LAT) AS LAT_SOMA, sum(LON) AS LON_SOMA,
+                   coalesce(sum(AREATOTAL), 0) AS AREA_SOMA, coalesce(sum(DURACAO), 0) AS DURACAO_SOMA_MIN,
+                   count(DURACAO) AS DURACAO_CONTAGEM_VALIDA
+            FROM incendios WHERE LAT IS NOT NULL AND LON IS NOT NULL AND {granularity} IS NOT NULL
+            GROUP BY ALL
+        """)
+
+    # Distritos de um concelho (sem maiúsculas, como nos filtros), para os títulos
+    def distritos_do_concelho(self, sel_conc: str) -> List[str]:
+        df = self.consultar("SELECT DISTINCT DISTRITO AS v FROM incendios WHERE lower(CONCELHO) = lower(?) AND DISTRITO IS NOT NULL ORDER BY v",
+                            [sel_conc])
+        return df["v"].tolist()
+
+    # Agregado do mapa principal por distrito/concelho, com as mesmas colunas usadas por `figuras.agregar_mapa`
+    # (tipo predominante: o mais frequente e, em empate, o primeiro por ordem alfabética)
+    def agregar_mapa(self, ano: int, mes_val: int, granularity: str = "DISTRITO") -> pd.DataFrame:
+        if granularity not in GRANULARIDADES:
+            raise ValueError(f"Granularidade desconhecida: {granularity}")
+        where, parametros = _filtros(ano, mes_val)
+        tipos = list(COLUNAS_TIPO)
+        marcadores = ", ".join("?" for _ in tipos)
+        por_tipo = ",\n".join(
+            f"count(*) FILTER (WHERE TIPO = ?) AS NUM_INCENDIOS_{sufixo}, "
+            f"coalesce(sum(AREATOTAL) FILTER (WHERE TIPO = ?), 0) AS AREA_ARDIDA_{sufixo}"
+            for sufixo in COLUNAS_TIPO.values())
+        sql = f"""
+            WITH base AS (
+                SELECT {granularity} AS chave, LAT, LON, DURACAO, AREATOTAL, TIPO FROM incendios
+                WHERE {where} AND LAT IS NOT NULL AND LON IS NOT NULL AND {granularity} IS NOT NULL
+            ), contagens AS (
+                SELECT chave, TIPO, count(*) AS n FROM base WHERE TIPO IS NOT NULL GROUP BY chave, TIPO
+            ), moda AS (
+                SELECT chave, first(TIPO ORDER BY n DESC, TIPO) AS TIPO_PREDOMINANTE FROM contagens GROUP BY chave
+            )
+            SELECT base.chave AS {granularity}, avg(LAT) AS LAT, avg(LON) AS LON,
+                   coalesce(avg(DURACAO), 0) AS DURACAO_MEDIA_RAW_MIN,
+                   coalesce(any_value(moda.TIPO_PREDOMINANTE), 'desconhecido') AS TIPO_PREDOMINANTE,
+                   {por_tipo},
+                   count(*) FILTER (WHERE TIPO IN ({marcadores})) AS NUM_INCENDIOS_TOTAL,
+                   coalesce(sum(AREATOTAL) FILTER (WHERE TIPO IN ({marcadores})), 0) AS AREA_ARDIDA_TOTAL
+            FROM base LEFT JOIN moda USING (chave)
+            GROUP BY base.chave ORDER BY base.chave
+        """
+        parametros = parametros + [t for t in tipos for _ in range(2)] + tipos + tipos
+        return self.consultar(sql, parametros)
@@ -0,0 +1,245 @@
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from feature_store import FREQUENCIAS, FeatureStore
+from spatial_index import GridIndex
+from map_lod import AgregadosLOD
+from indice_temporal import IndiceTemporal
+from concorrencia import ConcorrenciaIncendios
+from calendario import CalendarioIncendios
+from risco_ignicao import CamadaRisco
+from exportacao import ARMAZEM_DIR, PADRAO_FICHEIROS_ANO, ArmazemIncendios, impressao_origem, origem_guardada
+from consultas_sql import MotorSQL, backend_sql_ativo
+
+# constantes
+BASE_DIR = Path(__file__).resolve().parent 
+CSV_2012_2021 =  BASE_DIR / "data" / "incendios_2012a2021.csv"
+CSV_2022 = BASE_DIR / "data" / "dados_2022.csv" 
+FICHEIROS_CSV = (CSV_2012_2021, CSV_2022) # origem dos dados (a sua impressão digital fica no manifesto do armazém)
+
+_BASE_MESES_INICIAIS = {1: "J", 2: "F", 3: "M", 4: "A", 5: "M", 6: "Jn",
+                                      7: "Jl", 8: "A", 9: "Set", 10: "O", 11: "N", 12: "D"}
+
+MESES_CURTO_RADIO = { # botões de rádio da sidebar
+    1: "Jan", 2: "Fev", 3: "Mar", 4: "Abr", 5: "Mai", 6: "Jun",
+    7: "Jul", 8: "Ago", 9: "Set", 10: "Out", 11: "Nov", 12: "Dez"
+}
+
+_BASE_MESES_EXTENSO = {
+    1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril", 5: "Maio", 6: "Junho",
+    7: "Julho", 8: "Agosto", 9: "Setembro", 10: "Outubro", 11: "Novembro", 12: "Dezembro"
+}
+
+MESES_EXTENSO = {0: "Todos os Meses", **_BASE_MESES_EXTENSO}
+MESES_CURTO_RADIO_INVERSO = {v: k for k, v in MESES_CURTO_RADIO.items()} # mapeamento inverso
+
+# Formatos das colunas de datas do ICNF (cada coluna usa os seus, por ordem; sem adivinhar o formato linha a linha).
+# As horas à meia-noite vêm às vezes só com a data (ex: "23-03-2021"), daí o segundo formato.
+FORMATOS_DATAS = {
+    "DATAALERTA": ("%d-%m-%Y",),                          # 05-02-2018
+    "DHINICIO": ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"),        # 2018-02-05 18:19:00
+    "DHFIM": ("%d-%m-%Y %H:%M:%S", "%d-%m-%Y"),           # 05-02-2018 19:48:00
+    "DATAEXTINCAO": ("%d-%m-%Y",),                        # 05-02-2018
+}
+
+# Função para simplificar as famílias de causas dos incêndios
+def simplificar_familia(causa):
+    if pd.isna(causa):
+        return "Desconhecida"
+    causa = causa.lower()
+
+    # agrupam causas semelhantes sob um nome comum
+    causa = re.sub(r".*pasto.*", "Queimada - Pasto", causa)
+    causa = re.sub(r".*sobrantes.*", "Queimada - Sobrantes", causa)
+    causa = re.sub(r".*maquinaria.*", "Uso de Maquinaria", causa)
+    causa = re.sub(r".*lazer.*", "Negligência em Lazer", causa)
+    causa = re.sub(r".*gestão.*vegetação.*", "Gestão de Vegetação", causa)
+    causa = re.sub(r"incêndios florestais", "Incêndio Florestal", causa)
+    causa = re.sub(r".*desconhecida.*", "Desconhecida", causa)
+    # causa = re.sub(r"[^a-zà-ú ]", "", causa)
+    causa = causa.strip().title()
+    return causa
+
+
+# Converte uma coluna de texto em datetime64 com formatos explícitos (o seguinte só para o que o anterior não converteu).
+# Cada valor distinto é convertido uma só vez (muitos incêndios partilham a data ou a hora de início)
+# e o resultado é distribuído pelas linhas através dos códigos do `factorize`; valores fora dos formatos ficam NaT.
+def converter_datas(valores: pd.Series, formatos: Tuple[str, ...]) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(valores): # já convertida (ex: lida do armazém Parquet)
+        return valores
+    codigos, distintos = pd.factorize(valores)
+    textos = pd.Series(distintos, dtype=object).astype(str).str.strip()
+    convertidos = pd.Series(pd.NaT, index=textos.index, dtype="datetime64[ns]")
+    for formato in formatos:
+        falta = convertidos.isna()
+        if not falta.any():
+            break
+        convertidos[falta] = pd.to_datetime(textos[falta], format=formato, errors="coerce")
+    tabela = np.append(convertidos.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns")) # código -1 (em falta) -> NaT
+    return pd.Series(tabela[codigos], index=valores.index, name=valores.name)
+
+
+# Datas como datetime64 e, a partir delas, a duração (min) e a hora de início.
+# DURACAO e HORA do CSV só são usadas onde as datas faltam ou são inválidas (fim antes do início).
+def preparar_datas(df: pd.DataFrame) -> pd.DataFrame:
+    for coluna, formatos in FORMATOS_DATAS.items():
+        if coluna in df.columns:
+            df[coluna] = converter_datas(df[coluna], formatos)
+    if "DHINICIO" in df.columns and "DHFIM" in df.columns:
+        duracao = (df["DHFIM"] - df["DHINICIO"]).dt.total_seconds() / 60
+        df["DURACAO"] = duracao.where(duracao >= 0).fillna(pd.to_numeric(df.get("DURACAO"), errors="coerce"))
+    if "DHINICIO" in df.columns:
+        df["HORA"] = df["DHINICIO"].dt.hour.astype(float).fillna(pd.to_numeric(df.get("HORA"), errors="coerce"))
+    return df
+
+
+# Carregamento e limpeza dos CSVs (chamada no primeiro acesso a `DF`)
+def carregar_dados() -> pd.DataFrame:
+    df_2012_2021 = pd.read_csv(CSV_2012_2021)
+    df_2022 = pd.read_csv(CSV_2022) 
+    df = pd.concat([df_2012_2021, df_2022], ignore_index=True) 
+    df.columns = df.columns.str.strip() # bye espaços em branco dos nomes das colunas
+
+    df["CAUSAFAMILIA"] = df["CAUSAFAMILIA"].apply(simplificar_familia)
+    df["MES"] = df["MES"].astype(int) 
+    df["MES_NOME"] = df["MES"].map(_BASE_MESES_INICIAIS)
+    df["DISTRITO"] = df["DISTRITO"].str.title()
+    df["CONCELHO"] = df["CONCELHO"].str.title().fillna("Desconhecido")
+    df["TIPO"] = df["TIPO"].fillna("Desconhecido")
+    df['DIA'] = pd.to_numeric(df['DIA'], errors='coerce')
+    df = preparar_datas(df)
+
+    # Tratamento da coluna HUMIDADERELATIVA (clipar valores entre 0 e 100)
+    df.loc[df["HUMIDADERELATIVA"] > 100, "HUMIDADERELATIVA"] = 100
+    df.loc[df["HUMIDADERELATIVA"] < 0, "HUMIDADERELATIVA"] = 0
+    return df
+
+
+# Motor SQL (DuckDB) sobre o armazém Parquet, se o backend "duckdb" estiver ativo (senão None).
+# O armazém é escrito a partir dos CSV se ainda não houver ficheiros ou se os CSV mudaram (tamanho ou data de modificação
+# diferentes dos do manifesto); só os anos cuja impressão digital mudou são reescritos, e a feature store, que usa as
+# impressões do manifesto, recalcula esses anos. O DF usado não fica em memória.
+def _motor_sql():
+    if not backend_sql_ativo():
+        return None
+    origem = impressao_origem(FICHEIROS_CSV)
+    if not any(ARMAZEM_DIR.glob(PADRAO_FICHEIROS_ANO)) or (origem is not None and origem != origem_guardada(ARMAZEM_DIR)):
+        ArmazemIncendios(carregar_dados(), cache_dir=ARMAZEM_DIR, origem=origem).preparar()
+    return MotorSQL(ARMAZEM_DIR)
+
+
+def _max_slider_wind() -> int:
+    max_wind_speed = _obter("MAX_WIND_SPEED")
+    return int(np.ceil(max_wind_speed)) if pd.notna(max_wind_speed) and max_wind_speed > 0 else 60
+
+
+# Objetos derivados dos dados, construídos só no primeiro acesso (ex: `dados.DF`, `dados.FEATURES`).
+# Importar este módulo não lê nenhum ficheiro; quem só precisa de constantes ou funções não paga o carregamento.
+_CONSTRUTORES: Dict[str, Callable[[], Any]] = {
+    "DF": carregar_dados,
+    # Listas para filtros e dropdowns
+    # (com o motor SQL, lidas dos ficheiros Parquet sem carregar o DF)
+    "DISTRITOS": lambda: ["Todos"] + (_obter("SQL").distintos("DISTRITO") if _obter("SQL") else sorted(_obter("DF")["DISTRITO"].dropna().unique())), # distritos únicos
+    "ANOS": lambda: [int(ano) for ano in (_obter("SQL").distintos("ANO") if _obter("SQL") else sorted(_obter("DF")["ANO"].dropna().unique()))], # anos únicos para o slider
+    # Máximo da intensidade do vento (para o slider)
+    "MAX_WIND_SPEED": lambda: _obter("SQL").maximo("VENTOINTENSIDADE") if _obter("SQL") else _obter("DF")['VENTOINTENSIDADE'].max(),
+    "MAX_SLIDER_WIND": _max_slider_wind,
+    # Feature store partilhada: agregações mensais/diárias/horárias por (distrito, concelho), calculadas uma vez e persistidas
+    "FEATURES": lambda: FeatureStore(None, motor=_obter("SQL")) if _obter("SQL") else FeatureStore(_obter("DF")),
+    # Índice espacial (grelha uniforme) sobre LAT/LON de todo o DF, para recortar os mapas à vista visível
+    "SPATIAL_INDEX": lambda: GridIndex(_obter("DF")["LAT"].to_numpy(), _obter("DF")["LON"].to_numpy()),
+    # Agregações por nível de detalhe do mapa principal (modo automático)
+    "LOD_MAPA": lambda: AgregadosLOD(motor=_obter("SQL")) if _obter("SQL") else AgregadosLOD(_obter("DF")),
+    # Somas acumuladas por (local × ano × mês) para intervalos arbitrários de anos e meses no mapa principal
+    "INDICE_TEMPORAL": lambda: IndiceTemporal(motor=_obter("SQL")) if _obter("SQL") else IndiceTemporal(_obter("DF")),
+    # Incêndios ativos em simultâneo (varrimento dos intervalos DHINICIO-DHFIM), com as linhas temporais por (ano, mês) em cache
+    "CONCORRENCIA": lambda: ConcorrenciaIncendios(motor=_obter("SQL")) if _obter("SQL") else ConcorrenciaIncendios(_obter("DF")),
+    # Calendário denso (local × ano × dia do ano) a partir da agregação diária da feature store
+    "CALENDARIO": lambda: CalendarioIncendios(_obter("FEATURES").get("diario")),
+    # Densidade histórica de ignições por mês do ano (KDE pré-calculada e guardada em disco; com o motor SQL só lê as coordenadas)
+    "RISCO": lambda: CamadaRisco(_obter("SQL").consultar("SELECT ANO, MES, LAT, LON FROM incendios") if _obter("SQL") else _obter("DF")),
+    # Armazém colunar (Parquet por ano) de onde as exportações são lidas em lotes (com o motor SQL, só os ficheiros)
+    "ARMAZEM": lambda: ArmazemIncendios(None) if _obter("SQL") else ArmazemIncendios(_obter("DF"), origem=impressao_origem(FICHEIROS_CSV)),
+    # Motor SQL opcional (CRONOFOGO_BACKEND=duckdb): filtros e agregações dos gráficos (e das estruturas acima)
+    # como consultas aos ficheiros Parquet; o DF completo nunca é carregado
+    "SQL": _motor_sql,
+}
+_LOCK = threading.RLock() # o servidor atende pedidos em paralelo; cada objeto é construído uma só vez
+
+
+def _obter(nome: str) -> Any:
+    with _LOCK:
+        if nome not in globals():
+            globals()[nome] = _CONSTRUTORES[nome]() # depois disto o acesso já não passa pelo __getattr__
+        return globals()[nome]
+
+
+def __getattr__(nome: str) -> Any:
+    if nome in _CONSTRUTORES:
+        return _obter(nome)
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
+# Constrói no processo principal o que os processos do EXECUTOR usam e que escreve na cache em disco ou é caro de montar
+# (índice espacial, todas as frequências da feature store, calendário e simultâneos). Com `fork` os processos herdam
+# tudo pronto, em vez de cada um recalcular e escrever os mesmos ficheiros em paralelo.
+def preparar_processos() -> None:
+    if _obter("SQL") is None: # com o motor SQL não há DF para carregar
+        _obter("SPATIAL_INDEX")
+    for freq in FREQUENCIAS:
+        _obter("FEATURES").get(freq)
+    _obter("CALENDARIO")
+    _obter("CONCORRENCIA")
+
+
+# Fatia (ano, mês) do DF (ou do motor SQL, se ativo); mês 0 = todos os meses.
+# As fatias mais recentes ficam em memória (não as alterar).
+@lru_cache(maxsize=16)
+def fatia_ano_mes(ano: int, mes_val: int) -> pd.DataFrame:
+    if _obter("SQL") is not None:
+        return _obter("SQL").fatia(ano, mes_val)
+    df = _obter("DF")
+    df_f = df[df["ANO"] == int(ano)]
+    if mes_val != 0:
+        df_f = df_f[df_f["MES"] == int(mes_val)]
+    return df_f
+
+
+# Nome do local para os títulos: concelho (prioritário), distrito ou o país
+def nome_local(sel_dist: str, sel_conc: str) -> str:
+    if sel_conc != "Todos":
+        return f"concelho de {sel_conc.title()}"
+    if sel_dist != "Todos":
+        return f"distrito de {sel_dist.title()}"
+    return "Portugal Continental"
+
+
+# Fatia (ano, mês, local); com o motor SQL o filtro do local também segue para a consulta
+def fatia_local(ano: int, mes_val: int, sel_dist: str, sel_conc: str) -> Tuple[pd.DataFrame, str]:
+    if _obter("SQL") is not None:
+        return _obter("SQL").fatia(ano, mes_val, sel_dist, sel_conc), nome_local(sel_dist, sel_conc)
+    return filtrar_local(fatia_ano_mes(ano, mes_val), sel_dist, sel_conc)
+
+
+# Distritos de um concelho (normalmente um), para dar contexto nos títulos
+@lru_cache(maxsize=512)
+def distritos_do_concelho(sel_conc: str) -> List[str]:
+    if _obter("SQL") is not None:
+        return _obter("SQL").distritos_do_concelho(sel_conc)
+    df = _obter("DF")
+    return list(df.loc[df["CONCELHO"].str.lower() == sel_conc.lower(), "DISTRITO"].dropna().unique())
+
+
+# Filtra uma fatia pelo concelho (prioritário) ou distrito e devolve também o nome do local para os títulos
+def filtrar_local(df: pd.DataFrame, sel_dist: str, sel_conc: str) -> Tuple[pd.DataFrame, str]:
+    if sel_conc != "Todos":
+        df = df[df["CONCELHO"].str.lower() == sel_conc.lower()]
+    elif sel_dist != "Todos":
+        df = df[df["DISTRITO"].str.lower() == sel_dist.lower()]
+    return df, nome_local(sel_dist, sel_conc)
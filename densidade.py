@@ -0,0 +1,62 @@
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# constantes
+N_PONTOS_KDE = 128 # pontos da grelha fixa de cada curva de densidade (o payload não depende do nº de incêndios)
+N_LARGURAS_KERNEL = 4 # o kernel gaussiano é truncado a ±4 larguras de banda
+EXTENSAO_LARGURAS = 2 # a curva estende-se 2 larguras de banda para lá dos bigodes (como o spanmode "soft" do plotly)
+PONTOS_POR_LARGURA = 4 # a grelha interna da KDE tem pelo menos 4 pontos por largura de banda (kernel bem amostrado)
+MAX_PONTOS_INTERNOS = 4096 # limite da grelha interna (custo da convolução)
+
+
+# Largura de banda pela regra de Silverman, a mesma que o plotly.js usa nos violinos
+def largura_silverman(valores: np.ndarray, q1: float, q3: float) -> float:
+    desvio = float(np.std(valores, ddof=1)) if len(valores) > 1 else 0.0
+    dispersao = min(desvio, (q3 - q1) / 1.349) if q3 > q1 else desvio
+    largura = 1.059 * dispersao * len(valores) ** -0.2
+    return largura if largura > 0 else 1.0 # valores todos iguais: largura unitária, só para desenhar a curva
+
+
+# KDE gaussiana em grelha (binned KDE): cada valor é repartido linearmente pelos dois pontos vizinhos de uma grelha interna
+# (`bincount`) e as contagens são convolvidas com o kernel amostrado no mesmo passo; a curva devolvida tem `n_pontos`
+# pontos, interpolados da grelha interna. O passo interno é uma fração da largura de banda (uma cauda longa não deixa o
+# kernel subamostrado) e o kernel é normalizado na própria grelha, pelo que cada valor contribui com massa 1.
+# Valores fora de [inicio, fim] contam até ±4 larguras de banda (margem da grelha interna); os restantes não entram
+# na curva, mas a densidade continua a ser relativa a todos os valores.
+# Custo O(n + pontos internos × comprimento do kernel) em vez de O(n × N_PONTOS_KDE) da soma direta.
+def kde_grelha(valores: np.ndarray, inicio: float, fim: float, largura: float, n_pontos: int = N_PONTOS_KDE):
+    grelha = np.linspace(inicio, fim, n_pontos)
+    n_interno = int(np.clip(np.ceil((fim - inicio) / largura * PONTOS_POR_LARGURA) + 1, n_pontos, MAX_PONTOS_INTERNOS))
+    passo = (fim - inicio) / (n_interno - 1)
+    meio = int(np.ceil(N_LARGURAS_KERNEL * largura / passo))
+    n_total = n_interno + 2 * meio # grelha interna com `meio` pontos de margem de cada lado
+    posicao = (np.asarray(valores, dtype=float) - inicio) / passo + meio
+    posicao = posicao[(posicao >= 0) & (posicao <= n_total - 1)]
+    esquerda = np.minimum(np.floor(posicao).astype(np.int64), n_total - 2)
+    fracao = posicao - esquerda
+    pesos = np.bincount(esquerda, weights=1 - fracao, minlength=n_total) + np.bincount(esquerda + 1, weights=fracao, minlength=n_total)
+    kernel = np.exp(-0.5 * (np.arange(-meio, meio + 1) * passo / largura) ** 2)
+    kernel /= kernel.sum() * passo
+    interna = np.convolve(pesos, kernel)[2 * meio:2 * meio + n_interno] / len(valores)
+    return grelha, np.interp(grelha, inicio + np.arange(n_interno) * passo, interna)
+
+
+# Resumo de uma variável para o violino: curva de densidade na grelha fixa, quartis, bigodes (1,5 × IQR) e estatísticas do hover
+def resumo_violino(valores, n_pontos: int = N_PONTOS_KDE) -> Optional[Dict[str, Any]]:
+    valores = np.asarray(valores, dtype=float)
+    valores = valores[np.isfinite(valores)]
+    if not len(valores):
+        return None
+    q1, mediana, q3 = np.quantile(valores, [0.25, 0.5, 0.75])
+    minimo, maximo = float(valores.min()), float(valores.max())
+    largura = largura_silverman(valores, q1, q3)
+    iqr = q3 - q1
+    bigode_inf, bigode_sup = float(valores[valores >= q1 - 1.5 * iqr].min()), float(valores[valores <= q3 + 1.5 * iqr].max())
+    # a curva cobre só a zona dos bigodes: um outlier isolado não estica a grelha (mínimo e máximo ficam no hover)
+    grelha, densidade = kde_grelha(valores, bigode_inf - EXTENSAO_LARGURAS * largura, bigode_sup + EXTENSAO_LARGURAS * largura, largura, n_pontos)
+    return {
+        "grelha": grelha, "densidade": densidade, "largura_banda": largura, "n": len(valores),
+        "q1": float(q1), "mediana": float(mediana), "q3": float(q3), "media": float(valores.mean()), "min": minimo, "max": maximo,
+        "bigode_inf": bigode_inf, "bigode_sup": bigode_sup,
+    }
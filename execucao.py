@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturoTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# constantes
+MAX_PROCESSOS = int(os.environ.get("CRONOFOGO_PROCESSOS", max(1, min(4, (os.cpu_count() or 2) - 1))))
+TEMPO_LIMITE_S = 120 # espera máxima por uma figura
+INTERVALO_VERIFICACAO_S = 0.05 # de quanto em quanto tempo quem espera verifica se o pedido ficou obsoleto
+MAX_CANAIS = 10_000 # canais (sessão + gráfico) lembrados para descartar pedidos obsoletos
+MAX_TENTATIVAS = 2 # submissões de um pedido quando um processo do conjunto morre (o conjunto é recriado entre elas)
+
+
+# Lançada quando o mesmo canal (sessão + gráfico) já pediu entretanto outra coisa
+class PedidoObsoleto(Exception):
+    pass
+
+
+# Chave de um pedido: função + argumentos (dicionários como o da vista do mapa incluídos)
+def chave_pedido(funcao: Callable, *args: Any) -> str:
+    return json.dumps([f"{funcao.__module__}.{funcao.__qualname__}", *args], sort_keys=True, default=str)
+
+
+def _nada() -> None:
+    return None
+
+
+# Executa construtores de figuras num conjunto limitado de processos, fora da thread do pedido.
+# - pedidos iguais em curso (mesma chave) partilham o mesmo trabalho;
+# - cada canal guarda só o pedido mais recente: quem espera por um pedido antigo desiste logo,
+#   e o trabalho que ninguém espera é cancelado se ainda estiver na fila (o que já corre termina, sem ser usado);
+# - se um processo morrer (ex: sem memória), o conjunto fica inutilizável: é descartado e o pedido volta a ser submetido num novo.
+class ExecutorFiguras:
+    def __init__(self, max_processos: int = MAX_PROCESSOS, inicializador: Optional[Callable[[], None]] = None):
+        self._max_processos = max_processos
+        self._inicializador = inicializador
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._em_curso: Dict[str, Future] = {} # chave -> trabalho partilhado
+        self._interessados: Dict[str, int] = {} # chave -> nº de pedidos à espera
+        self._canais: Dict[Hashable, str] = {} # canal -> chave do pedido mais recente
+
+    def _obter_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._max_processos, initializer=self._inicializador)
+        return self._pool
+
+    # Arranca já todos os processos (ex: antes de o servidor começar a atender, com os dados carregados)
+    def iniciar(self) -> None:
+        with self._lock:
+            pool = self._obter_pool()
+            tarefas = [pool.submit(_nada) for _ in range(self._max_processos)]
+        for tarefa in tarefas:
+            tarefa.result()
+
+    def encerrar(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def executar(self, funcao: Callable, *args: Any, canal: Optional[Hashable] = None) -> Any:
+        chave = chave_pedido(funcao, *args)
+        for tentativa in range(MAX_TENTATIVAS):
+            pool, futuro = self._submeter(chave, funcao, args, canal, repeticao=tentativa > 0)
+            try:
+                return self._esperar(chave, futuro, canal)
+            except BrokenProcessPool:
+                self._descartar_pool(pool)
+                if tentativa == MAX_TENTATIVAS - 1:
+                    raise
+
+    # Na repetição, o canal só é retomado se nenhum pedido mais recente o tiver ocupado entretanto
+    def _submeter(self, chave: str, funcao: Callable, args: Tuple[Any, ...], canal: Optional[Hashable],
+                  repeticao: bool = False) -> Tuple[ProcessPoolExecutor, Future]:
+        with self._lock:
+            if canal is not None:
+                if repeticao and self._canais.get(canal, chave) != chave:
+                    raise PedidoObsoleto(chave)
+                self._canais[canal] = chave
+            pool = self._obter_pool()
+            futuro = self._em_curso.get(chave)
+            if futuro is None:
+                try:
+                    futuro = pool.submit(funcao, *args)
+                except BrokenProcessPool: # já estava partido (ex: um processo morreu entre pedidos)
+                    self._repor_pool(pool)
+                    pool = self._obter_pool()
+                    futuro = pool.submit(funcao, *args)
+                self._em_curso[chave] = futuro
+            self._interessados[chave] = self._interessados.get(chave, 0) + 1
+        return pool, futuro
+
+    # Esquece um conjunto de processos partido, se ainda for o atual. Todo o trabalho em curso era desse conjunto
+    # (e falhou com ele), por isso também é esquecido: a próxima submissão cria trabalho novo num conjunto novo.
+    def _repor_pool(self, pool: ProcessPoolExecutor) -> None:
+        if self._pool is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._em_curso.clear()
+
+    def _descartar_pool(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            self._repor_pool(pool)
+
+    def _esperar(self, chave: str, futuro: Future, canal: Optional[Hashable]) -> Any:
+        limite = time.monotonic() + TEMPO_LIMITE_S
+        try:
+            while True:
+                try:
+                    return futuro.result(timeout=INTERVALO_VERIFICACAO_S)
+                except FuturoTimeout:
+                    if canal is not None and self._canais.get(canal) != chave:
+                        raise PedidoObsoleto(chave) from None
+                    if time.monotonic() > limite:
+                        raise
+        except CancelledError:
+            raise PedidoObsoleto(chave) from None
+        finally:
+            self._libertar(chave, futuro, canal)
+
+    def _libertar(self, chave: str, futuro: Future, canal: Optional[Hashable]) -> None:
+        with self._lock:
+            restantes = self._interessados.get(chave, 1) - 1
+            if restantes > 0:
+                self._interessados[chave] = restantes
+            else:
+                self._interessados.pop(chave, None)
+                if self._em_curso.get(chave) is futuro:
+                    del self._em_curso[chave]
+                futuro.cancel() # só tem efeito se ainda estiver na fila
+            if canal is not None and self._canais.get(canal) == chave and restantes <= 0:
+                del self._canais[canal]
+
+
+# Regista, por canal (ex: sessão + callback), o número do pedido mais recente; os anteriores ficam obsoletos.
+# Guarda no máximo `max_canais` canais (os mais antigos são esquecidos).
+class UltimosPedidos:
+    def __init__(self, max_canais: int = MAX_CANAIS):
+        self._max_canais = max_canais
+        self._lock = threading.Lock()
+        self._geracoes: "OrderedDict[Hashable, int]" = OrderedDict()
+
+    def registar(self, canal: Hashable) -> int:
+        with self._lock:
+            geracao = self._geracoes.pop(canal, 0) + 1
+            self._geracoes[canal] = geracao
+            while len(self._geracoes) > self._max_canais:
+                self._geracoes.popitem(last=False)
+            return geracao
+
+    def obsoleto(self, canal: Hashable, geracao: int) -> bool:
+        with self._lock:
+            return self._geracoes.get(canal, geracao) != geracao
+
+
+# Cache LRU partilhada entre threads (ex: figuras já construídas, por chave de pedido)
+class CacheLRU:
+    def __init__(self, max_itens: int):
+        self._max_itens = max_itens
+        self._lock = threading.Lock()
+        self._itens: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def obter(self, chave: Hashable, omissao: Any = None) -> Any:
+        with self._lock:
+            if chave not in self._itens:
+                return omissao
+            self._itens.move_to_end(chave)
+            return self._itens[chave]
+
+    def guardar(self, chave: Hashable, valor: Any) -> None:
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self._max_itens:
+                self._itens.popitem(last=False)
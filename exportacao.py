@@ -0,0 +1,213 @@
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from feature_store import PARQUET_DISPONIVEL, escrever_atomicamente, impressoes_por_ano
+
+if PARQUET_DISPONIVEL:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+# constantes
+ARMAZEM_DIR = Path(__file__).resolve().parent / "data" / "cache" / "incendios"
+PADRAO_FICHEIROS_ANO = "ANO=*.parquet" # um ficheiro por ano (também lido pelo motor SQL)
+ARMAZEM_VERSAO = 2 # incrementar quando o esquema dos ficheiros mudar (invalida a cache em disco)
+TAMANHO_LOTE = 50_000 # linhas por lote transmitido
+
+# Formatos de exportação e respetivo tipo MIME (Parquet e Arrow precisam do pyarrow)
+FORMATOS_EXPORTACAO: Dict[str, str] = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def formatos_disponiveis() -> List[str]:
+    return list(FORMATOS_EXPORTACAO) if PARQUET_DISPONIVEL else ["csv"]
+
+
+# Aplica os filtros do dashboard (mês, distrito, concelho) a um lote
+def filtrar_lote(df: pd.DataFrame, mes_val: int = 0, sel_dist: str = "Todos", sel_conc: str = "Todos") -> pd.DataFrame:
+    mask = pd.Series(True, index=df.index)
+    if mes_val:
+        mask &= df["MES"] == int(mes_val)
+    if sel_conc != "Todos":
+        mask &= df["CONCELHO"].str.lower() == sel_conc.lower()
+    elif sel_dist != "Todos":
+        mask &= df["DISTRITO"].str.lower() == sel_dist.lower()
+    return df[mask]
+
+
+# Manifesto do armazém (vazio se não existir ou for de outra versão)
+def _ler_manifesto(cache_dir: Path) -> Dict[str, Any]:
+    try:
+        manifesto = json.loads((Path(cache_dir) / "manifest.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return manifesto if manifesto.get("versao") == ARMAZEM_VERSAO else {}
+
+
+# Impressões digitais por ano guardadas no manifesto do armazém (vazio se não houver manifesto desta versão)
+def impressoes_guardadas(cache_dir: Path = ARMAZEM_DIR) -> Dict[int, str]:
+    return {int(ano): impressao for ano, impressao in _ler_manifesto(cache_dir).get("anos", {}).items()}
+
+
+# Impressão digital dos ficheiros de origem (tamanho e data de modificação de cada CSV existente; None se não houver nenhum).
+# Barata (não lê os ficheiros): serve para saber se o armazém tem de ser atualizado sem carregar o DF.
+def impressao_origem(ficheiros: Iterable[Path]) -> Optional[str]:
+    estados = [Path(f).stat() for f in ficheiros if Path(f).exists()]
+    return "-".join(f"{e.st_size:x}-{e.st_mtime_ns:x}" for e in estados) or None
+
+
+# Impressão digital da origem a partir da qual o armazém foi escrito (None se desconhecida)
+def origem_guardada(cache_dir: Path = ARMAZEM_DIR) -> Optional[str]:
+    return _ler_manifesto(cache_dir).get("origem")
+
+
+# Armazém colunar dos incêndios (um ficheiro Parquet por ano), lido em lotes para exportação.
+# Tal como a feature store, só reescreve os anos cujos dados de origem mudaram; sem pyarrow lê da memória.
+# Sem `df` (motor SQL) lê os ficheiros já escritos, sem carregar o DF. `origem` (`impressao_origem` dos CSV) fica no manifesto.
+class ArmazemIncendios:
+    def __init__(self, df: Optional[pd.DataFrame], cache_dir: Optional[Path] = ARMAZEM_DIR, persistir: bool = True,
+                 origem: Optional[str] = None):
+        self._df = df
+        self._origem = origem
+        self._cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._persistir = persistir and PARQUET_DISPONIVEL and self._cache_dir is not None
+        self._preparado = df is None
+
+    def _ficheiro(self, ano: int) -> Path:
+        return self._cache_dir / f"ANO={ano}.parquet"
+
+    def anos(self) -> List[int]:
+        if self._df is None:
+            return sorted(int(f.stem.split("=", 1)[1]) for f in self._cache_dir.glob(PADRAO_FICHEIROS_ANO))
+        return sorted(int(a) for a in self._df["ANO"].dropna().unique())
+
+    # Esquema comum a todos os anos (tipos promovidos entre ficheiros, ex: int64 + double -> double),
+    # usado para escrever exportações Parquet/Arrow mesmo sem linhas. Sem pyarrow não há esquema.
+    def esquema(self) -> Optional["pa.Schema"]:
+        if not PARQUET_DISPONIVEL:
+            return None
+        self.preparar()
+        if not self._persistir:
+            objetos = self._df.select_dtypes(include="object").columns
+            return pa.Schema.from_pandas(self._df.head(0).astype({c: "string" for c in objetos}), preserve_index=False)
+        esquemas = [pq.read_schema(self._ficheiro(a)) for a in self.anos()]
+        return pa.unify_schemas(esquemas, promote_options="permissive").remove_metadata() if esquemas else pa.schema([])
+
+    # Nomes das colunas exportadas (cabeçalho do CSV, mesmo sem linhas)
+    def colunas(self) -> List[str]:
+        if self._df is not None:
+            return list(self._df.columns)
+        return self.esquema().names
+
+    # Escreve os anos em falta ou alterados (feito na primeira exportação, não no arranque)
+    def preparar(self) -> None:
+        if self._preparado or not self._persistir:
+            return
+        impressoes = impressoes_por_ano(self._df)
+        guardados = {str(ano): impressao for ano, impressao in impressoes_guardadas(self._cache_dir).items()}
+
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        for ano, impressao in impressoes.items():
+            if guardados.get(str(ano)) != impressao or not self._ficheiro(ano).exists():
+                parte = self._df[self._df["ANO"] == ano]
+                objetos = parte.select_dtypes(include="object").columns # colunas de texto com tipos mistos
+                parte = parte.astype({c: "string" for c in objetos})
+                escrever_atomicamente(self._ficheiro(ano), lambda caminho: parte.to_parquet(caminho, index=False))
+                guardados[str(ano)] = impressao
+        for ficheiro in self._cache_dir.glob(PADRAO_FICHEIROS_ANO): # anos que deixaram de existir na origem (o motor SQL lê todos os ficheiros)
+            if int(ficheiro.stem.split("=", 1)[1]) not in impressoes:
+                ficheiro.unlink(missing_ok=True)
+        conteudo = {"versao": ARMAZEM_VERSAO, "anos": {a: i for a, i in guardados.items() if int(a) in impressoes}}
+        if self._origem is not None:
+            conteudo["origem"] = self._origem
+        escrever_atomicamente(self._cache_dir / "manifest.json", lambda caminho: caminho.write_text(json.dumps(conteudo, indent=1), encoding="utf-8"))
+        self._preparado = True
+
+    # Devolve os incêndios filtrados em lotes de DataFrames (nunca o resultado completo de uma vez)
+    def lotes(self, ano: Optional[int] = None, mes_val: int = 0, sel_dist: str = "Todos", sel_conc: str = "Todos",
+              colunas: Optional[List[str]] = None, tamanho: int = TAMANHO_LOTE) -> Iterator[pd.DataFrame]:
+        anos = self.anos()
+        if ano is not None:
+            anos = [a for a in anos if a == int(ano)]
+        colunas_filtro = ["MES", "DISTRITO", "CONCELHO"]
+        leitura = None if colunas is None else list(dict.fromkeys([*colunas, *colunas_filtro]))
+
+        self.preparar()
+        for a in anos:
+            if self._persistir:
+                ficheiro = pq.ParquetFile(self._ficheiro(a))
+                partes = (b.to_pandas() for b in ficheiro.iter_batches(batch_size=tamanho, columns=leitura))
+            else:
+                df_ano = self._df[self._df["ANO"] == a]
+                df_ano = df_ano.astype({c: "string" for c in df_ano.select_dtypes(include="object").columns}) # como nos ficheiros
+                partes = (df_ano.iloc[i:i + tamanho] for i in range(0, len(df_ano), tamanho))
+            for parte in partes:
+                parte = filtrar_lote(parte, mes_val, sel_dist, sel_conc)
+                if not parte.empty:
+                    yield parte if colunas is None else parte[colunas]
+
+
+# Ficheiro em memória que é esvaziado depois de cada lote (os escritores do pyarrow escrevem aqui)
+class _Escoadouro(io.RawIOBase):
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self._posicao = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        dados = bytes(dados)
+        self._partes.append(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def esvaziar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+# Converte uma sequência de lotes num fluxo de bytes no formato pedido (CSV, Parquet ou Arrow IPC).
+# Com `esquema` (Parquet/Arrow) e `colunas` (CSV) o ficheiro é válido mesmo sem lotes, e todos os lotes são
+# convertidos para o mesmo esquema; sem eles valem os do primeiro lote (agregados, que vão num só lote).
+def transmitir(lotes: Iterable[pd.DataFrame], formato: str, esquema: Optional["pa.Schema"] = None,
+               colunas: Optional[List[str]] = None) -> Iterator[bytes]:
+    if formato not in formatos_disponiveis():
+        raise ValueError(f"Formato não suportado: {formato!r} (disponíveis: {', '.join(formatos_disponiveis())})")
+    if formato == "csv":
+        cabecalho = colunas is None
+        if colunas is not None:
+            yield pd.DataFrame(columns=colunas).to_csv(index=False).encode("utf-8")
+        for lote in lotes:
+            yield lote.to_csv(index=False, header=cabecalho).encode("utf-8")
+            cabecalho = False
+        return
+
+    escoadouro = _Escoadouro(); escritor = None
+
+    def abrir(esquema_escrita: "pa.Schema"):
+        return pq.ParquetWriter(escoadouro, esquema_escrita) if formato == "parquet" else pa.ipc.new_stream(escoadouro, esquema_escrita)
+
+    if esquema is not None:
+        escritor = abrir(esquema)
+    for lote in lotes:
+        if esquema is None: # o esquema é fixado pelo primeiro lote
+            tabela = pa.Table.from_pandas(lote, preserve_index=False)
+            esquema = tabela.schema; escritor = abrir(esquema)
+        else:
+            tabela = pa.Table.from_pandas(lote[esquema.names], schema=esquema, preserve_index=False)
+        escritor.write_table(tabela)
+        yield escoadouro.esvaziar()
+    if escritor is not None:
+        escritor.close()
+        yield escoadouro.esvaziar()
@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import desvio_padrao_acumulado, dividir
+
+# Parquet é opcional: sem pyarrow a feature store funciona apenas em memória
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_DISPONIVEL = True
+except ImportError:
+    PARQUET_DISPONIVEL = False
+
+# constantes
+FEATURE_CACHE_DIR = Path(__file__).resolve().parent / "data" / "cache" / "features"
+FEATURE_STORE_VERSAO = 2 # incrementar quando o esquema das agregações mudar (invalida a cache em disco)
+
+GEO_KEYS = ["DISTRITO", "CONCELHO"]
+METEO_COLS = ["TEMPERATURA", "HUMIDADERELATIVA", "VENTOINTENSIDADE"]
+
+# Chaves temporais de cada frequência (combinadas sempre com DISTRITO e CONCELHO)
+FREQUENCIAS: Dict[str, List[str]] = {
+    "mensal": ["ANO", "MES"],
+    "diario": ["ANO", "MES", "DIA"],
+    "horario": ["ANO", "MES", "HORA"], # hora de início dentro do mês (perfil horário)
+}
+N_HORAS = 24
+BANDA_NUM_INCENDIOS = 0.10 # banda de ±10% no perfil horário do nº de incêndios (contagem, sem desvio-padrão)
+
+# Colunas da fonte que entram nas agregações (usadas para detetar alterações por ano)
+COLUNAS_FONTE = ["id", "ANO", "MES", "DIA", "HORA", "AREATOTAL", "DURACAO", *GEO_KEYS, *METEO_COLS]
+
+
+# Agrega um DataFrame de incêndios numa frequência.
+# Guarda somas e contagens (e não médias) para que os resultados se possam somar entre grupos.
+def agregar_frequencia(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    chaves = FREQUENCIAS[freq] + GEO_KEYS
+    df_base = df
+    if freq == "horario": # perfil horário ignora incêndios sem hora de início válida
+        horas = pd.to_numeric(df["HORA"], errors="coerce")
+        df_base = df.loc[horas.notna()].assign(HORA=horas.dropna().astype(int).clip(0, 23))
+    elif freq == "diario":
+        df_base = df.dropna(subset=["DIA"]).assign(DIA=lambda d: d["DIA"].astype(int))
+
+    agg_config = {
+        "NUM_INCENDIOS": ("id", "count"),
+        "AREA_ARDIDA_TOTAL": ("AREATOTAL", "sum"),
+        "DURACAO_SOMA_MIN": ("DURACAO", "sum"),
+        "DURACAO_CONTAGEM_VALIDA": ("DURACAO", "count"),
+    }
+    for col in METEO_COLS: # somas/contagens meteorológicas (média = soma / contagem)
+        agg_config[f"{col}_SOMA"] = (col, "sum")
+        agg_config[f"{col}_CONTAGEM"] = (col, "count")
+    if freq == "horario": # acumuladores do desvio-padrão por hora (contagem, soma e soma dos quadrados)
+        df_base = df_base.assign(_AREA2=df_base["AREATOTAL"] ** 2, _DURACAO2=df_base["DURACAO"] ** 2)
+        agg_config["AREA_ARDIDA_CONTAGEM"] = ("AREATOTAL", "count")
+        agg_config["AREA_ARDIDA_SOMA2"] = ("_AREA2", "sum")
+        agg_config["DURACAO_SOMA2_MIN"] = ("_DURACAO2", "sum")
+
+    return df_base.groupby(chaves, dropna=False, sort=True).agg(**agg_config).reset_index()
+
+
+# Escreve um ficheiro da cache num temporário da mesma pasta e só depois o põe no lugar (`os.replace` é atómico):
+# quem lê nunca vê um ficheiro a meio, e escritas em paralelo (threads ou processos) não se misturam.
+# O temporário começa por "." para não ser apanhado pelos padrões "ANO=*.parquet".
+def escrever_atomicamente(destino: Path, escrever: Callable[[Path], None]) -> None:
+    temporario = destino.with_name(f".{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        escrever(temporario)
+        os.replace(temporario, destino)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+
+# Calcula uma impressão digital por ano a partir das colunas de origem (deteta anos alterados)
+def impressoes_por_ano(df: pd.DataFrame) -> Dict[int, str]:
+    cols = [c for c in COLUNAS_FONTE if c in df.columns]
+    hashes = pd.util.hash_pandas_object(df[cols], index=False)
+    por_ano = hashes.groupby(df["ANO"].to_numpy()).agg(["sum", "size"])
+    return {int(ano): f"{int(linha['sum']):x}-{int(linha['size'])}" for ano, linha in por_ano.iterrows()}
+
+
+# Feature store com as agregações mensais, diárias e horárias por (distrito, concelho).
+# Cada frequência é calculada uma única vez, particionada por ANO e persistida em Parquet;
+# numa nova execução só são recalculados os anos cujos dados de origem mudaram.
+# Com `motor` (`consultas_sql.MotorSQL`) as agregações são consultas aos ficheiros Parquet e o DF não é usado.
+class FeatureStore:
+    def __init__(self, df: Optional[pd.DataFrame], cache_dir: Optional[Path] = FEATURE_CACHE_DIR, persistir: bool = True,
+                 motor: Optional[Any] = None):
+        self._df = df
+        self._motor = motor
+        self._cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._persistir = persistir and PARQUET_DISPONIVEL and self._cache_dir is not None
+        self._tabelas: Dict[str, pd.DataFrame] = {} # agregações já carregadas em memória
+        self._impressoes: Optional[Dict[int, str]] = None
+
+    # Substitui os dados de origem (ex: novo ano carregado); só os anos alterados serão recalculados
+    def atualizar(self, df: pd.DataFrame) -> None:
+        self._df = df
+        self._impressoes = None
+        self._tabelas.clear()
+
+    # Devolve a tabela agregada de uma frequência ("mensal", "diario" ou "horario")
+    def get(self, freq: str) -> pd.DataFrame:
+        if freq not in FREQUENCIAS:
+            raise ValueError(f"Frequência desconhecida: {freq!r} (esperado: {', '.join(FREQUENCIAS)})")
+        if freq not in self._tabelas:
+            self._tabelas[freq] = self._carregar_ou_calcular(freq)
+        return self._tabelas[freq]
+
+    # Filtra uma frequência por ano, mês e local (mesma semântica dos filtros do dashboard)
+    def consultar(self, freq: str, ano: Optional[int] = None, mes_val: int = 0,
+                  sel_dist: str = "Todos", sel_conc: str = "Todos") -> pd.DataFrame:
+        tabela = self.get(freq)
+        mask = pd.Series(True, index=tabela.index)
+        if ano is not None:
+            mask &= tabela["ANO"] == int(ano)
+        if mes_val:
+            mask &= tabela["MES"] == int(mes_val)
+        if sel_conc != "Todos":
+            mask &= tabela["CONCELHO"].str.lower() == sel_conc.lower()
+        elif sel_dist != "Todos":
+            mask &= tabela["DISTRITO"].str.lower() == sel_dist.lower()
+        return tabela[mask]
+
+    def _get_impressoes(self) -> Dict[int, str]:
+        if self._impressoes is None:
+            self._impressoes = self._motor.impressoes_por_ano() if self._motor is not None else impressoes_por_ano(self._df)
+        return self._impressoes
+
+    # Agrega os anos pedidos (do DF ou, com o motor SQL, numa consulta)
+    def _agregar(self, freq: str, anos: Sequence[int]) -> pd.DataFrame:
+        if self._motor is not None:
+            return self._motor.agregar_frequencia(freq, anos)
+        return agregar_frequencia(self._df[self._df["ANO"].isin(anos)], freq)
+
+    def _carregar_ou_calcular(self, freq: str) -> pd.DataFrame:
+        impressoes = self._get_impressoes()
+        if not self._persistir:
+            return self._agregar(freq, list(impressoes))
+
+        pasta = self._cache_dir / freq
+        manifesto = self._ler_manifesto()
+        guardados = manifesto.get(freq, {})
+
+        partes = []; anos_em_falta = []
+        for ano, impressao in impressoes.items():
+            ficheiro = pasta / f"ANO={ano}.parquet"
+            if guardados.get(str(ano)) == impressao and ficheiro.exists():
+                partes.append(pd.read_parquet(ficheiro))
+            else:
+                anos_em_falta.append(ano)
+
+        if anos_em_falta: # recalcula apenas os anos novos ou alterados, numa única agregação
+            novos = self._agregar(freq, anos_em_falta)
+            pasta.mkdir(parents=True, exist_ok=True)
+            for ano, parte in novos.groupby("ANO", sort=False):
+                escrever_atomicamente(pasta / f"ANO={int(ano)}.parquet", lambda caminho: parte.to_parquet(caminho, index=False))
+                guardados[str(int(ano))] = impressoes[int(ano)]
+            partes.append(novos)
+
+        # remove do manifesto anos que deixaram de existir na origem
+        manifesto[freq] = {ano: imp for ano, imp in guardados.items() if int(ano) in impressoes}
+        self._escrever_manifesto(manifesto)
+
+        if not partes:
+            return self._agregar(freq, [])
+        chaves = FREQUENCIAS[freq] + GEO_KEYS
+        return pd.concat(partes, ignore_index=True).sort_values(chaves, ignore_index=True)
+
+    def _ler_manifesto(self) -> Dict[str, Dict[str, str]]:
+        caminho = self._cache_dir / "manifest.json"
+        try:
+            conteudo = json.loads(caminho.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if conteudo.get("versao") != FEATURE_STORE_VERSAO:
+            return {}
+        return conteudo.get("frequencias", {})
+
+    def _escrever_manifesto(self, frequencias: Dict[str, Dict[str, str]]) -> None:
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        conteudo = {"versao": FEATURE_STORE_VERSAO, "frequencias": frequencias}
+        escrever_atomicamente(self._cache_dir / "manifest.json", lambda caminho: caminho.write_text(json.dumps(conteudo, indent=1), encoding="utf-8"))
+
+
+# Série mensal nacional (soma de todos os locais) com médias meteorológicas, pronta para os modelos
+def serie_mensal_nacional(store: FeatureStore) -> pd.DataFrame:
+    mensal = store.get("mensal")
+    soma_cols = [c for c in mensal.columns if c not in FREQUENCIAS["mensal"] + GEO_KEYS]
+    serie = mensal.groupby(["ANO", "MES"], sort=True)[soma_cols].sum().reset_index()
+    for col in METEO_COLS:
+        serie[col] = serie[f"{col}_SOMA"] / serie[f"{col}_CONTAGEM"].where(serie[f"{col}_CONTAGEM"] > 0)
+    return serie
+
+
+# Série diária contínua (dias sem incêndios a zero) de um local, a partir da agregação diária.
+# Mesma semântica de filtros do dashboard: concelho (prioritário), distrito ou o país ("Todos").
+def serie_diaria(store: FeatureStore, sel_dist: str = "Todos", sel_conc: str = "Todos") -> pd.DataFrame:
+    diario = store.consultar("diario", sel_dist=sel_dist, sel_conc=sel_conc)
+    soma_cols = ["NUM_INCENDIOS", "AREA_ARDIDA_TOTAL", "DURACAO_SOMA_MIN", "DURACAO_CONTAGEM_VALIDA"]
+    datas = pd.to_datetime(pd.DataFrame({"year": diario["ANO"], "month": diario["MES"], "day": diario["DIA"]}), errors="coerce")
+    serie = diario[soma_cols].groupby(datas.rename("DATA")).sum()
+    if serie.empty:
+        return serie.reset_index()
+    anos = store.get("diario")["ANO"] # eixo comum a todos os locais: do primeiro ao último ano com dados
+    dias = pd.date_range(f"{int(anos.min())}-01-01", f"{int(anos.max())}-12-31", freq="D", name="DATA")
+    return serie.reindex(dias, fill_value=0).reset_index()
+
+
+# Perfil horário (24 horas) de uma seleção a partir dos acumuladores da agregação horária: somar a contagem, a soma
+# e a soma dos quadrados das células (ano, mês, distrito, concelho, hora) selecionadas dá exatamente os acumuladores
+# de qualquer agregação geográfica ou temporal, de onde saem a média e o desvio-padrão sem voltar aos incêndios.
+# Colunas HORA, VALOR_MEAN, VALOR_STD (e COUNT_FOR_STD nas médias); sem linhas se não houver valores.
+def perfil_horario(store: FeatureStore, metric: str, ano: Optional[int] = None, mes_val: int = 0,
+                   sel_dist: str = "Todos", sel_conc: str = "Todos") -> pd.DataFrame:
+    horario = store.consultar("horario", ano=ano, mes_val=mes_val, sel_dist=sel_dist, sel_conc=sel_conc)
+    horas = horario["HORA"].to_numpy(dtype=np.int64)
+    somar = lambda coluna: np.bincount(horas, weights=horario[coluna].to_numpy(dtype=float), minlength=N_HORAS)
+
+    perfil = pd.DataFrame({"HORA": range(N_HORAS)})
+    if metric == "NUM_INCENDIOS":
+        perfil["VALOR_MEAN"] = somar("NUM_INCENDIOS")
+        perfil["VALOR_STD"] = perfil["VALOR_MEAN"] * BANDA_NUM_INCENDIOS
+    else:
+        n, soma, soma2 = (somar(c) for c in (["AREA_ARDIDA_CONTAGEM", "AREA_ARDIDA_TOTAL", "AREA_ARDIDA_SOMA2"] if metric == "AREA_ARDIDA"
+                                             else ["DURACAO_CONTAGEM_VALIDA", "DURACAO_SOMA_MIN", "DURACAO_SOMA2_MIN"]))
+        perfil["VALOR_MEAN"] = dividir(soma, n, omissao=np.nan)
+        perfil["VALOR_STD"] = desvio_padrao_acumulado(n, soma, soma2) # NaN (-> 0) se contagem <= 1
+        perfil["COUNT_FOR_STD"] = n.astype(np.int64)
+    perfil = perfil.fillna(0) # Horas sem dados ficam a 0
+    if perfil["VALOR_MEAN"].sum() == 0:
+        return perfil.iloc[:0] # sem linhas mas com as colunas (a exportação continua a ter cabeçalho)
+    return perfil
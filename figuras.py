@@ -0,0 +1,1591 @@
+import base64
+import os
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd 
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.colors import hex_to_rgb
+from plotly.subplots import make_subplots
+
+from amostragem import amostra_estratificada, lttb
+from agregacoes import codificar, dividir, predominante
+from dados import _BASE_MESES_EXTENSO, MESES_CURTO_RADIO, MESES_EXTENSO
+from spatial_index import GridIndex, agregado_grosseiro
+from map_lod import AgregadosLOD, incendios_individuais, limitar_marcadores, nivel_lod
+from risco_ignicao import CamadaRisco
+from geometrias import geometrias_disponiveis, tolerancia_para_zoom
+
+# `wordcloud` e `matplotlib` só são importados quando uma nuvem de palavras é gerada
+
+# constantes
+PALETTE: Dict[str, str] = {
+    "brand": "#ffb66d", 
+    "brand_dark": "#a3302c", 
+    "accent_red": "#E74C3C",
+    "accent_orange": "#F39C12", 
+    "bg": "#F8F9FA", 
+    "font": "#2C3E50",
+    "sidebar_text": "#FFFFFF", 
+    "button_hover": "#A93226", 
+    "card_bg": "#FFFFFF",
+    "slider_handle": "#FFFFFF", 
+    "slider_rail": "#E74C3C",
+    "escala_area_inicio": "#FFF5E5",
+    "escala_area_meio": "#FFB66D",  
+    "escala_area_fim": "#A3302C",
+    "prediction_year_color": "#FFA500" # para destacar 2022
+}
+
+
+FONT_SIZE_CHART_TITLE = 14
+FONT_SIZE_AXIS_TITLE = 10
+FONT_SIZE_TICK_LABEL = 9
+FONT_SIZE_LEGEND_TITLE = 10
+FONT_SIZE_LEGEND_ITEM = 9
+FONT_SIZE_COLORBAR_TITLE = 10
+FONT_SIZE_COLORBAR_TICK = 9
+FONT_SIZE_MAP_TEXT = 9
+FONT_SIZE_ANIMATION_VALUE = 12
+FONT_SIZE_ANIMATION_BUTTON = 12
+FONT_SIZE_PIE_TEXT = 9
+
+# para variáveis meteorológicas (usado em dropdowns e labels)
+METEO_VARS = [
+    {"label": "Humidade", "value": "HUMIDADERELATIVA"},
+    {"label": "Temperatura", "value": "TEMPERATURA"},
+    {"label": "Vento", "value": "VENTOINTENSIDADE"}
+]
+
+METEO_LABELS_MAP = {item["value"]: item["label"] for item in METEO_VARS}
+
+MAIN_MAP_FIXED_HEIGHT = "500px" # altura fixa para o mapa principal
+METEO_MAP_NEW_HEIGHT = "572px" # altura para os mapas meteorológicos (temperatura, humidade, vento)
+SERIE_DIARIA_HEIGHT = 220 # altura do painel da série diária
+MAX_PONTOS_SERIE_DIARIA = 2000 # orçamento de pontos da série diária enviados ao browser (LTTB)
+CONCORRENCIA_HEIGHT = 220 # altura do painel de incêndios simultâneos
+MAX_PONTOS_CONCORRENCIA = 1500 # orçamento de pontos da linha de incêndios ativos (LTTB)
+MAX_LOCAIS_PICOS = 10 # barras de pico por local
+CALENDARIO_HEIGHT = 190 # altura do calendário diário (7 linhas × até 54 semanas)
+MAX_PONTOS_DISPERSAO = 4000 # orçamento de pontos da dispersão meteo (amostra estratificada; com zoom chega à resolução total)
+CLASSES_VENTO_AMOSTRA = [10, 20, 30] # limites (km/h) das classes de vento usadas como estratos da amostra
+MAIN_MAP_WIDTH_ESTIMADA = 420 # largura aproximada (px) do mapa principal
+METEO_MAP_WIDTH_ESTIMADA = 450 # largura aproximada (px) do mapa meteo, para estimar a vista quando o plotly não envia os cantos
+DEFAULT_CENTER_PT = {"lat": 39.56, "lon": -8.0} # ponto central padrão para os mapas (Portugal Continental)
+ZOOM_PORTUGAL = 5.5 # nivel de zoom inicial para Portugal
+ZOOM_DISTRITO = 7.5 # zoom ao selecionar um distrito
+MAX_ZOOM_CONCELHO = 12 # máximo de zoom para concelhos
+
+# Nível de detalhe do mapa principal em modo automático: (zoom máximo, nível); acima do último, incêndios individuais
+LOD_LIMIARES_ZOOM = [(ZOOM_DISTRITO - 0.5, "DISTRITO"), (9.5, "CONCELHO"), (MAX_ZOOM_CONCELHO - 0.5, "FREGUESIA")]
+NOMES_NIVEL_LOD = {"DISTRITO": "distrito", "CONCELHO": "concelho", "FREGUESIA": "freguesia", "INCENDIO": "incêndio"}
+
+TIPOCAUSA_COLOR_MAP = {
+    "Intencional": PALETTE["accent_orange"],
+    "Negligente": PALETTE["accent_red"],
+    "Reacendimento": "#4CAF50",
+    "Natural": "#BDBDBD", 
+    "Desconhecida": PALETTE["brand_dark"],
+    "NÃO ESPECIFICADA": PALETTE["brand_dark"],
+}
+
+TITULOS_METRICAS = {
+    "NUM_INCENDIOS": "Nº de Incêndios",
+    "AREA_ARDIDA": "Área Ardida",
+    "DURACAO_MEDIA": "Duração Média dos Incêndios"
+}
+
+COLOR_MAP_TIPO = {
+    "Florestal": "#2E7D32", 
+    "Agrícola": "#795548", 
+    "Urbano": "#616161", 
+    "Desconhecido": "#BDBDBD" 
+}
+
+# para a nuvem de palavras
+WORDCLOUD_COLORMAP = "OrRd" # "Orange-Red" (colormap do matplotlib)
+WORDCLOUD_MIN_COLOR_SCALE = 0.3 # escala mínima de cor para palavras menores
+WORDCLOUD_MAX_FONT_SIZE = 60
+WORDCLOUD_MIN_FONT_SIZE = 13
+
+# Escalas de cor e intervalos para mapas meteorológicos
+TEMP_COLOR_SCALE =[[0.0, "#DAA520"], [0.6, "#FF4500"], [1.0, "#B22222"]] # Amarelo -> Laranja -> Vermelho escuro
+TEMP_RANGE = [-5, 45] # Intervalo de temperatura em °C
+TEMP_COLOR_SCALE_DENSITY = [[0.0, "#87CEEB"], [0.2, "#DAA520"], [0.4, "#FF4500"], [0.6, "#FF4500"], [1.0, "#B22222"]] 
+TEMP_RANGE_DENSITY = [-5, 45]
+
+
+# Tamanhos de fonte para controlos de animação de mapas
+FONT_SIZE_ANIMATION_VALUE = 13
+FONT_SIZE_ANIMATION_BUTTON = 12
+FONT_SIZE_ANIMATION_STEP_LABEL = 10
+
+# Opacidade da camada de risco histórico sobre o mapa principal
+RISCO_OPACIDADE = 0.7
+
+# Serialização binária (formato `bdata` do plotly.js): arrays por ponto com pelo menos MIN_PONTOS_BINARIO valores
+CAMPOS_BINARIOS = ["lat", "lon", "x", "y", "z"]
+CAMPOS_BINARIOS_MARKER = ["size", "opacity"]
+MIN_PONTOS_BINARIO = 32
+
+# Modo de alto volume (opcional): a partir de LIMIAR_PONTOS_WEBGL pontos a dispersão meteo passa a Scattergl
+# e os mapas meteorológicos aos traços MapLibre (scattermap/densitymap) em vez dos mapbox
+ALTO_VOLUME = os.environ.get("CRONOFOGO_ALTO_VOLUME", "0") == "1"
+LIMIAR_PONTOS_WEBGL = int(os.environ.get("CRONOFOGO_LIMIAR_WEBGL", 5000))
+TRACOS_MAPLIBRE = {"scattermapbox": "scattermap", "densitymapbox": "densitymap", "choroplethmapbox": "choroplethmap"}
+
+# Escala de cor e intervalo para o mapa de vento
+WIND_COLOR_SCALE = [[0, "#32CD32"], [0.5, "#008000"], [1, "#4F7942"]] # Verde claro -> Verde escuro -> Verde oliva
+WIND_RANGE_COLOR = [0, 40]
+
+BASE_SCALE = 0.35
+HEAD_WING = 0.15
+HEAD_CONN = 0.75
+SHAFT_WIDTH = 1.2
+HEAD_WIDTH = 0.6
+LENGTH_CAP = WIND_RANGE_COLOR[1] # lim pra normalização do comprimento da seta
+
+# Função para criar uma figura vazia com uma mensagem bonitinha ----< usada quando não há dados
+def create_empty_figure(message: str = "sem dados para exibir.", height: Optional[int] = None):
+    fig = go.Figure()
+    fig.add_annotation(
+        text=f"<span style='font-size:13px; color:{PALETTE.get('font', '#2C3E50')};'>{message.replace(chr(10), '<br>')}</span>", # Permite quebras de linha na mensagem
+        x=0.5, y=0.5, xref="paper", yref="paper", showarrow=False, # pos central
+        align="center", xanchor="center", yanchor="middle"
+    )
+    default_height = int(METEO_MAP_NEW_HEIGHT.replace("px", ""))
+    fig_height = height if height is not None else default_height
+
+    fig.update_layout(
+        paper_bgcolor=PALETTE.get("card_bg", "#FFFFFF"),
+        plot_bgcolor=PALETTE.get("card_bg", "#FFFFFF"),
+        margin=dict(l=5, r=5, t=5, b=5),
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        height=fig_height
+    )
+    return fig
+
+
+# Minutos inteiros (arredondados) de uma coluna de durações e máscara dos valores válidos (não nulos e >= 0)
+def _minutos_validos(total_minutes: pd.Series):
+    valores = pd.to_numeric(total_minutes, errors="coerce").to_numpy(dtype=float)
+    validos = ~np.isnan(valores) & (valores >= 0)
+    return np.where(validos, np.round(valores), 0).astype(np.int64), validos
+
+
+# Formata uma coluna de durações em minutos de forma compacta (ex: "50h30m"; "n/a" se inválida), sem chamada Python por linha
+def format_duration_hm_series(total_minutes: pd.Series) -> pd.Series:
+    minutos, validos = _minutos_validos(total_minutes)
+    texto = pd.Series(minutos // 60).astype(str) + "h" + pd.Series(minutos % 60).astype(str).str.zfill(2) + "m"
+    return pd.Series(np.where(validos, texto, "n/a"), index=total_minutes.index)
+
+
+# Formata uma coluna de durações em minutos por extenso (ex: "2 dias, 3 horas e 15 minutos"; "n/a" se inválida)
+def format_duration_dhm_verbose_refined_series(total_minutes: pd.Series) -> pd.Series:
+    minutos, validos = _minutos_validos(total_minutes)
+    # Cada parte ("2 dias", "1 hora", ...) ou "" quando é zero
+    partes = []
+    for valor, unidade in ((minutos // (24 * 60), "dia"), (minutos % (24 * 60) // 60, "hora"), (minutos % 60, "minuto")):
+        texto = pd.Series(valor).astype(str) + f" {unidade}" + np.where(valor > 1, "s", "")
+        partes.append(pd.Series(np.where(valor > 0, texto, "")))
+    dias, horas, mins = partes
+    tem_d, tem_h, tem_m = (p.str.len().to_numpy() > 0 for p in partes)
+    # Separadores: "a, b e c" com três partes, "a e b" com duas
+    sep_dh = np.where(tem_d & tem_h, np.where(tem_m, ", ", " e "), "")
+    sep_m = np.where(tem_m & (tem_d | tem_h), " e ", "")
+    texto = dias + sep_dh + horas + sep_m + mins
+    texto = np.where(tem_d | tem_h | tem_m, texto, "0 minutos")
+    return pd.Series(np.where(validos, texto, "n/a"), index=total_minutes.index)
+
+
+# Duração em minutos -> horas e minutos inteiros, formatados no hovertemplate por `hover_duracao_hm` (XhYYm)
+def horas_minutos(total_minutes: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    minutos, validos = _minutos_validos(total_minutes)
+    return np.where(validos, minutos // 60, np.nan), np.where(validos, minutos % 60, np.nan)
+
+
+def hover_duracao_hm(i_horas: int, i_minutos: int) -> str:
+    return f"%{{customdata[{i_horas}]:.0f}}h%{{customdata[{i_minutos}]:02.0f}}m"
+
+
+# Hover compacto: as colunas de texto do customdata seguem como códigos inteiros e os rótulos de cada uma
+# vão uma só vez em layout.meta["rotulos"] (índice da coluna -> rótulos), trocados no browser (assets/rotulos.js)
+def codificar_customdata(df: pd.DataFrame, colunas: List[str]) -> Tuple[pd.DataFrame, Dict[str, List[str]]]:
+    customdata = pd.DataFrame(index=df.index); rotulos = {}
+    for i, coluna in enumerate(colunas):
+        if pd.api.types.is_numeric_dtype(df[coluna]):
+            customdata[coluna] = df[coluna]
+        else:
+            codigos, categorias = codificar(df[coluna].to_numpy())
+            customdata[coluna] = codigos; rotulos[str(i)] = [str(c) for c in categorias]
+    return customdata, rotulos
+
+
+def aplicar_rotulos(fig: go.Figure, rotulos: Dict[str, List[str]]) -> go.Figure:
+    if rotulos:
+        fig.update_layout(meta={"rotulos": rotulos})
+    return fig
+
+
+# Array numérico -> {"dtype", "bdata"} (base64, little-endian); float32 quando não perde precisão, inteiros no menor tipo.
+# Devolve o valor original se não for um array numérico com pontos suficientes (ex: categorias ou datas em x).
+def _array_binario(valores: Any) -> Any:
+    if isinstance(valores, (str, dict)) or not hasattr(valores, "__len__") or len(valores) < MIN_PONTOS_BINARIO:
+        return valores
+    try:
+        arr = np.asarray(valores)
+        if arr.dtype == object:
+            arr = arr.astype(float) # listas com None -> NaN
+    except (TypeError, ValueError):
+        return valores
+    if arr.ndim != 1 or arr.dtype.kind not in "iuf":
+        return valores
+    if arr.dtype.kind in "iu":
+        tipo = next((t for t in ("i1", "i2", "i4") if np.iinfo(t).min <= arr.min() and arr.max() <= np.iinfo(t).max), "f8")
+    else:
+        arr32 = arr.astype(np.float32)
+        tipo = "f4" if np.allclose(arr32, arr, rtol=1e-6, atol=0, equal_nan=True) else "f8"
+    return {"dtype": tipo, "bdata": base64.b64encode(arr.astype(f"<{tipo}").tobytes()).decode("ascii")}
+
+
+# Cópia de cada traço com os arrays convertidos (a figura original, ex: a da cache, não é alterada)
+def _tracos_binarios(tracos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    convertidos = []
+    for traco in tracos:
+        traco = {campo: _array_binario(valor) if campo in CAMPOS_BINARIOS else valor for campo, valor in traco.items()}
+        if isinstance(traco.get("marker"), dict):
+            traco["marker"] = {campo: _array_binario(valor) if campo in CAMPOS_BINARIOS_MARKER else valor for campo, valor in traco["marker"].items()}
+        convertidos.append(traco)
+    return convertidos
+
+
+# Dicionário da figura a enviar ao browser, com coordenadas, valores e tamanhos/opacidades por ponto em binário
+# (mais pequeno e mais rápido de codificar e de ler do que listas JSON de floats). O customdata segue em listas,
+# porque os rótulos são resolvidos no browser (`aplicar_rotulos`). Passo final: o resultado já não passa em go.Figure.
+def figura_binaria(fig: Any) -> Any:
+    if isinstance(fig, go.Figure):
+        fig = fig.to_dict()
+    elif not isinstance(fig, dict):
+        return fig
+    fig = {**fig, "data": _tracos_binarios(fig.get("data", []))}
+    if fig.get("frames"):
+        fig["frames"] = [{**frame, "data": _tracos_binarios(frame.get("data", []))} for frame in fig["frames"]]
+    return fig
+
+
+# Se o modo de alto volume está ativo e a figura tem pontos suficientes para beneficiar dos traços WebGL/MapLibre
+def usar_webgl(n_pontos: int) -> bool:
+    return ALTO_VOLUME and n_pontos >= LIMIAR_PONTOS_WEBGL
+
+# Nº de pontos desenhados de uma só vez: o maior entre os traços iniciais e cada frame da animação
+def _n_pontos(fig: go.Figure) -> int:
+    contar = lambda tracos: sum(len(t.lat) if getattr(t, "lat", None) is not None else 0 for t in tracos)
+    return max([contar(fig.data)] + [contar(frame.data) for frame in fig.frames])
+
+# Troca os traços mapbox pelos equivalentes MapLibre (mesmos atributos de estilo e hover) e layout.mapbox por layout.map,
+# em todos os frames. `n_pontos` decide pela seleção completa (ex: antes do recorte ao viewport), para o tipo de mapa
+# não mudar a cada zoom; por omissão conta os pontos da figura.
+def para_maplibre(fig: go.Figure, n_pontos: Optional[int] = None) -> go.Figure:
+    if not usar_webgl(_n_pontos(fig) if n_pontos is None else n_pontos) or not any(t.type in TRACOS_MAPLIBRE for t in fig.data):
+        return fig
+    def converter(tracos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [{**t, "type": TRACOS_MAPLIBRE.get(t.get("type"), t.get("type")),
+                 **({"subplot": t["subplot"].replace("mapbox", "map", 1)} if "subplot" in t else {})} for t in tracos]
+    figura = fig.to_dict()
+    figura["data"] = converter(figura["data"])
+    figura["frames"] = [{**frame, "data": converter(frame.get("data", []))} for frame in figura.get("frames", [])]
+    layout = dict(figura["layout"])
+    if "mapbox" in layout:
+        layout["map"] = {k: v for k, v in layout.pop("mapbox").items() if k != "accesstoken"}
+    if "template" in layout: # o template traz estilos por tipo de traço; os mapbox não se aplicam aos novos tipos
+        layout["template"] = {**layout["template"], "data": {TRACOS_MAPLIBRE.get(k, k): v for k, v in layout["template"].get("data", {}).items()}}
+    figura["layout"] = layout
+    return go.Figure(figura)
+
+
+# Função para agregar por mês os totais do gráfico de relação (usada pelo gráfico e pela exportação)
+def agregar_relacao_metricas(df_mensal: pd.DataFrame) -> pd.DataFrame:
+    # Soma as agregações dos vários locais por mês
+    df_agg = df_mensal.groupby("MES").agg(
+        NUM_INCENDIOS=("NUM_INCENDIOS", "sum"), 
+        AREA_ARDIDA_TOTAL=("AREA_ARDIDA_TOTAL", "sum"), 
+        DURACAO_SOMA_MIN=("DURACAO_SOMA_MIN", "sum"), 
+        DURACAO_CONTAGEM_VALIDA=("DURACAO_CONTAGEM_VALIDA", "sum")
+    ).reset_index()
+
+    # Calcula Duração Média em minutos e horas
+    df_agg["DURACAO_MEDIA_MIN"] = dividir(df_agg["DURACAO_SOMA_MIN"], df_agg["DURACAO_CONTAGEM_VALIDA"]) # 0 se não há durações válidas
+    df_agg["DURACAO_MEDIA_HORAS"] = df_agg["DURACAO_MEDIA_MIN"] / 60.0
+    return df_agg
+
+# Gráfico de Relação entre Métricas (Nº Incêndios, Área Ardida, Duração Média por Mês)
+# Recebe as agregações mensais da feature store (já filtradas por ano e local)
+def fig_relacao_metricas(df_mensal: pd.DataFrame, ano_selecionado: int, active_filter_name: str, altura_grafico: int = 250):
+    if df_mensal.empty:
+        return create_empty_figure(f"Sem dados para {active_filter_name.lower()} em {ano_selecionado}<br>para o gráfico de relação.", height=altura_grafico)
+
+    df_agg = agregar_relacao_metricas(df_mensal)
+    df_agg["MES_NOME"] = df_agg["MES"].map(MESES_CURTO_RADIO) # add nome curto do mês
+    df_agg = df_agg.sort_values(by="MES") # Ordena por mês
+    df_agg["MES_EXTENSO"] = df_agg["MES"].map(_BASE_MESES_EXTENSO) # nome extenso do mês para hover
+    duracao_h, duracao_m = horas_minutos(df_agg["DURACAO_MEDIA_MIN"]) # duração formatada no hover
+    
+    customdata_bar = np.stack((df_agg['MES_EXTENSO'], df_agg['AREA_ARDIDA_TOTAL'], duracao_h, duracao_m), axis=-1)
+
+    if df_agg.empty or df_agg["NUM_INCENDIOS"].sum() == 0:
+        return create_empty_figure(f"Sem dados de incêndios para {active_filter_name.lower()} em {ano_selecionado}<br>após agregação.", height=altura_grafico)
+
+    fig = make_subplots(specs=[[{"secondary_y": True}]]) 
+    
+    min_area = 0
+    max_area = df_agg["AREA_ARDIDA_TOTAL"].max() if not df_agg["AREA_ARDIDA_TOTAL"].empty else 1
+    if max_area == 0: 
+        max_area = 1 
+    FONT_SIZE_LEGEND = 11 
+
+    # Trace de Barras: Nº de Incêndios (cor pela Área Ardida)
+    bar_trace = go.Bar(
+        x=df_agg["MES_NOME"],
+        y=df_agg["NUM_INCENDIOS"],
+        name="Nº de Incêndios",
+        marker=dict(
+            color=df_agg["AREA_ARDIDA_TOTAL"], # Cor da barra baseada na área ardida
+            colorscale='OrRd', # Escala de cores Laranja-Vermelho
+            cmin=min_area, cmax=max_area,
+            colorbar=dict( 
+                title=dict(text="Área Ardida (ha)", font=dict(size=FONT_SIZE_LEGEND_TITLE, color=PALETTE["font"])),
+                orientation="h", x=0.5, xanchor="center", y=-0.3, yanchor="top",
+                thickness=12, len=0.75, tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]), outlinewidth=0
+            ),
+            showscale=True # Mostra a colorbar
+        ),
+        customdata=customdata_bar, # Dados para o hovertemplate
+        hovertemplate="<b>%{customdata[0]}</b><br>Nº Incêndios: %{y:.0f}<br>Área Ardida: %{customdata[1]:,.0f} ha<br>Duração Média: " + hover_duracao_hm(2, 3) + "<extra></extra>",
+        opacity=0.9, hoverlabel=dict(bgcolor=PALETTE["card_bg"])
+    )
+    fig.add_trace(bar_trace, secondary_y=False) # Adiciona ao eixo Y primário
+
+    # Trace de Linha: Duração Média (horas)
+    line_trace = go.Scatter(
+        x=df_agg["MES_NOME"],
+        y=df_agg["DURACAO_MEDIA_HORAS"],
+        name="Duração Média (h)",
+        mode='lines+markers', # Linhas com marcadores
+        line=dict(color=PALETTE["brand_dark"], width=2.5),
+        marker=dict(color=PALETTE["brand_dark"], size=8, symbol='circle'),
+        hoverinfo="skip" # O hover deste trace é combinado com o das barras através do hovermode="closest" e do hovertemplate das barras
+    )
+    fig.add_trace(line_trace, secondary_y=True) # Adiciona ao eixo Y secundário
+    fig.update_traces(hoverlabel=dict(namelength=-1)) # Mostra nome completo no hover da legenda
+
+    fig.update_layout(
+        xaxis=dict(
+            title=dict(text="Mês", font=dict(size=FONT_SIZE_AXIS_TITLE, color=PALETTE["font"])),
+            tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"])),
+        plot_bgcolor=PALETTE["card_bg"], paper_bgcolor=PALETTE["card_bg"], font_color=PALETTE["font"],
+        legend=dict( # Configuração da legenda principal
+            orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5,
+            font=dict(size=FONT_SIZE_LEGEND), bgcolor='rgba(255,255,255,0.1)'),
+        margin=dict(l=20, r=20, t=20, b=50), hovermode="closest", height=altura_grafico # Hovermode "closest" combina hovers
+    )
+    fig.update_yaxes(
+        title=dict(text="Nº de Incêndios", font=dict(size=FONT_SIZE_AXIS_TITLE, color=PALETTE["font"]), standoff=10),
+        secondary_y=False, tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]), gridcolor='rgba(200,200,200,0.3)'
+    )
+    fig.update_yaxes(
+        title=dict(text="Duração Média (horas)", font=dict(size=FONT_SIZE_AXIS_TITLE, color=PALETTE["font"]), standoff=10),
+        secondary_y=True, tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]), showgrid=False,
+        range=[0, df_agg["DURACAO_MEDIA_HORAS"].max() * 1.1 if not df_agg.empty and df_agg["DURACAO_MEDIA_HORAS"].max() > 0 else 5] # Define range do eixo Y secundário
+    )
+    return fig
+
+# Intervalo visível do eixo x (datas) a partir do relayoutData; None = série completa (autorange) ou evento sem mudança do eixo
+def intervalo_x_de_relayout(relayout_data: Optional[Dict[str, Any]]) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+    if not relayout_data:
+        return None
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        limites = [relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]]
+    elif isinstance(relayout_data.get("xaxis.range"), list):
+        limites = relayout_data["xaxis.range"]
+    else:
+        return None
+    try:
+        inicio, fim = (pd.Timestamp(v) for v in limites)
+    except (TypeError, ValueError):
+        return None
+    return (inicio, fim) if inicio <= fim else (fim, inicio)
+
+# Série diária de incêndios ao longo de todos os anos.
+# Só o intervalo visível (mais um ponto de cada lado) é reduzido com LTTB ao orçamento de pontos: com zoom a série
+# é refinada até aos pontos diários; as datas seguem em milissegundos (eixo de datas) para irem em binário.
+def fig_serie_diaria(serie: pd.DataFrame, metric: str, nome_local: str, x_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None,
+                     height: int = SERIE_DIARIA_HEIGHT, max_pontos: int = MAX_PONTOS_SERIE_DIARIA):
+    if serie.empty or serie["NUM_INCENDIOS"].sum() == 0:
+        return create_empty_figure(f"Sem dados diários para {nome_local.lower()}.", height=height)
+
+    if metric == "AREA_ARDIDA":
+        y, titulo_y, hover_y = serie["AREA_ARDIDA_TOTAL"], "Área Ardida (ha)", "Área Ardida: %{y:,.1f} ha"
+    elif metric == "DURACAO_MEDIA": # dias sem durações válidas ficam de fora (não são zeros)
+        y = serie["DURACAO_SOMA_MIN"] / serie["DURACAO_CONTAGEM_VALIDA"].where(serie["DURACAO_CONTAGEM_VALIDA"] > 0) / 60
+        titulo_y, hover_y = "Duração Média (horas)", "Duração Média: %{y:.1f} h"
+    else:
+        y, titulo_y, hover_y = serie["NUM_INCENDIOS"], "Nº de Incêndios", "Nº Incêndios: %{y:.0f}"
+    validos = y.notna().to_numpy()
+    datas = serie["DATA"].to_numpy()[validos]; y = y.to_numpy(dtype=float)[validos]
+
+    ini, fim = 0, len(datas)
+    if x_range is not None: # janela visível, com um ponto extra de cada lado para a linha chegar às margens
+        ini = max(int(np.searchsorted(datas, np.datetime64(x_range[0]), "left")) - 1, 0)
+        fim = min(int(np.searchsorted(datas, np.datetime64(x_range[1]), "right")) + 1, len(datas))
+    datas, y = datas[ini:fim], y[ini:fim]
+    x_ms = datas.astype("datetime64[ms]").astype(np.int64) # inteiros: seguem em binário sem perder precisão (float64)
+    idx = lttb(x_ms, y, max_pontos)
+
+    fig = go.Figure(go.Scattergl(
+        x=x_ms[idx], y=y[idx], mode="lines", name=titulo_y,
+        line=dict(color=PALETTE["brand_dark"], width=1.2),
+        hovertemplate="<b>%{x|%d/%m/%Y}</b><br>" + hover_y + "<extra></extra>", hoverlabel=dict(bgcolor=PALETTE["card_bg"])
+    ))
+    fig.update_layout(
+        xaxis=dict(type="date", range=[x_range[0], x_range[1]] if x_range is not None else None,
+                   tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"])),
+        yaxis=dict(title=dict(text=titulo_y, font=dict(size=FONT_SIZE_AXIS_TITLE, color=PALETTE["font"]), standoff=10),
+                   tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]), gridcolor='rgba(200,200,200,0.3)',
+                   fixedrange=True, rangemode="tozero"), # zoom só no tempo: o eixo y reajusta-se aos pontos recebidos
+        annotations=[dict(text=f"{len(idx):,} de {fim - ini:,} dias".replace(",", " "), xref="paper", yref="paper", x=1, y=1.02,
+                          xanchor="right", yanchor="bottom", showarrow=False, font=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]))],
+        plot_bgcolor=PALETTE["card_bg"], paper_bgcolor=PALETTE["card_bg"], font_color=PALETTE["font"],
+        margin=dict(l=20, r=20, t=20, b=30), height=height, dragmode="zoom", hovermode="x",
+        uirevision=f"{nome_local}-{metric}" # mantém o zoom quando a série é refinada
+    )
+    return fig
+
+# Incêndios ativos em simultâneo ao longo do período (linha em degraus, reduzida com LTTB ao orçamento de pontos)
+# e pico de simultâneos por local (distritos ou concelhos, ver `LinhaConcorrencia.para_local`)
+def fig_concorrencia(tempos: np.ndarray, ativos: np.ndarray, picos: pd.DataFrame, nome_local: str, ano: int, mes_val: int,
+                     height: int = CONCORRENCIA_HEIGHT):
+    time_period_str = get_time_period_string(ano, mes_val)
+    if len(tempos) == 0:
+        return create_empty_figure(f"Sem incêndios com início e fim válidos<br>({nome_local.lower()} - {time_period_str.lower()}).", height=height)
+
+    x_ms = tempos.astype("datetime64[ms]").astype(np.int64) # inteiros: seguem em binário sem perder precisão
+    idx = lttb(x_ms, ativos, MAX_PONTOS_CONCORRENCIA)
+    i_pico = int(np.argmax(ativos))
+    coluna_local = picos.columns[0]
+    top = picos.head(MAX_LOCAIS_PICOS).iloc[::-1] # maior pico em cima
+
+    fig = make_subplots(rows=1, cols=2, column_widths=[0.66, 0.34], horizontal_spacing=0.2) # espaço para os nomes dos locais
+    fig.add_trace(go.Scattergl(
+        x=x_ms[idx], y=ativos[idx], mode="lines", line=dict(color=PALETTE["brand_dark"], width=1.2, shape="hv"),
+        fill="tozeroy", fillcolor="rgba(163,48,44,0.15)", name="Ativos",
+        hovertemplate="<b>%{x|%d/%m/%Y %H:%M}</b><br>Incêndios ativos: %{y}<extra></extra>", hoverlabel=dict(bgcolor=PALETTE["card_bg"])
+    ), row=1, col=1)
+    fig.add_trace(go.Bar(
+        x=top["PICO_ATIVOS"], y=top[coluna_local].str.title(), orientation="h", name="Pico",
+        marker=dict(color=PALETTE["accent_orange"]), customdata=top["PICO_EM"].dt.strftime("%d/%m/%Y %H:%M"),
+        hovertemplate="<b>%{y}</b><br>Pico: %{x} ativos<br>em %{customdata}<extra></extra>", hoverlabel=dict(bgcolor=PALETTE["card_bg"])
+    ), row=1, col=2)
+    fig.update_layout(
+        xaxis=dict(type="date", tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"])),
+        yaxis=dict(title=dict(text="Incêndios ativos", font=dict(size=FONT_SIZE_AXIS_TITLE, color=PALETTE["font"]), standoff=10),
+                   tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]), gridcolor='rgba(200,200,200,0.3)', rangemode="tozero"),
+        xaxis2=dict(title=dict(text=f"Pico por {coluna_local.lower()}", font=dict(size=FONT_SIZE_AXIS_TITLE, color=PALETTE["font"])),
+                    tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]), gridcolor='rgba(200,200,200,0.3)', rangemode="tozero"),
+        yaxis2=dict(tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"])),
+        annotations=[dict(text=f"Pico: {int(ativos[i_pico])} em simultâneo ({pd.Timestamp(tempos[i_pico]):%d/%m/%Y %H:%M})",
+                          xref="x domain", yref="paper", x=0, y=1.02, xanchor="left", yanchor="bottom", showarrow=False,
+                          font=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]))],
+        plot_bgcolor=PALETTE["card_bg"], paper_bgcolor=PALETTE["card_bg"], font_color=PALETTE["font"],
+        margin=dict(l=20, r=20, t=20, b=30), height=height, showlegend=False, hovermode="closest"
+    )
+    return fig
+
+# Calendário do ano (dia da semana × semana) com o valor diário da métrica, a partir do array denso de `CalendarioIncendios`.
+# Cada célula leva [mês, dia] no customdata: um clique salta para esse dia na animação do mapa meteo sem novo cálculo.
+def fig_calendario(valores: np.ndarray, ano: int, metric: str, nome_local: str, height: int = CALENDARIO_HEIGHT):
+    if not np.nansum(valores):
+        return create_empty_figure(f"Sem incêndios em {ano}<br>({nome_local.lower()}).", height=height)
+
+    datas = pd.date_range(f"{int(ano)}-01-01", periods=len(valores), freq="D")
+    dia_semana = datas.dayofweek.to_numpy() # 0 = segunda
+    semana = (np.arange(len(valores)) + dia_semana[0]) // 7
+    n_semanas = int(semana[-1]) + 1
+    z = np.full((7, n_semanas), np.nan) # dias fora do ano ficam vazios
+    z[dia_semana, semana] = valores
+    texto = np.full((7, n_semanas), "", dtype=object)
+    texto[dia_semana, semana] = datas.strftime("%d/%m/%Y")
+    customdata = np.zeros((7, n_semanas, 2), dtype=int)
+    customdata[dia_semana, semana] = np.column_stack([datas.month, datas.day])
+
+    if metric == "AREA_ARDIDA":
+        titulo, hover_z = "Área Ardida (ha)", "Área Ardida: %{z:,.1f} ha"
+    elif metric == "DURACAO_MEDIA":
+        titulo, hover_z = "Duração Média (h)", "Duração Média: %{z:.1f} h"
+    else:
+        titulo, hover_z = "Nº de Incêndios", "Nº Incêndios: %{z:.0f}"
+    positivos = valores[np.isfinite(valores) & (valores > 0)]
+    zmax = float(np.percentile(positivos, 98)) if len(positivos) else 1.0 # um dia extremo (ex: 15/10/2017) não apaga o resto do ano
+    inicio_mes = datas.is_month_start
+
+    fig = go.Figure(go.Heatmap(
+        z=z, x=np.arange(n_semanas), y=["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"], text=texto, customdata=customdata,
+        colorscale=[[0.0, PALETTE["escala_area_inicio"]], [0.5, PALETTE["escala_area_meio"]], [1.0, PALETTE["escala_area_fim"]]],
+        zmin=0, zmax=max(zmax, 1e-9), xgap=2, ygap=2, hoverongaps=False,
+        colorbar=dict(title=dict(text=titulo, font=dict(size=FONT_SIZE_COLORBAR_TITLE)), tickfont=dict(size=FONT_SIZE_COLORBAR_TICK), thickness=10),
+        hovertemplate="<b>%{text}</b><br>" + hover_z + "<br><i>clique para ver o dia no mapa meteo</i><extra></extra>",
+        hoverlabel=dict(bgcolor=PALETTE["card_bg"])
+    ))
+    fig.update_layout(
+        xaxis=dict(tickmode="array", tickvals=semana[inicio_mes], ticktext=[MESES_CURTO_RADIO[m] for m in datas.month[inicio_mes]],
+                   tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]), showgrid=False, zeroline=False, fixedrange=True),
+        yaxis=dict(autorange="reversed", tickfont=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]), showgrid=False, fixedrange=True),
+        plot_bgcolor=PALETTE["card_bg"], paper_bgcolor=PALETTE["card_bg"], font_color=PALETTE["font"],
+        margin=dict(l=20, r=20, t=10, b=25), height=height
+    )
+    return fig
+
+# Colormap da nuvem de palavras (o matplotlib só é importado aqui)
+@lru_cache(maxsize=1)
+def _wordcloud_colormap():
+    from matplotlib import colormaps
+    return colormaps[WORDCLOUD_COLORMAP]
+
+# Função de cor para a nuvem de palavras (baseada no tamanho da fonte)
+def wordcloud_color_func(word, font_size, position, orientation, font_path, random_state):
+    if font_size is None or WORDCLOUD_MAX_FONT_SIZE is None or WORDCLOUD_MIN_FONT_SIZE is None:
+        scale = np.random.uniform(WORDCLOUD_MIN_COLOR_SCALE, 1.0) # Escala aleatória se tamanhos não definidos
+    else:
+        if WORDCLOUD_MAX_FONT_SIZE == WORDCLOUD_MIN_FONT_SIZE: 
+            font_ratio = 1.0
+        else: 
+            font_ratio = (font_size - WORDCLOUD_MIN_FONT_SIZE) / (WORDCLOUD_MAX_FONT_SIZE - WORDCLOUD_MIN_FONT_SIZE)
+        scale = WORDCLOUD_MIN_COLOR_SCALE + font_ratio * (1.0 - WORDCLOUD_MIN_COLOR_SCALE)
+        scale = np.clip(scale, WORDCLOUD_MIN_COLOR_SCALE, 1.0) 
+    rgba = _wordcloud_colormap()(scale)
+    r, g, b = [int(255 * x) for x in rgba[:3]] 
+    return (r, g, b) # Retorna tupla RGB
+
+
+def fig_radar_causas(df_chart_data, active_filter_name_for_title, ano, mes_val):
+    if df_chart_data.empty or "TIPOCAUSA" not in df_chart_data.columns:
+        return create_empty_figure(f"Sem dados de tipos de causa para {active_filter_name_for_title.lower()}<br>({get_time_period_string(ano, mes_val).lower()}).")
+    contagem_causas = df_chart_data["TIPOCAUSA"].value_counts().reset_index(name="Contagem") # Conta ocorrências por tipo de causa
+    if contagem_causas.empty: 
+        return create_empty_figure(f"Sem dados de tipos de causa para {active_filter_name_for_title.lower()}<br>({get_time_period_string(ano, mes_val).lower()}).")
+    
+    fig = go.Figure(go.Scatterpolar(
+        r=contagem_causas["Contagem"], # Valores (raio)
+        theta=contagem_causas["TIPOCAUSA"], # Categorias (ângulo)
+        fill="toself", name="causas", # Preenche a área
+        line=dict(color=PALETTE["accent_red"],width=3), fillcolor="rgba(231,76,60,0.25)"
+    ))
+    fig.update_layout(
+        title=None, 
+        polar=dict(radialaxis=dict(visible=True, range=[0, contagem_causas["Contagem"].max()], gridcolor="lightgray", tickfont=dict(size=FONT_SIZE_TICK_LABEL)),
+                   angularaxis=dict(tickfont=dict(size=FONT_SIZE_TICK_LABEL), gridcolor="lightgray")),
+        font=dict(color=PALETTE["font"]), showlegend=False, 
+        paper_bgcolor=PALETTE["card_bg"], plot_bgcolor=PALETTE["card_bg"], 
+        margin=dict(l=45,r=45,t=15,b=15)
+    )
+    return fig
+
+# Helper para obter uma string formatada do período (ano e mês)
+def get_time_period_string(ano: int, mes_val: int) -> str:
+    if mes_val == 0: 
+        return f"ano de {ano}" # Se "Todos os Meses"
+    return f"{MESES_EXTENSO.get(mes_val, '')} de {ano}" # Para um mês específico
+
+# Gera string para um intervalo de anos × meses (ex: "Junho–Setembro de 2016–2018")
+def texto_intervalo(anos, meses) -> str:
+    a0, a1 = int(anos[0]), int(anos[-1])
+    m0, m1 = int(meses[0]), int(meses[-1])
+    texto_anos = str(a0) if a0 == a1 else f"{a0}–{a1}"
+    if (m0, m1) == (1, 12): # Todos os meses
+        return f"ano de {a0}" if a0 == a1 else f"anos de {texto_anos}"
+    texto_meses = MESES_EXTENSO.get(m0, '') if m0 == m1 else f"{MESES_EXTENSO.get(m0, '')}–{MESES_EXTENSO.get(m1, '')}"
+    return f"{texto_meses} de {texto_anos}"
+
+# Agrega os dados do mapa principal por Distrito ou Concelho (uma linha por local)
+def agregar_mapa(df_mapa_base: pd.DataFrame, granularity: str = "DISTRITO") -> pd.DataFrame:
+    # Agregação base: média de LAT/LON, Duração Média, Tipo Predominante por granularidade
+    agg_base = df_mapa_base.groupby(granularity).agg(
+        LAT=("LAT", "mean"), LON=("LON", "mean"),
+        DURACAO_MEDIA_RAW_MIN=("DURACAO", "mean")
+    ).join(predominante(df_mapa_base, granularity, "TIPO").rename("TIPO_PREDOMINANTE")).reset_index() # moda vetorizada (bincount 2-D)
+
+    # Calcula contagens de incêndios por tipo (Florestal, Agrícola)
+    counts_por_tipo = df_mapa_base.groupby([granularity, "TIPO"]).size().unstack(fill_value=0)
+    for tipo in ["Florestal", "Agrícola", "Urbano", "Desconhecido"]: # Garante que todas as colunas de tipo existem
+        if tipo not in counts_por_tipo.columns: 
+            counts_por_tipo[tipo] = 0
+    counts_por_tipo = counts_por_tipo.rename(columns={ # Renomeia colunas para clareza
+        "Florestal": "NUM_INCENDIOS_FLORESTAL", "Agrícola": "NUM_INCENDIOS_AGRICOLA",
+        "Urbano": "NUM_INCENDIOS_URBANO", "Desconhecido": "NUM_INCENDIOS_DESCONHECIDO"
+    }).reset_index()
+    num_incendios_cols_for_total = ["NUM_INCENDIOS_FLORESTAL", "NUM_INCENDIOS_AGRICOLA", "NUM_INCENDIOS_URBANO", "NUM_INCENDIOS_DESCONHECIDO"]
+    existing_num_cols = [col for col in num_incendios_cols_for_total if col in counts_por_tipo.columns]
+    counts_por_tipo["NUM_INCENDIOS_TOTAL"] = counts_por_tipo[existing_num_cols].sum(axis=1) if existing_num_cols else 0 # Soma para total de incêndios
+
+    # Calcula área ardida por tipo
+    area_por_tipo = df_mapa_base.groupby([granularity, "TIPO"])["AREATOTAL"].sum().unstack(fill_value=0)
+    for tipo in ["Florestal", "Agrícola", "Urbano", "Desconhecido"]: # Garante colunas
+        if tipo not in area_por_tipo.columns: 
+            area_por_tipo[tipo] = 0
+    area_por_tipo = area_por_tipo.rename(columns={ # Renomeia colunas
+        "Florestal": "AREA_ARDIDA_FLORESTAL", "Agrícola": "AREA_ARDIDA_AGRICOLA",
+    }).reset_index()
+    area_cols_for_total = [col for col in area_por_tipo.columns if "AREA_ARDIDA_" in col or col in ["Urbano", "Desconhecido", "AREA_ARDIDA_URBANO", "AREA_ARDIDA_DESCONHECIDO"]]
+    existing_area_cols = [col for col in area_cols_for_total if col in area_por_tipo.columns]
+    area_por_tipo["AREA_ARDIDA_TOTAL"] = area_por_tipo[existing_area_cols].sum(axis=1) if existing_area_cols else 0 # Soma para área total
+
+    # Junta todas as agregações
+    agg_level_data = agg_base.merge(counts_por_tipo, on=granularity, how="left").merge(area_por_tipo, on=granularity, how="left")
+    # Preenche NaNs com 0 para colunas numéricas e formata duração
+    cols_to_fill = [c for c in agg_level_data.columns if "NUM_INCENDIOS_" in c or "AREA_ARDIDA_" in c or "DURACAO_MEDIA_RAW_MIN" in c]
+    for col in cols_to_fill:
+        if col in agg_level_data: 
+            agg_level_data[col] = pd.to_numeric(agg_level_data[col], errors='coerce').fillna(0)
+        else: agg_level_data[col] = 0 # Adiciona coluna com 0 se não existir
+    return agg_level_data
+
+# Mapa Principal de Incêndios (por Distrito ou Concelho)
+# Com `coropletico=True` (e geometrias preparadas), desenha as áreas dos distritos/concelhos em vez de círculos.
+def fig_mapa(df_year_month_filtered: pd.DataFrame, metric: str, ano: int, mes_val: int, show_text_labels: bool = False, granularity: str = "DISTRITO",
+             coropletico: bool = False, view: Optional[Dict[str, Any]] = None):
+    if granularity not in ["DISTRITO", "CONCELHO"] or granularity is None:
+        granularity = "DISTRITO" # Default para Distrito
+
+    time_period_str = get_time_period_string(ano, mes_val) # String do período para mensagens
+    map_height = int(MAIN_MAP_FIXED_HEIGHT.replace("px","")) # Altura do mapa
+
+    if df_year_month_filtered.empty:
+         return create_empty_figure(f"Sem dados para exibir no mapa<br>({granularity.lower()}) – {time_period_str}", height=map_height)
+
+    # Remove dados sem LAT, LON ou a granularidade selecionada (Distrito/Concelho)
+    df_mapa_base = df_year_month_filtered.dropna(subset=["LAT", "LON", granularity])
+
+    if df_mapa_base.empty:
+        return create_empty_figure(f"Sem dados de localização para exibir no mapa<br>({granularity.lower()}) – {time_period_str}", height=map_height)
+
+    return fig_mapa_agregado(agregar_mapa(df_mapa_base, granularity), metric, ano, mes_val, show_text_labels, granularity, coropletico, view)
+
+# Mapa Principal a partir do agregado por local já calculado
+# (ex: pelo motor SQL, `MotorSQL.agregar_mapa`, ou para um intervalo, `IndiceTemporal.agregar_mapa`; `periodo` substitui o texto do ano/mês)
+def fig_mapa_agregado(agg_level_data: pd.DataFrame, metric: str, ano: int, mes_val: int, show_text_labels: bool = False,
+                      granularity: str = "DISTRITO", coropletico: bool = False, view: Optional[Dict[str, Any]] = None,
+                      periodo: Optional[str] = None):
+    map_height = int(MAIN_MAP_FIXED_HEIGHT.replace("px",""))
+    if agg_level_data.empty:
+        return create_empty_figure(f"Sem dados de localização para exibir no mapa<br>({granularity.lower()}) – {periodo or get_time_period_string(ano, mes_val)}", height=map_height)
+    geo_url = url_geometria(granularity, view) if coropletico else None
+    return _figura_mapa(agg_level_data, granularity, granularity, metric, show_text_labels, map_height, view=view, geo_url=geo_url)
+
+# Mapa Principal em modo automático: o nível de detalhe acompanha o zoom (distrito → concelho → freguesia → incêndio)
+# Os níveis agregados vêm das agregações pré-calculadas; o nº de marcadores fica limitado a MAX_MARCADORES_LOD.
+# `nivel` fixa o nível (em vez de o deduzir do zoom), usado ao redesenhar o modo coroplético com granularidade manual.
+def fig_mapa_lod(agregados: AgregadosLOD, metric: str, ano: int, mes_val: int, show_text_labels: bool = False,
+                 view: Optional[Dict[str, Any]] = None, df_incendios_vista: Optional[pd.DataFrame] = None,
+                 nivel: Optional[str] = None, coropletico: bool = False):
+    map_height = int(MAIN_MAP_FIXED_HEIGHT.replace("px",""))
+    nivel = nivel or nivel_lod(view.get("zoom") if view else None, LOD_LIMIARES_ZOOM)
+    viewport = view if view and "lat_min" in view else None
+
+    if nivel == "INCENDIO": # incêndios individuais dentro da vista
+        df_rows = df_incendios_vista if df_incendios_vista is not None else pd.DataFrame(columns=["DISTRITO", "CONCELHO", "FREGUESIA", "LOCAL", "LAT", "LON", "AREATOTAL", "DURACAO", "TIPO"])
+        agg_level_data = incendios_individuais(df_rows, agregados.tipos); nome_col = "LOCAL"
+    else:
+        agg_level_data = agregados.consultar(nivel, ano, mes_val, viewport=viewport if nivel == "FREGUESIA" else None)
+        nome_col = nivel
+    if agg_level_data.empty:
+        return create_empty_figure(f"Sem dados para exibir no mapa<br>({NOMES_NIVEL_LOD[nivel]}) – {get_time_period_string(ano, mes_val)}", height=map_height)
+
+    size_metric_col = {"NUM_INCENDIOS": "NUM_INCENDIOS_TOTAL", "AREA_ARDIDA": "AREA_ARDIDA_TOTAL", "DURACAO_MEDIA": "DURACAO_MEDIA_RAW_MIN"}.get(metric, "NUM_INCENDIOS_TOTAL")
+    agg_level_data = limitar_marcadores(agg_level_data, size_metric_col) # orçamento fixo de marcadores
+    if nivel == "FREGUESIA": # nomes de freguesia repetem-se entre concelhos
+        agg_level_data["FREGUESIA_NOME"] = agg_level_data["FREGUESIA"].astype(str) + " (" + agg_level_data["CONCELHO"].astype(str) + ")"
+        nome_col = "FREGUESIA_NOME"
+    filtro_col = "DISTRITO" if nivel == "DISTRITO" else "CONCELHO" # clicar filtra pelo distrito ou pelo concelho do marcador
+    geo_url = url_geometria(nivel, view) if coropletico else None # só há geometrias para distritos e concelhos
+    return _figura_mapa(agg_level_data, nome_col, filtro_col, metric, show_text_labels, map_height, view=view, geo_url=geo_url)
+
+# URL (estável por tolerância) das geometrias simplificadas adequadas ao zoom, ou None se não houver geometrias.
+# Como a figura só leva a referência, o browser descarrega cada geometria uma vez e reutiliza-a da cache.
+def url_geometria(nivel: str, view: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    if not geometrias_disponiveis(nivel):
+        return None
+    return f"/geo/{nivel}/{tolerancia_para_zoom(view.get('zoom') if view else None):g}.json"
+
+# Sobrepõe ao mapa principal a densidade histórica de ignições do mês (imagem pré-calculada, por baixo dos marcadores)
+def aplicar_camada_risco(fig: go.Figure, mes_val: int, camada: CamadaRisco) -> go.Figure:
+    if not any(trace.type in ("scattermapbox", "choroplethmapbox") for trace in fig.data): # figuras vazias/de aviso
+        return fig
+    nome_mes = "mês médio" if mes_val == 0 else MESES_EXTENSO.get(mes_val, "").lower()
+    fig.update_layout(
+        mapbox_layers=[dict(sourcetype="image", source=f"/risco/{mes_val}.png?v={camada.versao}", coordinates=camada.coordenadas,
+                            opacity=RISCO_OPACIDADE, below="traces")],
+        annotations=list(fig.layout.annotations) + [dict(
+            text=f"Risco histórico ({nome_mes}, {camada.periodo[0]}–{camada.periodo[1]})", x=0.01, y=0.99, xref="paper", yref="paper",
+            xanchor="left", yanchor="top", showarrow=False, font=dict(size=FONT_SIZE_LEGEND_ITEM, color=PALETTE["font"]),
+            bgcolor="rgba(255,255,255,0.75)")]
+    )
+    return fig
+
+# Template do hover do mapa principal (círculos e áreas), conforme a métrica
+# Colunas do customdata do mapa principal (só números; o local vai como código, ver `codificar_customdata`)
+CUSTOMDATA_MAPA = ["FILTRO", "DURACAO_MEDIA_H", "NUM_INCENDIOS_TOTAL", "AREA_ARDIDA_TOTAL", "DURACAO_MEDIA_M", "NUM_INCENDIOS_FLORESTAL", "NUM_INCENDIOS_AGRICOLA"]
+
+# `titulo` é o nome do local no hover: o próprio customdata[0] quando o nome mostrado é o do filtro
+def _hovertemplate_mapa(metric: str, titulo: str = "%{hovertext}") -> str:
+    additional_counts_info = ("<br>Nº Florestal: %{customdata[5]:.0f}<br>Nº Agrícola: %{customdata[6]:.0f}") # Informação adicional de contagens
+    if metric == "NUM_INCENDIOS": 
+        hovertemplate_parts = [f"<b>{titulo}</b><br>Nº Incêndios Total: %{{customdata[2]:.0f}}", additional_counts_info, "<extra></extra>"]
+    elif metric == "AREA_ARDIDA": 
+        hovertemplate_parts = [f"<b>{titulo}</b><br>Área Ardida Total: %{{customdata[3]:,.0f}} ha", additional_counts_info, "<extra></extra>"]
+    elif metric == "DURACAO_MEDIA": 
+        hovertemplate_parts = [f"<b>{titulo}</b><br>Duração Média: " + hover_duracao_hm(1, 4), additional_counts_info, "<extra></extra>"]
+    else: hovertemplate_parts = [f"<b>{titulo}</b><br>Tipo Predominante: %{{fullData.name}}", additional_counts_info, "<extra></extra>"] # Fallback (cada traço é um tipo)
+    return "".join(hovertemplate_parts)
+
+# Desenha o mapa de círculos a partir das agregações por local.
+# `nome_col` é o nome mostrado (hover/texto) e `filtro_col` o valor em customdata[0], usado pelo clique para filtrar.
+# Com `geo_url`, desenha um coroplético cujas áreas são identificadas por `nome_col`.
+def _figura_mapa(agg_level_data: pd.DataFrame, nome_col: str, filtro_col: str, metric: str, show_text_labels: bool, map_height: int,
+                 view: Optional[Dict[str, Any]] = None, geo_url: Optional[str] = None) -> go.Figure:
+    # Define a métrica para o tamanho dos círculos no mapa
+    size_metric_col = {"NUM_INCENDIOS": "NUM_INCENDIOS_TOTAL", "AREA_ARDIDA": "AREA_ARDIDA_TOTAL", "DURACAO_MEDIA": "DURACAO_MEDIA_RAW_MIN"}.get(metric, "NUM_INCENDIOS_TOTAL")
+    text_labels_on_map = agg_level_data[nome_col] if show_text_labels else None # Define se mostra texto no mapa
+
+    # Colunas para customdata (informação no hover): números e o local codificado, com os rótulos enviados uma vez
+    agg_level_data = agg_level_data.assign(FILTRO=agg_level_data[filtro_col])
+    agg_level_data["DURACAO_MEDIA_H"], agg_level_data["DURACAO_MEDIA_M"] = horas_minutos(agg_level_data["DURACAO_MEDIA_RAW_MIN"])
+    for col_name in CUSTOMDATA_MAPA: # Garante que todas as colunas de customdata existem
+        if col_name not in agg_level_data.columns: agg_level_data[col_name] = 0
+    if "TIPO_PREDOMINANTE" not in agg_level_data.columns: agg_level_data["TIPO_PREDOMINANTE"] = "Desconhecido"
+    customdata, rotulos = codificar_customdata(agg_level_data, CUSTOMDATA_MAPA)
+    agg_level_data = agg_level_data.assign(**customdata) # o px lê o customdata pelos nomes das colunas
+    # Se o nome mostrado é o do filtro, o hover usa o customdata[0] já resolvido em vez de repetir os nomes em `hovertext`
+    titulo_hover = "%{customdata[0]}" if nome_col == filtro_col else "%{hovertext}"
+    hovertext = None if nome_col == filtro_col else agg_level_data[nome_col]
+
+    if geo_url is not None: # Modo coroplético: cor da área pela métrica; a geometria segue só como URL
+        fig = go.Figure(go.Choroplethmapbox(
+            geojson=geo_url, featureidkey="id", locations=agg_level_data[nome_col], z=agg_level_data[size_metric_col],
+            colorscale=[[0.0, PALETTE["escala_area_inicio"]], [0.5, PALETTE["escala_area_meio"]], [1.0, PALETTE["escala_area_fim"]]],
+            marker=dict(opacity=0.8, line=dict(width=0.6, color=PALETTE["card_bg"])),
+            customdata=customdata, hovertext=hovertext, hovertemplate=_hovertemplate_mapa(metric, titulo_hover),
+            colorbar=dict(title=dict(text=TITULOS_METRICAS.get(metric, ""), font=dict(size=FONT_SIZE_COLORBAR_TITLE)),
+                          orientation="h", x=0.5, xanchor="center", y=0.01, yanchor="bottom", len=0.7, thickness=10,
+                          tickfont=dict(size=FONT_SIZE_COLORBAR_TICK), bgcolor="rgba(255,255,255,0.75)")
+        ))
+    else:
+        # Cria o mapa de dispersão 
+        fig = px.scatter_mapbox(
+            agg_level_data, lat="LAT", lon="LON",
+            size=agg_level_data[size_metric_col] if size_metric_col in agg_level_data and pd.api.types.is_numeric_dtype(agg_level_data[size_metric_col]) and agg_level_data[size_metric_col].sum() > 0 else None, # Tamanho do círculo
+            size_max=18, color="TIPO_PREDOMINANTE", color_discrete_map=COLOR_MAP_TIPO, # Cor pelo tipo predominante
+            hover_name=None if hovertext is None else nome_col, custom_data=CUSTOMDATA_MAPA, text=text_labels_on_map
+        )
+        fig.update_traces(
+            hovertemplate=_hovertemplate_mapa(metric, titulo_hover), # Define o hover dinamicamente com base na métrica
+            textposition='top center' if show_text_labels else None, # Posição do texto, se mostrado
+            textfont=dict(size=FONT_SIZE_MAP_TEXT, color=PALETTE["font"]) if show_text_labels else None,
+            selected=dict(marker=dict(opacity=1, size=22)), unselected=dict(marker=dict(opacity=0.6)), # Estilos para seleção
+            marker=dict(sizemin=3) # Tamanho mínimo dos círculos
+        )
+    fig.update_layout(
+        title=None, autosize=True, height=map_height, margin=dict(l=0, r=0, t=0, b=0), # Layout geral
+        mapbox=dict(style="carto-positron", center={"lat": 39.5, "lon": -8.0}, zoom=5.56), # Estilo e centro do mapa base
+        paper_bgcolor=PALETTE["bg"], plot_bgcolor=PALETTE["card_bg"], font_color=PALETTE["font"],
+        legend=dict( # Configuração da legenda
+            title=dict(text="Tipo Predom.", font=dict(size=FONT_SIZE_LEGEND_TITLE)), orientation="h",
+            yanchor="bottom", y=0.01, xanchor="center", x=0.5, bgcolor="rgba(255,255,255,0.75)", # Posição e estilo
+            borderwidth=0, font=dict(size=FONT_SIZE_LEGEND_ITEM), itemsizing='constant'
+        ), uirevision='map_layout_v3' # uirevision para manter zoom/pan entre atualizações parciais
+    )
+    if view is not None and "center" in view and "zoom" in view: # Mantém a vista atual (modo automático)
+        fig.update_layout(mapbox=dict(center=view["center"], zoom=view["zoom"]))
+    return aplicar_rotulos(fig, rotulos)
+
+# Gráfico de Perfil Horário (variação da métrica ao longo do dia) a partir do agregado por hora (`feature_store.perfil_horario`)
+def fig_perfil_horario_agregado(agg_hora_final: pd.DataFrame, metric: str, active_filter_name_for_title: str, ano: int, mes_val: int, height: int = 200) -> go.Figure:
+    if agg_hora_final.empty:
+        return create_empty_figure(f"Sem dados para perfil horário<br>({active_filter_name_for_title.lower()} - {get_time_period_string(ano, mes_val).lower()}).", height=height)
+    agg_hora_final = agg_hora_final.copy()
+    agg_hora_final["HORA_FMT"] = agg_hora_final["HORA"].astype(int).astype(str).str.zfill(2) + "h" # Formata hora para display (00h, 01h, ...)
+    
+    # Valores para o gráfico (média, limite superior/inferior da banda)
+    y_mean = agg_hora_final.get("VALOR_MEAN", pd.Series(0.0, index=agg_hora_final.index))
+    y_std = agg_hora_final.get("VALOR_STD", pd.Series(0.0, index=agg_hora_final.index))
+    y_upper = (y_mean + y_std)
+    y_lower = (y_mean - y_std).clip(lower=0) # Garante que o limite inferior não é negativo
+    
+    # Inicializa variáveis que dependem da métrica
+    custom_data_scatter = None; hovertemplate = None; chart_title = ""; y_axis_title_text = ""; tickformat_yaxis = None
+    y_plot_values = y_mean; y_upper_plot_values = y_upper; y_lower_plot_values = y_lower
+    y_axis_range_effective_limit = y_upper_plot_values.max() * 1.3 if not y_upper_plot_values.empty else 0 # Define limite do eixo Y
+
+    # Ajustes específicos para cada métrica
+    if metric == "DURACAO_MEDIA":
+        y_plot_values = y_mean / 60.0; y_upper_plot_values = y_upper / 60.0; y_lower_plot_values = y_lower / 60.0 # Converte para horas
+        y_axis_range_effective_limit = max(1.0, y_upper_plot_values.max() * 1.3 if not y_upper_plot_values.empty else 1.0) # Ajusta limite do eixo Y
+        agg_hora_final["VALOR_MEAN_DHM_STR"] = format_duration_dhm_verbose_refined_series(y_mean) # Formata média para hover
+        agg_hora_final["VALOR_STD_HM_STR"] = format_duration_hm_series(y_std) # Formata std para hover
+        custom_data_scatter = np.stack((agg_hora_final["VALOR_MEAN_DHM_STR"], agg_hora_final["VALOR_STD_HM_STR"]), axis=-1)
+        trace_name = "Duração Média"; hovertemplate = "<b>Duração Média:</b> %{customdata[0]}<br><b>Desvio Padrão:</b> ±%{customdata[1]}<extra></extra>"
+        chart_title = "Evolução Horária da Duração Média"; y_axis_title_text = "Duração Média (h)"; tickformat_yaxis = ',.0~f'
+    elif metric == "AREA_ARDIDA":
+        y_axis_range_effective_limit = max(10.0, y_upper_plot_values.max() * 1.3 if not y_upper_plot_values.empty else 10.0)
+        trace_name = "Área Média (ha)"; hovertemplate = "<b>Área média (ha)</b>: %{y:,.1f}<br>Desvio padrão: ±%{customdata[0]:,.1f}<extra></extra>"
+        chart_title = "Evolução Horária da Área Ardida Média"; y_axis_title_text = "área média (ha)"; custom_data_scatter = np.stack((y_std.round(1),), axis=-1); tickformat_yaxis = ',.0f'
+    else: # NUM_INCENDIOS
+        y_axis_range_effective_limit = max(10.0, y_upper_plot_values.max() * 1.3 if not y_upper_plot_values.empty else 10.0)
+        trace_name = "Nº Incêndios"; hovertemplate = "<b>Nº incêndios</b>: %{y:.0f}<br>Faixa (±10%): %{customdata[0]:.0f} – %{customdata[1]:.0f}<extra></extra>"
+        chart_title = "Evolução Horária do Nº de Incêndios"; y_axis_title_text = "Nº Incêndios"; custom_data_scatter = np.stack((y_lower.round(0), y_upper.round(0)), axis=-1); tickformat_yaxis = ',.0f'
+
+    fig = go.Figure()
+    # para a banda de variabilidade (área sombreada)
+    fig.add_trace(go.Scatter(x=agg_hora_final["HORA_FMT"].tolist() + agg_hora_final["HORA_FMT"].tolist()[::-1], y=y_upper_plot_values.tolist() + y_lower_plot_values.tolist()[::-1], fill='toself', fillcolor='rgba(255, 182, 109, 0.3)', line=dict(color='rgba(255,255,255,0)'), hoverinfo="skip", showlegend=False))
+    fig.add_trace(go.Scatter(
+        x=agg_hora_final["HORA_FMT"],
+        y=y_plot_values,
+        mode='lines+markers', name=trace_name,
+        line=dict(color=PALETTE.get("accent_red", "#E74C3C"), width=2),
+        marker=dict(color=PALETTE.get("accent_orange", "#F39C12"), size=6, line=dict(width=1, color='white')),
+        customdata=custom_data_scatter, # Dados para hover
+        hovertemplate=hovertemplate # Template do hover
+    ))
+    fig.update_layout(height=height, margin=dict(l=20, r=20, t=20, b=40), paper_bgcolor=PALETTE.get("card_bg", "#FFFFFF"), plot_bgcolor=PALETTE.get("card_bg", "#FFFFFF"), font=dict(color=PALETTE.get("font", "#2C3E50")),
+                      xaxis=dict(title=None, tickangle=-45, showgrid=False, tickfont=dict(size=FONT_SIZE_TICK_LABEL), fixedrange=True), # Eixo X (Hora)
+                      yaxis=dict(title=dict(text=y_axis_title_text, font=dict(size=FONT_SIZE_AXIS_TITLE)), showgrid=True, gridcolor="rgba(0,0,0,0.05)", tickfont=dict(size=FONT_SIZE_TICK_LABEL), range=[-0.02 * y_axis_range_effective_limit, y_axis_range_effective_limit]), # Eixo Y
+                      hovermode="x unified", showlegend=False) # Hover unificado por X
+    if tickformat_yaxis: 
+        fig.update_layout(yaxis_tickformat=tickformat_yaxis, yaxis_nticks=5) # Formato e número de ticks do eixo Y
+    else: 
+        fig.update_layout(yaxis_tickmode='auto', yaxis_nticks=5)
+    return fig
+
+# Gráfico de Pizza para Tipos de Causa
+def fig_pie_causas(df_chart_data: pd.DataFrame, metric: str, active_filter_name_for_title: str, ano: int, mes_val: int, height: int = 200) -> go.Figure:
+    time_period = get_time_period_string(ano, mes_val)
+    empty_msg_base = f"Sem dados de tipos de causa ({metric.lower()})<br>para {active_filter_name_for_title.lower()} ({time_period.lower()})."
+
+    if df_chart_data.empty or "TIPOCAUSA" not in df_chart_data.columns:
+        return create_empty_figure(empty_msg_base, height=height)
+
+    df_causas_data = df_chart_data.copy()
+    df_causas_data["TIPOCAUSA"] = df_causas_data["TIPOCAUSA"].fillna("NÃO ESPECIFICADA") # Preenche NaNs
+
+    hover_label_metric = ""; hover_unit = ""; custom_data_column_names = [] # Para px.pie custom_data
+
+    # Agrega dados com base na métrica selecionada
+    if metric == "NUM_INCENDIOS":
+        agg_data = df_causas_data["TIPOCAUSA"].value_counts().reset_index()
+        agg_data.columns = ["TIPOCAUSA", "Valor"]
+        hover_label_metric = "Nº Incêndios"
+    elif metric == "AREA_ARDIDA":
+        agg_data = df_causas_data.groupby("TIPOCAUSA")["AREATOTAL"].sum().reset_index(name="Valor")
+        hover_label_metric = "Área Ardida"; hover_unit = " ha"
+    elif metric == "DURACAO_MEDIA": # Para Duração, agregamos a soma e formatamos para hover
+        df_causas_data['DURACAO_VALIDA'] = pd.to_numeric(df_causas_data['DURACAO'], errors='coerce').fillna(0)
+        agg_data = df_causas_data.groupby("TIPOCAUSA")["DURACAO_VALIDA"].sum().reset_index(name="Valor")
+        hover_label_metric = "Duração Total"
+        agg_data["ValorFormatadoHM"] = format_duration_hm_series(agg_data["Valor"])
+        custom_data_column_names = ["ValorFormatadoHM"] # Nome da coluna para px.pie custom_data
+    else: # Fallback para NUM_INCENDIOS
+        agg_data = df_causas_data["TIPOCAUSA"].value_counts().reset_index()
+        agg_data.columns = ["TIPOCAUSA", "Valor"]
+        hover_label_metric = "Nº Incêndios"
+
+    agg_data = agg_data[agg_data["Valor"] > 0] # Remove causas com valor 0
+    if agg_data.empty: 
+        return create_empty_figure(empty_msg_base, height=height)
+    agg_data = agg_data.sort_values(by="Valor", ascending=False) # Ordena por valor
+
+    if metric == "DURACAO_MEDIA":
+        # %{customdata[0]} refere-se à primeira (e única) coluna em custom_data_column_names ('ValorFormatadoHM')
+        hovertemplate_str = f"<b>%{{label}}</b><br>{hover_label_metric}: %{{customdata[0]}} (%{{percent}})<extra></extra>"
+    else: # Para outras métricas, usa %{value}
+        hovertemplate_str = f"<b>%{{label}}</b><br>{hover_label_metric}: %{{value:,.0f}}{hover_unit} (%{{percent}})<extra></extra>"
+
+    # Cria o gráfico de pizza
+    fig = px.pie(agg_data, names="TIPOCAUSA", values="Valor", hole=0.4, # hole para efeito "donut"
+                 color="TIPOCAUSA", color_discrete_map=TIPOCAUSA_COLOR_MAP, # Cores personalizadas
+                 custom_data=custom_data_column_names if custom_data_column_names else None) # CORREÇÃO: custom_data aqui
+
+    fig.update_traces(
+        textposition='outside', textinfo='label+percent', textfont_size=FONT_SIZE_PIE_TEXT, # Posição e info do texto nas fatias
+        marker=dict(line=dict(color=PALETTE.get("card_bg", "#FFFFFF"), width=1.5)), # Linha de separação entre fatias
+        pull=[0.05 if i == 0 else 0 for i in range(len(agg_data))], # "Puxa" a maior fatia
+        insidetextorientation='horizontal',
+        hovertemplate=hovertemplate_str # Template do hover
+    )
+    fig.update_layout(
+        title=None, margin=dict(l=20, r=20, t=25, b=20), font=dict(color=PALETTE["font"]),
+        showlegend=False, paper_bgcolor=PALETTE["card_bg"], plot_bgcolor=PALETTE["card_bg"],
+        uniformtext_minsize=FONT_SIZE_PIE_TEXT -1, uniformtext_mode='hide', height=height # Ajuste de texto uniforme
+    )
+    return fig
+
+# Nuvem de Palavras para Famílias de Causa
+def img_nuvem_palavras(df_chart_data: pd.DataFrame, metric: str, active_filter_name_for_title: str, ano: int, mes_val: int, width: int = 400, height: int = 300):
+    time_period = get_time_period_string(ano, mes_val)
+    empty_msg_base = f"Sem dados de famílias de causa ({metric.lower()})\npara {active_filter_name_for_title.lower()} ({time_period.lower()})."
+    if df_chart_data.empty or "CAUSAFAMILIA" not in df_chart_data.columns or df_chart_data["CAUSAFAMILIA"].dropna().empty:
+        return empty_msg_base # Retorna mensagem se não houver dados
+
+    df_nuvem_data = df_chart_data.copy()
+    frequencies = {} # Dicionário para armazenar frequências/valores das famílias de causa
+    
+    # Calcula frequências/valores com base na métrica
+    if metric == "NUM_INCENDIOS": 
+        frequencies = df_nuvem_data["CAUSAFAMILIA"].dropna().value_counts().to_dict()
+    elif metric == "AREA_ARDIDA": 
+        frequencies = df_nuvem_data.groupby("CAUSAFAMILIA")["AREATOTAL"].sum().fillna(0).to_dict()
+    elif metric == "DURACAO_MEDIA":
+        df_nuvem_data['DURACAO_VALIDA'] = pd.to_numeric(df_nuvem_data['DURACAO'], errors='coerce').fillna(0)
+        frequencies = df_nuvem_data.groupby("CAUSAFAMILIA")["DURACAO_VALIDA"].sum().fillna(0).to_dict()
+    else: frequencies = df_nuvem_data["CAUSAFAMILIA"].dropna().value_counts().to_dict() # Fallback
+    
+    frequencies = {k: v for k, v in frequencies.items() if v > 0} # Remove famílias com valor 0
+    if not frequencies: return empty_msg_base
+
+    from wordcloud import WordCloud # import pesado, só quando há uma nuvem para gerar
+    wc = WordCloud(width=width, height=height, background_color=PALETTE["card_bg"], color_func=wordcloud_color_func, # Usa a função de cor personalizada
+                   max_font_size=WORDCLOUD_MAX_FONT_SIZE, min_font_size=WORDCLOUD_MIN_FONT_SIZE, min_word_length=1)
+    try:
+        wc.generate_from_frequencies(frequencies) 
+    except ValueError as e: #
+        return f"Erro ao gerar nuvem de palavras: {e}.\nVerifique os dados de frequência para\n{active_filter_name_for_title.lower()} ({time_period.lower()})."
+    
+    # Converte a imagem da nuvem para formato base64 para embutir em HTML
+    buffer = BytesIO()
+    wc.to_image().save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+# Gráfico de Violino para Distribuição de Variáveis Meteorológicas
+def fig_violin_distribution(df_chart_data: pd.DataFrame, active_filter_name_for_title: str, ano: int, mes_val: int, height: int = 305):
+    time_period = get_time_period_string(ano, mes_val)
+    empty_msg_base = f"Sem dados meteorológicos para {active_filter_name_for_title.lower()}<br>({time_period.lower()})."
+    if df_chart_data.empty: 
+        return create_empty_figure(empty_msg_base, height=height)
+    
+    meteo_cols = ["TEMPERATURA", "HUMIDADERELATIVA", "VENTOINTENSIDADE"] # Colunas relevantes
+    df_meteo = df_chart_data[meteo_cols].dropna(how='all') # Remove linhas onde todas estas colunas são NaN
+    if df_meteo.empty: 
+        return create_empty_figure(empty_msg_base, height=height)
+    
+    # Transforma o DataFrame para formato "longo" (ideal para px.violin)
+    melted_df = df_meteo.melt(var_name="ParametroTecnico", value_name="ValorMedido").dropna()
+    melted_df["ParametroDisplay"] = melted_df["ParametroTecnico"].map(METEO_LABELS_MAP) # Mapeia para nomes de display
+    if melted_df.empty or melted_df["ParametroDisplay"].isnull().all(): 
+        return create_empty_figure(empty_msg_base, height=height)
+    
+    # Define a ordem e cores dos violinos
+    valid_ordered_params = [METEO_LABELS_MAP.get(p) for p in ["TEMPERATURA", "HUMIDADERELATIVA", "VENTOINTENSIDADE"] if METEO_LABELS_MAP.get(p) is not None]
+    color_map = {METEO_LABELS_MAP.get(k,k):v for k,v in {"TEMPERATURA":PALETTE["accent_red"], "HUMIDADERELATIVA":PALETTE["accent_orange"], "VENTOINTENSIDADE":PALETTE["brand"]}.items()}
+    
+    # Calcula estatísticas para o hover
+    hover_stats = {}
+    for param in valid_ordered_params:
+        param_data = melted_df[melted_df["ParametroDisplay"] == param]["ValorMedido"]
+        if not param_data.empty: 
+            hover_stats[param] = {"min": round(param_data.min()), "max": round(param_data.max()), "media": round(param_data.mean()), "mediana": round(param_data.median())}
+    
+    # Cria o gráfico de violino
+    fig = px.violin(melted_df, x="ParametroDisplay", y="ValorMedido", box=True, points=False, color="ParametroDisplay", # box=True mostra boxplot interno
+                    color_discrete_map=color_map, category_orders={"ParametroDisplay": valid_ordered_params}, # Ordem e cores
+                    labels={"ParametroDisplay":"Parâmetro", "ValorMedido":"Valor"})
+    
+    # Personaliza o hovertemplate para cada violino
+    for i, param in enumerate(valid_ordered_params):
+        if param in hover_stats:
+            stats = hover_stats[param]
+            fig.data[i].hovertemplate = f"<b>{param}</b><br>Média: {stats['media']}<br>Mediana: {stats['mediana']}<br>Mínimo: {stats['min']}<br>Máximo: {stats['max']}<extra></extra>"
+    
+    fig.update_traces(meanline_visible=True, width=0.6, marker=dict(opacity=0.3), line=dict(width=1.2)) # Mostra linha da média
+    fig.update_layout(
+        height=height, paper_bgcolor=PALETTE["card_bg"], plot_bgcolor=PALETTE["card_bg"], font_color=PALETTE["font"],
+        margin=dict(l=20,r=20,t=20,b=20), showlegend=False,
+        xaxis=dict(title=None, tickfont=dict(size=FONT_SIZE_TICK_LABEL), fixedrange=True), # Eixo X (Parâmetros)
+        yaxis=dict(title=dict(text="Valor Registado", font=dict(size=FONT_SIZE_AXIS_TITLE)), tickfont=dict(size=FONT_SIZE_TICK_LABEL), showgrid=True, gridcolor="rgba(0,0,0,0.05)"), # Eixo Y (Valores)
+        hovermode='closest', hoverlabel=dict(bgcolor="rgba(255,255,255,0.85)", bordercolor=PALETTE["font"], font=dict(size=12, color=PALETTE["font"]), align="left")
+    )
+    return fig
+
+# Violino com as densidades calculadas no servidor (`densidade.resumo_violino`, uma por variável):
+# cada violino é um contorno fechado de 2 × N_PONTOS_KDE pontos, mais a caixa (Q1–Q3), os bigodes, a mediana e a média,
+# pelo que o tamanho da figura é o mesmo para 10 ou 10 000 incêndios (o px.violin envia todos os valores ao browser).
+def fig_violin_kde(resumos: Dict[str, Optional[Dict[str, Any]]], active_filter_name_for_title: str, ano: int, mes_val: int, height: int = 305) -> go.Figure:
+    time_period = get_time_period_string(ano, mes_val)
+    parametros = [p for p in ["TEMPERATURA", "HUMIDADERELATIVA", "VENTOINTENSIDADE"] if resumos.get(p) is not None]
+    if not parametros:
+        return create_empty_figure(f"Sem dados meteorológicos para {active_filter_name_for_title.lower()}<br>({time_period.lower()}).", height=height)
+
+    cores = {"TEMPERATURA": PALETTE["accent_red"], "HUMIDADERELATIVA": PALETTE["accent_orange"], "VENTOINTENSIDADE": PALETTE["brand"]}
+    meia_largura = 0.3 # metade da largura máxima de cada violino (todos à mesma largura, como o scalemode "width")
+    fig = go.Figure()
+    for i, param in enumerate(parametros):
+        r = resumos[param]
+        nome = METEO_LABELS_MAP.get(param, param)
+        escala = meia_largura / r["densidade"].max() if r["densidade"].max() > 0 else 0.0
+        lado = r["densidade"] * escala
+        hover = (f"<b>{nome}</b><br>Média: {round(r['media'])}<br>Mediana: {round(r['mediana'])}<br>"
+                 f"Mínimo: {round(r['min'])}<br>Máximo: {round(r['max'])}<br>Q1–Q3: {round(r['q1'])}–{round(r['q3'])}<br>n = {r['n']:,}".replace(",", " "))
+        fig.add_trace(go.Scatter( # contorno: lado direito de baixo para cima e lado esquerdo de cima para baixo
+            x=np.r_[i + lado, i - lado[::-1]], y=np.r_[r["grelha"], r["grelha"][::-1]], mode="lines", fill="toself",
+            fillcolor="rgba({},{},{},0.5)".format(*hex_to_rgb(cores[param])), line=dict(color=cores[param], width=1.2),
+            hoveron="fills", text=hover, hoverinfo="text", name=nome))
+        fig.add_trace(go.Scatter(x=[i, i], y=[r["bigode_inf"], r["bigode_sup"]], mode="lines", # bigodes
+                                 line=dict(color=PALETTE["font"], width=1), hoverinfo="skip"))
+        fig.add_trace(go.Scatter(x=[i, i], y=[r["q1"], r["q3"]], mode="lines", line=dict(color=PALETTE["font"], width=7), # caixa Q1–Q3
+                                 text=[hover, hover], hovertemplate="%{text}<extra></extra>"))
+        meia_media = float(np.interp(r["media"], r["grelha"], lado)) # linha da média até ao contorno do violino
+        fig.add_trace(go.Scatter(x=[i - meia_media, i + meia_media], y=[r["media"], r["media"]], mode="lines",
+                                 line=dict(color=PALETTE["font"], width=1, dash="dot"), hoverinfo="skip"))
+        fig.add_trace(go.Scatter(x=[i], y=[r["mediana"]], mode="markers", # mediana
+                                 marker=dict(color="white", size=5, line=dict(color=PALETTE["font"], width=1)), hoverinfo="skip"))
+
+    fig.update_layout(
+        height=height, paper_bgcolor=PALETTE["card_bg"], plot_bgcolor=PALETTE["card_bg"], font_color=PALETTE["font"],
+        margin=dict(l=20,r=20,t=20,b=20), showlegend=False,
+        xaxis=dict(title=None, tickvals=list(range(len(parametros))), ticktext=[METEO_LABELS_MAP.get(p, p) for p in parametros], # Eixo X (Parâmetros)
+                   range=[-0.5, len(parametros) - 0.5], tickfont=dict(size=FONT_SIZE_TICK_LABEL), showgrid=False, zeroline=False, fixedrange=True),
+        yaxis=dict(title=dict(text="Valor Registado", font=dict(size=FONT_SIZE_AXIS_TITLE)), tickfont=dict(size=FONT_SIZE_TICK_LABEL), showgrid=True, gridcolor="rgba(0,0,0,0.05)"), # Eixo Y (Valores)
+        hovermode='closest', hoverlabel=dict(bgcolor="rgba(255,255,255,0.85)", bordercolor=PALETTE["font"], font=dict(size=12, color=PALETTE["font"]), align="left")
+    )
+    return fig
+
+# Gráfico de Dispersão: Temperatura vs Humidade, com tamanho dos pontos pela Intensidade do Vento
+# Acima de `max_pontos` incêndios segue uma amostra estratificada por tipo × classe de vento (`amostra_estratificada`),
+# que mantém os extremos e os outliers; com `x_range`/`y_range` (zoom) só entram os incêndios dessa zona, pelo que
+# a amostra vai sendo refinada até à resolução total. A escala dos tamanhos é a da seleção completa (não muda com o zoom).
+def fig_scatter_meteo(df_chart_data: pd.DataFrame, active_filter_name_for_title: str, ano: int, mes_val: int, height: int = 305,
+                      x_range: Optional[Tuple[float, float]] = None, y_range: Optional[Tuple[float, float]] = None,
+                      max_pontos: int = MAX_PONTOS_DISPERSAO) -> go.Figure:
+    time_period_str = get_time_period_string(ano, mes_val)
+    base_error_msg = f"Sem dados de Temp/Hum/Vento (Agrícola/Florestal)<br>para {active_filter_name_for_title.lower()} ({time_period_str.lower()})."
+    if df_chart_data.empty: return create_empty_figure(base_error_msg, height=height)
+    
+    meteo_cols = ["TEMPERATURA", "HUMIDADERELATIVA", "VENTOINTENSIDADE", "TIPO"] # Colunas necessárias
+    df_to_filter = df_chart_data.copy()
+    df_to_filter['VENTOINTENSIDADE'] = pd.to_numeric(df_to_filter['VENTOINTENSIDADE'], errors='coerce') # Converte Vento para numérico
+    df_meteo_tipo = df_to_filter[meteo_cols].dropna(subset=[col for col in meteo_cols if col != 'TIPO']) # Remove NaNs (exceto em TIPO)
+    # Filtra apenas para tipos Agrícola e Florestal e vento não negativo
+    df_scatter = df_meteo_tipo[df_meteo_tipo["TIPO"].isin(["Agrícola", "Florestal"]) & (df_meteo_tipo["VENTOINTENSIDADE"] >= 0)].copy()
+    if df_scatter.empty: 
+        return create_empty_figure(base_error_msg, height=height)
+    
+    present_tipos = df_scatter["TIPO"].unique()
+    current_color_map = {tipo: COLOR_MAP_TIPO[tipo] for tipo in present_tipos if tipo in COLOR_MAP_TIPO}
+    if not current_color_map: 
+        return create_empty_figure(f"Tipos 'Agrícola' ou 'Florestal' não encontrados<br>ou sem mapeamento de cor. {base_error_msg}", height=height)
+    
+    size_max_dynamic = 15 # Tamanho max dos pontos
+    vento_max = df_scatter["VENTOINTENSIDADE"].max()
+    if x_range is not None: # zona visível (zoom)
+        df_scatter = df_scatter[df_scatter["TEMPERATURA"].between(*x_range)]
+    if y_range is not None:
+        df_scatter = df_scatter[df_scatter["HUMIDADERELATIVA"].between(*y_range)]
+    n_zona = len(df_scatter)
+    estratos = codificar(df_scatter["TIPO"].to_numpy())[0] * (len(CLASSES_VENTO_AMOSTRA) + 1) + np.digitize(df_scatter["VENTOINTENSIDADE"].to_numpy(), CLASSES_VENTO_AMOSTRA)
+    df_scatter = df_scatter.iloc[amostra_estratificada([df_scatter[c].to_numpy() for c in ["TEMPERATURA", "HUMIDADERELATIVA", "VENTOINTENSIDADE"]], estratos, max_pontos)]
+    
+    fig = px.scatter(
+        df_scatter, x="TEMPERATURA", y="HUMIDADERELATIVA", color="TIPO", symbol="TIPO", # Eixos, cor e símbolo
+        symbol_map={"Florestal": "circle", "Agrícola": "circle"}, # Mesmo símbolo para ambos os tipos
+        size="VENTOINTENSIDADE", size_max=size_max_dynamic, # Tamanho dos pontos pelo Vento
+        labels={"TEMPERATURA": "Temperatura (°C)", "HUMIDADERELATIVA": "Humidade Relativa (%)", "TIPO": "tipo", "VENTOINTENSIDADE": "Vento (km/h)"}, # Labels dos eixos
+        color_discrete_map=current_color_map, custom_data=['VENTOINTENSIDADE'], # Cores e customdata para hover
+        # Scattergl a partir do limiar no modo de alto volume; senão o px decide (WebGL acima de 1000 pontos)
+        render_mode=("webgl" if usar_webgl(len(df_scatter)) else "svg") if ALTO_VOLUME else "auto",
+    )
+    fig.update_traces(
+        marker=dict(opacity=0.8, line=dict(width=0, color='rgba(0,0,0,0)'), sizeref=2.0 * max(vento_max, 1e-9) / size_max_dynamic ** 2), # escala da seleção completa
+        selector=dict(mode='markers'), # scatter ou scattergl
+        hovertemplate="<b>tipo: %{fullData.name}</b><br>temp: %{x:.1f}°c<br>hum: %{y:.1f}%<br>vento: %{customdata[0]:.1f} km/h<br><b>Tamanho por Vento</b><extra></extra>" # Template do hover
+    )
+    fig.update_layout(
+        title=None, height=height, paper_bgcolor=PALETTE.get("card_bg", "#FFFFFF"), plot_bgcolor=PALETTE.get("card_bg", "#FFFFFF"),
+        font_color=PALETTE.get("font", "#2C3E50"), margin=dict(l=40, r=20, t=30, b=40),
+        xaxis=dict(title=dict(text="Temperatura (°C)", font=dict(size=FONT_SIZE_AXIS_TITLE)), tickfont=dict(size=FONT_SIZE_TICK_LABEL), showgrid=True, gridcolor="rgba(0,0,0,0.05)"), # Eixo X
+        yaxis=dict(title=dict(text="Humidade Relativa (%)", font=dict(size=FONT_SIZE_AXIS_TITLE)), tickfont=dict(size=FONT_SIZE_TICK_LABEL), showgrid=True, gridcolor="rgba(0,0,0,0.05)"), # Eixo Y
+        legend=dict( # Legenda
+            title=dict(text="Tipo", font=dict(size=FONT_SIZE_LEGEND_TITLE)), font=dict(size=FONT_SIZE_LEGEND_ITEM),
+            orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5, itemsizing='constant', bgcolor='rgba(255,255,255,0.7)'
+        ),
+        uirevision=f"dispersao-{active_filter_name_for_title}-{ano}-{mes_val}" # mantém o zoom quando a amostra é refinada
+    )
+    if x_range is not None: fig.update_layout(xaxis_range=list(x_range))
+    if y_range is not None: fig.update_layout(yaxis_range=list(y_range))
+    if len(df_scatter) < n_zona: # amostra: quantos incêndios estão desenhados (aproximar mostra os restantes)
+        fig.add_annotation(text=f"{len(df_scatter):,} de {n_zona:,} incêndios".replace(",", " "), xref="paper", yref="paper", x=1, y=0,
+                           xanchor="right", yanchor="bottom", showarrow=False, bgcolor="rgba(255,255,255,0.7)",
+                           font=dict(size=FONT_SIZE_TICK_LABEL, color=PALETTE["font"]))
+    return fig
+
+# Intervalos visíveis dos eixos x e y de um gráfico cartesiano após zoom/pan (None no eixo que não mudou).
+# Devolve None se o evento não mexe nos eixos (ex: autosize) e (None, None) no duplo clique (volta à vista completa).
+def intervalos_xy_de_relayout(relayout_data: Optional[Dict[str, Any]]) -> Optional[Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]]]]:
+    if not relayout_data:
+        return None
+    if relayout_data.get("xaxis.autorange") or relayout_data.get("yaxis.autorange"):
+        return None, None
+    intervalos = []
+    for eixo in ("xaxis", "yaxis"):
+        limites = [relayout_data.get(f"{eixo}.range[0]"), relayout_data.get(f"{eixo}.range[1]")]
+        if None in limites and isinstance(relayout_data.get(f"{eixo}.range"), list):
+            limites = relayout_data[f"{eixo}.range"]
+        try:
+            inicio, fim = (float(v) for v in limites)
+        except (TypeError, ValueError):
+            intervalos.append(None); continue
+        intervalos.append((min(inicio, fim), max(inicio, fim)))
+    return None if intervalos == [None, None] else tuple(intervalos)
+
+# Calcula a vista do mapa (centro e zoom) com base nos dados e filtros selecionados
+def _calculate_map_view(df_geo: pd.DataFrame, sel_dist: str, sel_conc: str):
+    if df_geo.empty or 'LAT' not in df_geo.columns or 'LON' not in df_geo.columns: 
+        return {"center": DEFAULT_CENTER_PT, "zoom": ZOOM_PORTUGAL} # Default se não houver dados
+    
+    # Calcula o centro como a média das latitudes e longitudes
+    center_lat = df_geo["LAT"].mean(); center_lon = df_geo["LON"].mean()
+    if pd.isna(center_lat) or pd.isna(center_lon): 
+        return {"center": DEFAULT_CENTER_PT, "zoom": ZOOM_PORTUGAL} # Default se médias forem NaN
+    
+    view = {"center": {"lat": center_lat, "lon": center_lon}}
+    
+    # Ajusta o zoom com base na seleção de concelho ou distrito
+    if sel_conc != "Todos": # Se um concelho está selecionado
+        lat_min, lat_max = df_geo["LAT"].min(), df_geo["LAT"].max()
+        lon_min, lon_max = df_geo["LON"].min(), df_geo["LON"].max()
+        if pd.notna(lat_min) and pd.notna(lat_max) and pd.notna(lon_min) and pd.notna(lon_max):
+            # Calcula o zoom com base na extensão geográfica dos dados do concelho
+            lat_span = lat_max - lat_min; lon_span = lon_max - lon_min; max_span = max(lat_span, lon_span)
+            if max_span < 0.001: 
+                zoom = 14
+            elif max_span < 0.05: 
+                zoom = 12
+            elif max_span < 0.15: 
+                zoom = 11
+            elif max_span < 0.4: 
+                zoom = 10
+            elif max_span < 1.0: 
+                zoom = 9
+            else: zoom = 8
+            view["zoom"] = min(zoom, MAX_ZOOM_CONCELHO) # Limita ao zoom máximo para concelho
+        else: 
+            view["zoom"] = ZOOM_DISTRITO # Fallback para zoom de distrito
+    elif sel_dist != "Todos": 
+        view["zoom"] = ZOOM_DISTRITO # Zoom de distrito
+    else: # Nenhum filtro geográfico específico (Portugal Continental)
+        view["center"] = DEFAULT_CENTER_PT; view["zoom"] = ZOOM_PORTUGAL
+    return view
+
+# Cria um mapa de dispersão como fallback para mapas meteorológicos de densidade quando há poucos pontos
+def _create_meteo_scatter_fallback_map(df_display, variable, var_label, color_scale, range_color, sel_dist, sel_conc, palette_dict, fig_height):
+    map_view = _calculate_map_view(df_display, sel_dist, sel_conc) # Calcula vista do mapa
+    
+    if df_display.empty or not all(col in df_display.columns for col in ['LAT', 'LON', variable, 'CONCELHO']):
+         return create_empty_figure(f"Dados insuficientes de {var_label.lower()}<br>para exibir no mapa de pontos.", height=fig_height)
+    
+    df_scatter = df_display.dropna(subset=['LAT', 'LON', variable, 'CONCELHO']).copy() # Remove NaNs
+    if df_scatter.empty: return create_empty_figure(f"Sem dados válidos de {var_label.lower()}<br>para exibir no mapa de pontos.", height=fig_height)
+    
+    fig = px.scatter_mapbox(df_scatter, lat='LAT', lon='LON', color=variable, size_max=8, 
+                            center=map_view["center"], zoom=map_view["zoom"], mapbox_style="carto-positron", 
+                            labels={variable: f'{var_label}'}, color_continuous_scale=color_scale, 
+                            opacity=0.85, height=fig_height, range_color=range_color, 
+                            hover_name='CONCELHO', custom_data=[variable])
+    fig.update_traces(marker=dict(size=7), hovertemplate="<b>%{hovertext}</b><br>" + f"{var_label}: %{{customdata[0]:.1f}}<extra></extra>") # Hover
+    fig.update_layout(
+        dragmode="zoom", margin=dict(l=0, r=0, t=30, b=0),
+        coloraxis_colorbar=dict( # Colorbar
+            title=dict(text=f'{var_label}', font=dict(size=FONT_SIZE_COLORBAR_TITLE)),
+            ticksuffix='°c' if variable == 'TEMPERATURA' else '%' if variable == 'HUMIDADERELATIVA' else '', # Sufixo da unidade
+            orientation="h", y=0.98, yanchor="bottom", len=0.8, x=0.5, xanchor='center',
+            thickness=15, tickfont=dict(size=FONT_SIZE_COLORBAR_TICK)
+        ),
+        paper_bgcolor=palette_dict.get("card_bg", "#FFFFFF"), plot_bgcolor=palette_dict.get("card_bg", "#FFFFFF"),
+        font=dict(family="Arial", size=12, color=palette_dict.get("font", "#2C3E50")), sliders=None, updatemenus=None # Sem controlos de animação
+    )
+    return fig
+
+# Calcula as coordenadas para uma forma de seta (corpo e cabeça)
+def create_arrow_shape(lat, lon, angle_rad, intensity_val, scale=0.08, intensity_normalization_cap=30.0, min_length_factor=0.2, head_connection_scale_factor=0.6, head_wing_size_factor=0.45):
+    # Normaliza a intensidade do vento para o comprimento da seta
+    if intensity_normalization_cap <= 0: normalized_intensity_for_length = 0.5
+    else: normalized_intensity_for_length = min(1.0, intensity_val / intensity_normalization_cap)
+    current_length = scale * (min_length_factor + (1 - min_length_factor) * normalized_intensity_for_length) # Comprimento da seta
+    
+    base_lat, base_lon = lat, lon
+    tip_lat = lat + current_length * np.sin(angle_rad)
+    tip_lon = lon + current_length * np.cos(angle_rad)
+    
+    head_attach_lat = lat + head_connection_scale_factor * current_length * np.sin(angle_rad)
+    head_attach_lon = lon + head_connection_scale_factor * current_length * np.cos(angle_rad)
+    wing_length = current_length * head_wing_size_factor
+    wing_angle_offset = np.pi * 3/4 # Ângulo das "asas" da cabeça
+    wing1_lat = head_attach_lat + wing_length * np.sin(angle_rad + wing_angle_offset)
+    wing1_lon = head_attach_lon + wing_length * np.cos(angle_rad + wing_angle_offset)
+    wing2_lat = head_attach_lat + wing_length * np.sin(angle_rad - wing_angle_offset)
+    wing2_lon = head_attach_lon + wing_length * np.cos(angle_rad - wing_angle_offset)
+    
+    shaft_lats = [base_lat, tip_lat]; shaft_lons = [base_lon, tip_lon] # Corpo da seta
+    head_triangle_lats = [wing1_lat, tip_lat, wing2_lat]; head_triangle_lons = [wing1_lon, tip_lon, wing2_lon] # Cabeça da seta
+    return shaft_lats, shaft_lons, head_triangle_lats, head_triangle_lons
+
+# Obtém a cor da seta com base na intensidade do vento
+def get_arrow_color_from_intensity(intensity_val, cmin=0, cmax=40, colorscale_name=WIND_COLOR_SCALE):
+    if pd.isna(intensity_val): return 'rgba(0,0,0,0.1)' # Cor para valor NaN
+    # Normaliza o valor da intensidade para a escala de cores
+    if cmin == cmax: 
+        norm_val = 0.5
+    elif intensity_val <= cmin: 
+        norm_val = 0.0
+    elif intensity_val >= cmax: 
+        norm_val = 1.0
+    else: 
+        norm_val = (intensity_val - cmin) / (cmax - cmin)
+    return px.colors.sample_colorscale(colorscale_name, [norm_val])[0]
+
+def add_arrow_traces(df_rows, fig_or_list):
+    for _, row in df_rows.iterrows(): # Itera sobre as linhas de dados (cada linha é uma seta)
+        angle = np.radians(row["PLOTLY_ANGLE"]) # Ângulo da seta
+        # Cria a forma da seta
+        shaft_lat, shaft_lon, head_lat, head_lon = create_arrow_shape(
+            row["LAT"], row["LON"], angle, row["VENTOINTENSIDADE"],
+            scale=BASE_SCALE, intensity_normalization_cap=LENGTH_CAP,
+            min_length_factor=0.2, head_connection_scale_factor=HEAD_CONN, head_wing_size_factor=HEAD_WING
+        )
+        color = row["ARROW_COLOR_VAL"] # Cor da seta
+        # Trace para o corpo da seta
+        shaft_trace = go.Scattermapbox(lat=shaft_lat, lon=shaft_lon, mode="lines", line=dict(width=SHAFT_WIDTH, color=color),
+                                     hoverinfo="text", hovertext=f"<b>{row['CONCELHO']}</b><br>Vento: {row['VENTOINTENSIDADE']:.1f} km/h", showlegend=False)
+        # Trace para a cabeça da seta (preenchida)
+        head_trace = go.Scattermapbox(lat=head_lat, lon=head_lon, mode="lines", line=dict(width=HEAD_WIDTH, color=color),
+                                    fill="toself", fillcolor=color, hoverinfo="text",
+                                    hovertext=f"<b>{row['CONCELHO']}</b><br>Vento: {row['VENTOINTENSIDADE']:.1f} km/h", showlegend=False)
+        # Adiciona os traces à figura ou lista
+        if isinstance(fig_or_list, go.Figure):
+            fig_or_list.add_trace(shaft_trace); fig_or_list.add_trace(head_trace)
+        else:
+            fig_or_list.append(shaft_trace); fig_or_list.append(head_trace)
+# --- Fim das Funções de Setas de Vento (Não Usadas Atualmente) ---
+
+
+# Cria o mapa de densidade para Humidade Relativa, com animação por dia se disponível
+def _create_humidity_density_map(df_display, ano, mes_val, sel_dist, sel_conc, palette_dict, meses_ext_dict, fig_height):
+    mes_nome = meses_ext_dict.get(mes_val, f"mês {mes_val}") if mes_val != 0 else "todo o ano"
+    local_str = f" ({sel_conc.lower()})" if sel_conc != 'Todos' else f" ({sel_dist.lower()})" if sel_dist != 'Todos' else ""
+    empty_msg = f"Sem dados de humidade válidos para exibir<br>({mes_nome.lower()} de {ano}{local_str})"
+    
+    required_cols_density = ['LAT', 'LON', 'HUMIDADERELATIVA', 'CONCELHO'] # Colunas necessárias
+    if df_display.empty or not all(c in df_display.columns for c in required_cols_density): 
+        return create_empty_figure(empty_msg + "<br>(colunas em falta)", height=fig_height)
+
+    df_valid_hum = df_display.dropna(subset=required_cols_density) # Remove NaNs
+    if df_valid_hum.empty: 
+        return create_empty_figure(empty_msg, height=fig_height)
+    
+    # Se houver muito poucos pontos (1 ou 2), usa um mapa de dispersão (scatter) como fallback
+    if 1 <= len(df_valid_hum) < 3: 
+        return _create_meteo_scatter_fallback_map(df_valid_hum, variable='HUMIDADERELATIVA', var_label='Humidade (%)', color_scale="Blues", range_color=[0, 100], sel_dist=sel_dist, sel_conc=sel_conc, palette_dict=palette_dict, fig_height=fig_height)
+    
+    map_view = _calculate_map_view(df_valid_hum, sel_dist, sel_conc) # Calcula centro e zoom
+    
+    # Prepara dados para animação por dia, se a coluna 'DIA' existir e tiver dados válidos
+    if 'DIA' not in df_valid_hum.columns or df_valid_hum['DIA'].isnull().all():
+        df_anim = df_valid_hum.copy(); df_anim['DIA'] = 1 # Assume Dia 1 se não houver dados de dia
+        unique_dias = [1]
+    else:
+        df_anim = df_valid_hum.dropna(subset=['DIA']).copy()
+        if df_anim.empty : return create_empty_figure(f"Sem dados de 'dia' para animação da humidade<br>{empty_msg}", height=fig_height)
+        df_anim['DIA'] = df_anim['DIA'].astype(int) # Converte Dia para inteiro
+        unique_dias = sorted(df_anim['DIA'].unique()) # Dias únicos para os frames da animação
+    
+    if df_anim.empty: return create_empty_figure(f"Sem dados para animação da humidade<br>{empty_msg}", height=fig_height)
+    customdata, rotulos = codificar_customdata(df_anim, ["CONCELHO"]) # concelho como código em cada frame
+    df_anim = df_anim.assign(**customdata)
+    
+    use_animation = len(unique_dias) > 1 # Animação só se houver mais de um dia
+    
+    mapbox_args = dict(
+        lat='LAT', lon='LON', z='HUMIDADERELATIVA', radius=26, # z é a variável para a densidade/cor
+        center=map_view["center"], zoom=map_view["zoom"], 
+        mapbox_style="carto-positron", 
+        labels={'HUMIDADERELATIVA': 'Humidade (%)'}, 
+        color_continuous_scale="Blues", opacity=1, height=fig_height, range_color=[0, 100], # Escala "Blues"
+        custom_data=['CONCELHO'] 
+    )
+    if use_animation:
+        mapbox_args['animation_frame'] = 'DIA'
+        mapbox_args['category_orders'] = {"DIA": unique_dias} # Garante a ordem correta dos frames
+        
+    fig = px.density_mapbox(df_anim, **mapbox_args) # Cria o mapa de densidade
+    
+    fig.update_traces(hovertemplate="<b>Concelho: %{customdata[0]}</b><br>Humidade: %{z:.1f}%<extra></extra>") # Template do hover
+    
+    fig.update_layout(
+        dragmode="zoom", margin=dict(l=0, r=0, t=30, b=70 if use_animation else 5), # Margem inferiooor maior se houver animação (para controlos)
+        coloraxis_colorbar=dict( # Colorbar
+            title=dict(text='Humidade (%)', font=dict(size=FONT_SIZE_COLORBAR_TITLE)), ticksuffix='%',
+            orientation="h", y=0.98, yanchor="bottom", len=0.8, x=0.5, xanchor='center',
+            thickness=15, tickfont=dict(size=FONT_SIZE_COLORBAR_TICK)
+        ),
+        paper_bgcolor=palette_dict.get("card_bg", "#FFFFFF"), plot_bgcolor=palette_dict.get("card_bg", "#FFFFFF"),
+        font=dict(family="Arial", size=12, color=palette_dict.get("font", "#2C3E50")), mapbox_domain={'y': [0, 0.975]} # Domínio do mapa para dar espaço à colorbar
+    )
+    if use_animation: # config controlos de animação (slider e botões play/pause) !
+        fig.update_layout(sliders=[{'active': 0, 'yanchor': 'top', 'xanchor': 'left',
+                                     'currentvalue': {'font': {'size': FONT_SIZE_ANIMATION_VALUE, 'color': palette_dict.get("font")}, 'prefix': 'Dia: ', 'visible': True, 'xanchor': 'left'},
+                                     'transition': {'duration': 300, 'easing': 'cubic-in-out'}, 'pad': {'b': 0, 't': 10},
+                                     'len': 0.75, 'x': 0.1, 'y': 0.05, 'bgcolor': 'rgba(200,200,200,0.3)',
+                                     'activebgcolor': palette_dict.get("brand"), 'borderwidth': 0,
+                                     'steps': [{'args': [[f'{day}'], {'frame': {'duration': 300, 'redraw': True}, 'mode': 'immediate', 'transition': {'duration': 300}}], 'label': str(day), 'method': 'animate'} for day in unique_dias]}],
+                          updatemenus=[dict(type="buttons", direction="left", showactive=True,
+                                             bgcolor=palette_dict.get("card_bg", "#EEEEEE"), bordercolor="#CCCCCC", borderwidth=1,
+                                             font={'size': FONT_SIZE_ANIMATION_BUTTON, 'color': palette_dict.get("font")},
+                                             buttons=[dict(label="▶", method="animate", args=[None, {"frame": {"duration": 500, "redraw": True}, "fromcurrent": True, "transition": {"duration": 300}}]),
+                                                      dict(label="❚❚", method="animate", args=[[None], {"frame": {"duration": 0, "redraw": False}, "mode": "immediate", "transition": {"duration": 0}}])],
+                                             pad={"r": 10, "l": 5, "t": 0, "b": 0}, x=0.95, xanchor="right", y=0, yanchor="bottom")])
+    else: fig.update_layout(sliders=None, updatemenus=None) # Remove controlos se não houver animação
+    return aplicar_rotulos(fig, rotulos)
+
+# Cria o mapa de densidade para Temperatura, com animação por dia se disponível
+def _create_temperature_density_map(df_display, ano, mes_val, sel_dist, sel_conc, palette_dict, meses_ext_dict, fig_height):
+    # Lógica muito semelhante a _create_humidity_density_map, mas para Temperatura
+    mes_nome = meses_ext_dict.get(mes_val, f"mês {mes_val}") if mes_val != 0 else "todo o ano"
+    local_str = f" ({sel_conc.lower()})" if sel_conc != 'Todos' else f" ({sel_dist.lower()})" if sel_dist != 'Todos' else ""
+    empty_msg = f"Sem dados de temperatura válidos para exibir<br>({mes_nome.lower()} de {ano}{local_str})"
+    
+    required_cols_density = ['LAT', 'LON', 'TEMPERATURA', 'CONCELHO']
+    if df_display.empty or not all(c in df_display.columns for c in required_cols_density): 
+        return create_empty_figure(empty_msg + "<br>(colunas em falta)", height=fig_height)
+        
+    df_valid_temp = df_display.dropna(subset=required_cols_density)
+    if df_valid_temp.empty: 
+        return create_empty_figure(empty_msg, height=fig_height)
+    
+    # Fallback para scatter map se poucos pontos
+    if 1 <= len(df_valid_temp) < 3: 
+        return _create_meteo_scatter_fallback_map(df_valid_temp, variable='TEMPERATURA', var_label='Temperatura (°C)', color_scale=TEMP_COLOR_SCALE_DENSITY, range_color=TEMP_RANGE_DENSITY, sel_dist=sel_dist, sel_conc=sel_conc, palette_dict=palette_dict, fig_height=fig_height)
+    
+    map_view = _calculate_map_view(df_valid_temp, sel_dist, sel_conc)
+    
+    # Preparação para animação por dia
+    if 'DIA' not in df_valid_temp.columns or df_valid_temp['DIA'].isnull().all():
+        df_anim = df_valid_temp.copy(); df_anim['DIA'] = 1
+        unique_dias = [1]
+    else:
+        df_anim = df_valid_temp.dropna(subset=['DIA']).copy()
+        if df_anim.empty : return create_empty_figure(f"Sem dados de 'dia' para animação da temperatura<br>{empty_msg}", height=fig_height)
+        df_anim['DIA'] = df_anim['DIA'].astype(int)
+        unique_dias = sorted(df_anim['DIA'].unique())
+        
+    if df_anim.empty: return create_empty_figure(f"Sem dados para animação da temperatura<br>{empty_msg}", height=fig_height)
+    customdata, rotulos = codificar_customdata(df_anim, ["CONCELHO"]) # concelho como código em cada frame
+    df_anim = df_anim.assign(**customdata)
+    
+    use_animation = len(unique_dias) > 1
+    # Ajusta o domínio Y do mapa para dar espaço aos controlos de animação, se ativos
+    mapbox_domain_y = [0, 0.9] if use_animation else [0, 0.975] 
+    
+    # Argumentos para px.density_mapbox
+    mapbox_args = dict(
+        lat='LAT', lon='LON', z='TEMPERATURA', radius=26, 
+        center=map_view["center"], zoom=map_view["zoom"], 
+        mapbox_style="carto-positron", 
+        labels={'TEMPERATURA': 'Temp (°C)'}, 
+        color_continuous_scale=TEMP_COLOR_SCALE_DENSITY, opacity=1, height=fig_height, range_color=TEMP_RANGE_DENSITY, # Escala de cor para temperatura
+        custom_data=['CONCELHO']
+    )
+    if use_animation: 
+        mapbox_args['animation_frame'] = 'DIA'
+        mapbox_args['category_orders'] = {"DIA": unique_dias}
+        
+    fig = px.density_mapbox(df_anim, **mapbox_args) # Cria o mapa
+    
+    fig.update_traces(hovertemplate="<b>Concelho: %{customdata[0]}</b><br>Temperatura: %{z:.1f}°C<extra></extra>") # Hover
+    
+    fig.update_layout(
+        dragmode="zoom", margin=dict(l=0, r=0, t=30, b=70 if use_animation else 5),
+        coloraxis_colorbar=dict( # Colorbar
+            title=dict(text='Temperatura (°C)', font=dict(size=FONT_SIZE_COLORBAR_TITLE)), ticksuffix='°C',
+            orientation="h", y=0.98, yanchor="bottom", len=0.8, x=0.5, xanchor='center',
+            thickness=15, tickfont=dict(size=FONT_SIZE_COLORBAR_TICK)
+        ),
+        paper_bgcolor=palette_dict.get("card_bg", "#FFFFFF"), plot_bgcolor=palette_dict.get("card_bg", "#FFFFFF"),
+        font=dict(family="Arial", size=12, color=palette_dict.get("font", "#2C3E50")), mapbox_domain={'y': mapbox_domain_y}
+    )
+    if use_animation: # Configura controlos de animação
+         fig.update_layout(sliders=[{'active': 0, 'yanchor': 'top', 'xanchor': 'left',
+                                     'currentvalue': {'font': {'size': FONT_SIZE_ANIMATION_VALUE, 'color': palette_dict.get("font")}, 'prefix': 'Dia: ', 'visible': True, 'xanchor': 'left'},
+                                     'transition': {'duration': 300, 'easing': 'cubic-in-out'}, 'pad': {'b': 0, 't': 10},
+                                     'len': 0.75, 'x': 0.1, 'y': 0.05, 'bgcolor': 'rgba(200,200,200,0.3)',
+                                     'activebgcolor': palette_dict.get("brand"), 'borderwidth': 0,
+                                     'steps': [{'args': [[f'{day}'], {'frame': {'duration': 300, 'redraw': True}, 'mode': 'immediate', 'transition': {'duration': 300}}], 'label': str(day), 'method': 'animate'} for day in unique_dias]}],
+                           updatemenus=[dict(type="buttons", direction="left", showactive=True,
+                                             bgcolor=palette_dict.get("card_bg", "#EEEEEE"), bordercolor="#CCCCCC", borderwidth=1,
+                                             font={'size': FONT_SIZE_ANIMATION_BUTTON, 'color': palette_dict.get("font")},
+                                             buttons=[dict(label="▶", method="animate", args=[None, {"frame": {"duration": 500, "redraw": True}, "fromcurrent": True, "transition": {"duration": 300, "easing": "cubic-in-out"}}]),
+                                                      dict(label="❚❚", method="animate", args=[[None], {"frame": {"duration": 0, "redraw": False}, "mode": "immediate", "transition": {"duration": 0}}])],
+                                             pad={"r": 10, "l": 5, "t": 0, "b": 0}, x=0.95, xanchor="right", y=0.05, yanchor="top")]) # y=0.05 e yanchor="top" para alinhar com o slider
+    else: fig.update_layout(sliders=None, updatemenus=None)
+    return aplicar_rotulos(fig, rotulos)
+
+# Recorta os dados ao viewport: pontos visíveis mantêm-se, os de fora são resumidos em células grosseiras
+def _recortar_ao_viewport(df_geo: pd.DataFrame, viewport: Dict[str, Any], variable: str, indice_espacial: Optional[GridIndex] = None) -> pd.DataFrame:
+    if df_geo.empty:
+        return df_geo
+    if indice_espacial is not None: # o índice foi construído sobre o DF completo (posições == índice do DF)
+        dentro = indice_espacial.mascara_viewport(viewport)[df_geo.index.to_numpy()]
+    else:
+        dentro = (df_geo["LAT"].between(viewport["lat_min"], viewport["lat_max"]) & df_geo["LON"].between(viewport["lon_min"], viewport["lon_max"])).to_numpy()
+
+    df_fora = df_geo.loc[~dentro].dropna(subset=["LAT", "LON", variable])
+    colunas_angulo = ["VENTODIRECAO_VETOR"] if variable == "VENTOINTENSIDADE" else None
+    df_agregado = agregado_grosseiro(df_fora, [variable], chaves_extra=["DIA", "DISTRITO"], colunas_angulo=colunas_angulo)
+    df_agregado["CONCELHO"] = "Fora da vista (agregado)" # aparece no hover dos pontos resumidos
+    return pd.concat([df_geo.loc[dentro], df_agregado.drop(columns="N_AGREGADOS")], ignore_index=True)
+
+# Mantém a vista atual do utilizador (centro/zoom do viewport) e o estado da UI enquanto os filtros não mudam
+def _aplicar_vista_meteo(fig: go.Figure, viewport: Optional[Dict[str, Any]], uirevision: str) -> go.Figure:
+    if fig.data:
+        fig.update_layout(uirevision=uirevision)
+        if viewport is not None and "center" in viewport and "zoom" in viewport:
+            fig.update_layout(mapbox=dict(center=viewport["center"], zoom=viewport["zoom"]))
+    return fig
+
+# Função principal para criar o mapa meteorológico (Temperatura, Humidade ou Vento)
+# Com `viewport`, só os pontos visíveis seguem para o browser (os restantes vão resumidos).
+def fig_meteo_map(df_main_complete: pd.DataFrame, variable: str, selected_distrito: str, selected_concelho: str, ano: int, mes_val: int,
+                  viewport: Optional[Dict[str, Any]] = None, indice_espacial: Optional[GridIndex] = None) -> go.Figure:
+    meteo_map_height_numeric = int(METEO_MAP_NEW_HEIGHT.replace('px', '')) # Altura do mapa
+
+    if df_main_complete.empty:
+        return create_empty_figure("Dados principais não disponíveis.", height=meteo_map_height_numeric)
+
+    # Filtra dados pelo ano e mês selecionados
+    df_temp = df_main_complete[df_main_complete["ANO"] == ano]
+    if mes_val != 0: # Se um mês específico foi selecionado
+        df_temp = df_temp[df_temp["MES"] == mes_val]
+    else: # Se "Todos os Meses" foi selecionado, mostra mensagem para escolher um mês
+        return create_empty_figure("⚠️<br>Seleciona um mês específico<br>para ver o mapa meteorológico.", height=meteo_map_height_numeric)
+
+    df_filtered_geo = df_temp.copy()
+    if 'CONCELHO' not in df_filtered_geo.columns: # Garante que a coluna CONCELHO existe (para hover)
+        df_filtered_geo['CONCELHO'] = "Desconhecido"
+        
+    # Filtra por distrito ou concelho, se selecionado
+    if selected_concelho != "Todos":
+        df_filtered_geo = df_filtered_geo[df_filtered_geo["CONCELHO"] == selected_concelho]
+    elif selected_distrito != "Todos":
+        df_filtered_geo = df_filtered_geo[df_filtered_geo["DISTRITO"] == selected_distrito]
+
+    n_selecao = len(df_filtered_geo) # decide o tipo de mapa (mapbox ou MapLibre) antes do recorte
+    if viewport is not None: # Recorta ao que está visível no mapa
+        df_filtered_geo = _recortar_ao_viewport(df_filtered_geo, viewport, variable, indice_espacial)
+    uirevision = f"meteo-{variable}-{ano}-{mes_val}-{selected_distrito}-{selected_concelho}" # muda só com os filtros
+
+    # Lógica específica para o mapa de VENTO
+    if variable == "VENTOINTENSIDADE":
+        required_cols = ["LAT", "LON", "VENTOINTENSIDADE", "VENTODIRECAO_VETOR", "CONCELHO"] # Colunas necessárias para vento
+        has_dia_data_for_animation = "DIA" in df_filtered_geo.columns and not df_filtered_geo["DIA"].isnull().all() # Verifica se há dados de dia para animação
+
+        df_wind = df_filtered_geo.dropna(subset=required_cols).copy() # Remove NaNs
+        
+        # Prepara dados de dia para animação
+        if has_dia_data_for_animation:
+            df_wind = df_wind.dropna(subset=["DIA"]).copy()
+            if not df_wind.empty:
+                 df_wind["DIA"] = pd.to_numeric(df_wind["DIA"], errors="coerce").dropna().astype(int)
+            else: # Se ficou vazio após remover NaNs de DIA
+                has_dia_data_for_animation = False 
+                if not df_wind.empty: df_wind["DIA"] = 1 # Fallback para Dia 1
+                else: return create_empty_figure("Sem dados de vento válidos com dia.", height=meteo_map_height_numeric)
+        else: # Sem dados de DIA
+            if not df_wind.empty: df_wind["DIA"] = 1 # Assume Dia 1
+            has_dia_data_for_animation = False # Garante que animação não será usada
+
+        if df_wind.empty:
+            return create_empty_figure("Sem dados completos de vento<br>para este local e mês.", height=meteo_map_height_numeric)
+
+        map_view = _calculate_map_view(df_wind, selected_distrito, selected_concelho) # Calcula centro e zoom
+        
+        unique_dias = sorted(df_wind["DIA"].unique()) if "DIA" in df_wind and not df_wind["DIA"].empty else [1] # Dias únicos para animação
+        use_animation = has_dia_data_for_animation and len(unique_dias) > 1 # Animação se houver múltiplos dias
+        
+        # Colunas para customdata no hover do mapa de vento
+        custom_data_for_wind = ["VENTODIRECAO_VETOR", "CONCELHO"] # a intensidade já segue em z
+        customdata, rotulos = codificar_customdata(df_wind, custom_data_for_wind) # concelho como código em cada frame
+        df_wind = df_wind.assign(**customdata)
+
+        fig = px.density_mapbox(
+            df_wind, lat="LAT", lon="LON", z="VENTOINTENSIDADE", radius=26,
+            center=map_view["center"], zoom=map_view["zoom"], mapbox_style="carto-positron",
+            labels={"VENTOINTENSIDADE": "Vento (km/h)"}, 
+            color_continuous_scale=WIND_COLOR_SCALE, range_color=WIND_RANGE_COLOR, # Escala de cor para vento
+            opacity=0.8, height=meteo_map_height_numeric,
+            animation_frame="DIA" if use_animation else None, # Animação por DIA
+            category_orders={"DIA": unique_dias} if use_animation else None,
+            custom_data=custom_data_for_wind # Passa a lista de nomes de colunas para custom_data
+        )
+
+        fig.update_traces( # Template do hover para o mapa de densidade de vento
+            hovertemplate="<b>Concelho: %{customdata[1]}</b><br>Vento: %{z:.1f} km/h<br>Direção: %{customdata[0]:.0f}°<extra></extra>"
+        )
+        
+        fig.update_layout( # Layout geral do mapa de vento
+            autosize=True, margin=dict(l=0, r=0, t=30, b=70 if use_animation else 5),
+            dragmode="zoom", paper_bgcolor=PALETTE["card_bg"], font_color=PALETTE["font"],
+            mapbox_domain={'y': [0, 0.975]}, # Espaço para colorbar
+            coloraxis_colorbar=dict( # Colorbar para intensidade do vento
+                title=dict(text="Vento (km/h)", font=dict(size=FONT_SIZE_COLORBAR_TITLE)),
+                tickvals=[0, 10, 20, 30, WIND_RANGE_COLOR[1]], # Ticks personalizados
+                ticktext=[str(t) for t in [0, 10, 20, 30, WIND_RANGE_COLOR[1]]],
+                orientation="h", y=0.98, yanchor="bottom",
+                x=0.5, xanchor="center", len=0.8, thickness=15,
+                tickfont=dict(size=FONT_SIZE_COLORBAR_TICK)
+            )
+        )
+
+        if use_animation: # Adiciona controlos de animação se aplicável
+            fig.update_layout(
+                sliders=[{ # Slider de dias
+                    'active': 0, 'yanchor': 'top', 'xanchor': 'left',
+                    'currentvalue': {'font': {'size': FONT_SIZE_ANIMATION_VALUE, 'color': PALETTE.get("font")}, 'prefix': 'Dia: ', 'visible': True, 'xanchor': 'left'},
+                    'transition': {'duration': 300, 'easing': 'cubic-in-out'},
+                    'pad': {'b': 0, 't': 10}, 'len': 0.75, 'x': 0.1, 'y': 0.05, 
+                    'bgcolor': 'rgba(200,200,200,0.3)', 'activebgcolor': PALETTE.get("brand"),
+                    'borderwidth': 0,
+                    'steps': [{'args': [[f'{day}'], {'frame': {'duration': 300, 'redraw': True}, 'mode': 'immediate', 'transition': {'duration': 300}}], 'label': str(day), 'method': 'animate'} for day in unique_dias]
+                }],
+                updatemenus=[{ # Botões Play/Pause
+                    'type': "buttons", 'direction': "left", 'showactive': True,
+                    'bgcolor': PALETTE.get("card_bg", "#EEEEEE"), 'bordercolor': "#CCCCCC", 'borderwidth': 1,
+                    'font': {'size': FONT_SIZE_ANIMATION_BUTTON, 'color': PALETTE.get("font")},
+                    'buttons': [
+                        {'label': "▶", 'method': "animate", 'args': [None, {"frame": {"duration": 500, "redraw": True}, "fromcurrent": True, "transition": {"duration": 300, "easing": "cubic-in-out"}}]},
+                        {'label': "❚❚", 'method': "animate", 'args': [[None], {"frame": {"duration": 0, "redraw": False}, "mode": "immediate", "transition": {"duration": 0}}]}
+                    ],
+                    'pad': {"r": 10, "l": 5, "t": 0, "b": 0}, 'x': 0.95, 'xanchor': "right", 'y': 0, 'yanchor': "bottom"
+                }]
+            )
+        else: fig.update_layout(sliders=None, updatemenus=None) # Remove controlos se não houver animação
+            
+        return para_maplibre(_aplicar_vista_meteo(aplicar_rotulos(fig, rotulos), viewport, uirevision), n_selecao)
+
+    # Para Temperatura e Humidade, delega para as funções auxiliares específicas
+    if variable == "HUMIDADERELATIVA":
+        fig = _create_humidity_density_map(df_filtered_geo, ano, mes_val, selected_distrito, selected_concelho, PALETTE, MESES_EXTENSO, fig_height=meteo_map_height_numeric)
+        return para_maplibre(_aplicar_vista_meteo(fig, viewport, uirevision), n_selecao)
+    if variable == "TEMPERATURA":
+        fig = _create_temperature_density_map(df_filtered_geo, ano, mes_val, selected_distrito, selected_concelho, PALETTE, MESES_EXTENSO, fig_height=meteo_map_height_numeric)
+        return para_maplibre(_aplicar_vista_meteo(fig, viewport, uirevision), n_selecao)
+
+    # Fallback se a variável meteorológica não for suportada
+    return create_empty_figure(f"Variável meteorológica '{variable}' não suportada.", height=meteo_map_height_numeric)
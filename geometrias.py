@@ -0,0 +1,218 @@
+import argparse
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# constantes
+GEO_DIR = Path(__file__).resolve().parent / "data" / "geo"
+NIVEIS_GEO = {"DISTRITO": "distritos", "CONCELHO": "concelhos"}
+TOLERANCIAS_GEO = [0.01, 0.003, 0.001] # tolerâncias de simplificação (graus), da mais grosseira à mais fina
+LIMIARES_ZOOM_GEO = [7.0, 9.0] # zoom a partir do qual se passa à tolerância seguinte
+QUANTIZACAO = 1e5 # nº de passos da grelha de quantização em cada eixo (estilo TopoJSON)
+
+# Os ficheiros de origem (ex: exportação GeoJSON da CAOP da DGT) não são distribuídos com o projeto.
+# Para os gerar:  python geometrias.py distritos.geojson --nivel DISTRITO --propriedade Distrito
+
+
+def _ficheiro(nivel: str, tolerancia: float) -> Path:
+    return GEO_DIR / f"{NIVEIS_GEO[nivel]}_t{tolerancia:g}.json"
+
+
+# Tolerância de simplificação adequada a um nível de zoom
+def tolerancia_para_zoom(zoom: Optional[float]) -> float:
+    if zoom is None:
+        return TOLERANCIAS_GEO[0]
+    for limiar, tolerancia in zip(LIMIARES_ZOOM_GEO, TOLERANCIAS_GEO):
+        if zoom < limiar:
+            return tolerancia
+    return TOLERANCIAS_GEO[-1]
+
+
+# Indica se existem geometrias preparadas para um nível (o modo coroplético depende disto)
+def geometrias_disponiveis(nivel: str) -> bool:
+    return nivel in NIVEIS_GEO and all(_ficheiro(nivel, t).exists() for t in TOLERANCIAS_GEO)
+
+
+# Pontos a manter na simplificação de Douglas-Peucker de uma linha (array Nx2), sem recursão; as pontas ficam sempre
+def simplificar_linha(pontos: np.ndarray, tolerancia: float) -> np.ndarray:
+    n = len(pontos)
+    manter = np.zeros(n, dtype=bool); manter[0] = manter[-1] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        if fim <= inicio + 1:
+            continue
+        a, b = pontos[inicio], pontos[fim]
+        segmento = pontos[inicio + 1:fim]
+        ab = b - a
+        comprimento = np.hypot(*ab)
+        if comprimento == 0: # arco fechado (anel sem vizinhos): distância à ponta
+            distancias = np.hypot(*(segmento - a).T)
+        else:
+            distancias = np.abs(ab[0] * (segmento[:, 1] - a[1]) - ab[1] * (segmento[:, 0] - a[0])) / comprimento
+        i = int(np.argmax(distancias))
+        if distancias[i] > tolerancia:
+            meio = inicio + 1 + i
+            manter[meio] = True
+            pilha.extend([(inicio, meio), (meio, fim)])
+    return manter
+
+
+def _poligonos(geometria: Dict[str, Any]) -> List[List[List[List[float]]]]:
+    if geometria["type"] == "Polygon":
+        return [geometria["coordinates"]]
+    if geometria["type"] == "MultiPolygon":
+        return geometria["coordinates"]
+    raise ValueError(f"Geometria não suportada: {geometria['type']}")
+
+
+# Anel quantizado como lista de códigos inteiros (x * QUANTIZACAO + y), aberto e sem pontos repetidos seguidos
+def _anel_codificado(inteiros: np.ndarray) -> List[int]:
+    codigos = (inteiros[:, 0] * int(QUANTIZACAO) + inteiros[:, 1]).tolist()
+    anel = [c for i, c in enumerate(codigos) if i == 0 or c != codigos[i - 1]]
+    while len(anel) > 1 and anel[-1] == anel[0]:
+        anel.pop()
+    return anel
+
+
+# Junções (estilo TopoJSON): pontos que aparecem em anéis diferentes com vizinhos diferentes,
+# ou seja, onde uma fronteira partilhada começa ou acaba
+def _juncoes(aneis: List[List[int]]) -> Set[int]:
+    vizinhos: Dict[int, Tuple[int, int]] = {}
+    juncoes = set()
+    for anel in aneis:
+        n = len(anel)
+        for i, ponto in enumerate(anel):
+            par = tuple(sorted((anel[i - 1], anel[(i + 1) % n])))
+            if vizinhos.setdefault(ponto, par) != par:
+                juncoes.add(ponto)
+    return juncoes
+
+
+# Parte um anel em arcos nas junções; um anel sem junções é um arco fechado a começar no menor código
+# (assim o mesmo anel, vindo de dois vizinhos, dá o mesmo arco, talvez invertido)
+def _partir_anel(anel: List[int], juncoes: Set[int]) -> List[List[int]]:
+    cortes = [i for i, ponto in enumerate(anel) if ponto in juncoes]
+    inicio = cortes[0] if cortes else anel.index(min(anel))
+    rodado = anel[inicio:] + anel[:inicio] + [anel[inicio]]
+    cortes = [i for i, ponto in enumerate(rodado) if ponto in juncoes] or [0, len(rodado) - 1]
+    if cortes[-1] != len(rodado) - 1:
+        cortes.append(len(rodado) - 1)
+    return [rodado[a:b + 1] for a, b in zip(cortes, cortes[1:])]
+
+
+# Garante que um anel simplificado tem pelo menos 3 vértices distintos, repondo pontos do meio dos seus arcos
+# (as máscaras são as dos arcos partilhados, por isso o vizinho recebe os mesmos pontos)
+def _completar_anel(mascaras: List[np.ndarray]) -> None:
+    while sum(int(m.sum()) - 1 for m in mascaras) < 3:
+        livres = [(np.flatnonzero(~m), m) for m in mascaras]
+        livres = [(l, m) for l, m in livres if len(l)]
+        if not livres:
+            return
+        indices, mascara = max(livres, key=lambda par: len(par[0]))
+        mascara[indices[len(indices) // 2]] = True
+
+
+# Simplifica e quantiza um GeoJSON à maneira do TopoJSON: as fronteiras partilhadas entre vizinhos são arcos guardados
+# (e simplificados) uma só vez, pelo que os vizinhos continuam a encaixar sem falhas nem sobreposições.
+# Cada anel é uma lista de índices de arcos (~i = arco i percorrido ao contrário); os arcos têm coordenadas inteiras em delta.
+def preparar_geometrias(geojson: Dict[str, Any], propriedade_nome: str, tolerancia: float) -> Dict[str, Any]:
+    features = geojson["features"]
+    todos = np.concatenate([np.asarray(anel, dtype=float)[:, :2] for f in features for poligono in _poligonos(f["geometry"]) for anel in poligono])
+    minimo = todos.min(axis=0); escala = (todos.max(axis=0) - minimo) / (QUANTIZACAO - 1)
+    escala[escala == 0] = 1.0
+
+    # quantizar antes de procurar junções: os vértices partilhados passam a ser iguais em todos os vizinhos
+    estrutura = [[[_anel_codificado(np.round((np.asarray(anel, dtype=float)[:, :2] - minimo) / escala).astype(np.int64))
+                   for anel in poligono] for poligono in _poligonos(f["geometry"])] for f in features]
+    juncoes = _juncoes([anel for poligonos in estrutura for poligono in poligonos for anel in poligono if len(anel) >= 3])
+
+    arcos: List[List[int]] = []
+    indices: Dict[Tuple[int, ...], int] = {}
+    referencias = []
+    for poligonos in estrutura:
+        refs_feature = []
+        for poligono in poligonos:
+            refs_poligono = []
+            for anel in poligono:
+                if len(anel) < 3: # anel degenerado na grelha de quantização
+                    continue
+                refs_anel = []
+                for arco in _partir_anel(anel, juncoes):
+                    chave, inversa = tuple(arco), tuple(reversed(arco))
+                    if chave in indices:
+                        refs_anel.append(indices[chave])
+                    elif inversa in indices:
+                        refs_anel.append(~indices[inversa])
+                    else:
+                        indices[chave] = len(arcos); refs_anel.append(len(arcos)); arcos.append(arco)
+                refs_poligono.append(refs_anel)
+            if refs_poligono:
+                refs_feature.append(refs_poligono)
+        referencias.append(refs_feature)
+
+    # cada arco é simplificado uma vez; um anel que fique com menos de 3 vértices recupera o ponto do meio dos seus arcos
+    inteiros = [np.column_stack(np.divmod(np.asarray(arco, dtype=np.int64), int(QUANTIZACAO))) for arco in arcos]
+    manter = [simplificar_linha(pontos * escala + minimo, tolerancia) for pontos in inteiros]
+    for refs_anel in (refs for refs_feature in referencias for refs_poligono in refs_feature for refs in refs_poligono):
+        _completar_anel([manter[r if r >= 0 else ~r] for r in refs_anel])
+
+    arcos_q = []
+    for pontos, mascara in zip(inteiros, manter):
+        simplificado = pontos[mascara]
+        arcos_q.append(np.vstack([simplificado[:1], np.diff(simplificado, axis=0)]).ravel().tolist())
+    saida = [{"id": str(feature["properties"][propriedade_nome]).strip().title(), # mesma normalização dos nomes do DF
+              "poligonos": refs_feature} for feature, refs_feature in zip(features, referencias)]
+    return {"transform": {"scale": escala.tolist(), "translate": minimo.tolist()}, "arcs": arcos_q, "features": saida}
+
+
+# Reconstrói um GeoJSON a partir do formato com arcos partilhados (cada feature tem `id` = nome do local)
+def descodificar_geometrias(compacto: Dict[str, Any]) -> Dict[str, Any]:
+    escala = np.asarray(compacto["transform"]["scale"]); origem = np.asarray(compacto["transform"]["translate"])
+    arcos = [np.cumsum(np.asarray(deltas, dtype=np.int64).reshape(-1, 2), axis=0) for deltas in compacto["arcs"]]
+    features = []
+    for feature in compacto["features"]:
+        poligonos = []
+        for refs_poligono in feature["poligonos"]:
+            aneis = []
+            for refs_anel in refs_poligono:
+                partes = [arcos[r] if r >= 0 else arcos[~r][::-1] for r in refs_anel]
+                inteiros = np.vstack([partes[0]] + [parte[1:] for parte in partes[1:]]) # a ponta inicial de cada arco repete a anterior
+                aneis.append(np.round(inteiros * escala + origem, 5).tolist())
+            poligonos.append(aneis)
+        features.append({"type": "Feature", "id": feature["id"], "properties": {"nome": feature["id"]},
+                         "geometry": {"type": "MultiPolygon", "coordinates": poligonos}})
+    return {"type": "FeatureCollection", "features": features}
+
+
+# GeoJSON (já descodificado) de um nível e tolerância; fica em memória depois da primeira leitura
+@lru_cache(maxsize=None)
+def carregar_geojson_texto(nivel: str, tolerancia: float) -> str:
+    compacto = json.loads(_ficheiro(nivel, tolerancia).read_text(encoding="utf-8"))
+    return json.dumps(descodificar_geometrias(compacto), separators=(",", ":"))
+
+
+# Gera os ficheiros simplificados (todas as tolerâncias) a partir de um GeoJSON de origem
+def gerar_ficheiros(origem: Path, nivel: str, propriedade_nome: str, tolerancias: Sequence[float] = TOLERANCIAS_GEO) -> List[Path]:
+    geojson = json.loads(Path(origem).read_text(encoding="utf-8"))
+    GEO_DIR.mkdir(parents=True, exist_ok=True)
+    gerados = []
+    for tolerancia in tolerancias:
+        destino = _ficheiro(nivel, tolerancia)
+        destino.write_text(json.dumps(preparar_geometrias(geojson, propriedade_nome, tolerancia), separators=(",", ":")), encoding="utf-8")
+        gerados.append(destino)
+    carregar_geojson_texto.cache_clear()
+    return gerados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepara geometrias simplificadas e quantizadas para o modo coroplético.")
+    parser.add_argument("origem", type=Path, help="GeoJSON de origem (distritos ou concelhos)")
+    parser.add_argument("--nivel", choices=sorted(NIVEIS_GEO), required=True)
+    parser.add_argument("--propriedade", required=True, help="propriedade com o nome do distrito/concelho")
+    args = parser.parse_args()
+    for caminho in gerar_ficheiros(args.origem, args.nivel, args.propriedade):
+        print(f"{caminho} ({caminho.stat().st_size / 1024:.0f} KB)")
@@ -0,0 +1,101 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import codificar, soma
+from map_lod import COLUNAS_TIPO, coluna_tipo
+
+# constantes
+GRANULARIDADES = ["DISTRITO", "CONCELHO"]
+N_MESES = 12
+
+
+def coluna_area_tipo(tipo: str) -> str:
+    return coluna_tipo(tipo).replace("NUM_INCENDIOS_", "AREA_ARDIDA_", 1)
+
+
+# Índice temporal com somas acumuladas (prefix sums) por local sobre uma grelha (ano × mês).
+# Para cada medida guarda S[local, a, m] = soma das células com ano < a e mês < m (linha e coluna iniciais a zero),
+# pelo que qualquer intervalo de anos × intervalo de meses (ex: 2016–2018, junho–setembro) se obtém com
+# quatro consultas à tabela, independentemente da largura do intervalo e do nº de incêndios.
+# Com `motor` (`consultas_sql.MotorSQL`) parte das células (local, ano, mês, tipo) já agregadas na consulta, sem o DF.
+class IndiceTemporal:
+    def __init__(self, df: Optional[pd.DataFrame] = None, motor: Optional[Any] = None):
+        self._df = df
+        self._motor = motor
+        self._tabelas: Dict[str, Tuple[np.ndarray, np.ndarray, List[str]]] = {}
+        anos = motor.distintos("ANO") if motor is not None else df["ANO"].dropna().unique()
+        tipos = motor.distintos("TIPO") if motor is not None else df["TIPO"].dropna().unique()
+        self.anos = sorted(int(ano) for ano in anos)
+        # tipos presentes e os quatro do mapa (colunas sempre existentes); ordem alfabética = desempate do tipo predominante
+        self.tipos = sorted(set(tipos) | set(COLUNAS_TIPO))
+
+    def get(self, granularity: str) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        if granularity not in GRANULARIDADES:
+            raise ValueError(f"Granularidade desconhecida: {granularity}")
+        if granularity not in self._tabelas:
+            self._tabelas[granularity] = self._construir(granularity)
+        return self._tabelas[granularity]
+
+    # Células (local, ano, mês, tipo) com somas e contagens: agregadas pelo motor SQL ou, a partir do DF, um incêndio por linha
+    def _celulas(self, granularity: str) -> pd.DataFrame:
+        if self._motor is not None:
+            return self._motor.celulas_temporais(granularity)
+        base = self._df.dropna(subset=["LAT", "LON", granularity])
+        return pd.DataFrame({
+            "LOCAL": base[granularity], "ANO": base["ANO"], "MES": base["MES"], "TIPO": base["TIPO"], "N": 1,
+            "LAT_SOMA": base["LAT"], "LON_SOMA": base["LON"], "AREA_SOMA": base["AREATOTAL"],
+            "DURACAO_SOMA_MIN": base["DURACAO"], "DURACAO_CONTAGEM_VALIDA": base["DURACAO"].notna().astype(np.int64),
+        })
+
+    # Medidas por célula (local, ano, mês) com `bincount` e acumuladas nos eixos do ano e do mês
+    def _construir(self, granularity: str) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        base = self._celulas(granularity)
+        codigos, locais = codificar(base["LOCAL"])
+        i_ano = np.searchsorted(self.anos, base["ANO"].to_numpy(dtype=np.int64))
+        i_mes = base["MES"].to_numpy(dtype=np.int64) - 1
+        celula = (codigos * len(self.anos) + i_ano) * N_MESES + i_mes
+        n_celulas = len(locais) * len(self.anos) * N_MESES
+
+        medidas = {nome: soma(celula, base[nome], n_celulas)
+                   for nome in ["N", "LAT_SOMA", "LON_SOMA", "DURACAO_SOMA_MIN", "DURACAO_CONTAGEM_VALIDA"]}
+        tipo = base["TIPO"].to_numpy()
+        for t in self.tipos:
+            mask = tipo == t
+            medidas[coluna_tipo(t)] = soma(celula[mask], base["N"].to_numpy()[mask], n_celulas)
+            medidas[coluna_area_tipo(t)] = soma(celula[mask], base["AREA_SOMA"].to_numpy()[mask], n_celulas)
+
+        grelha = np.stack([np.asarray(v, dtype=float) for v in medidas.values()]).reshape(len(medidas), len(locais), len(self.anos), N_MESES)
+        acumulada = np.zeros((len(medidas), len(locais), len(self.anos) + 1, N_MESES + 1))
+        acumulada[:, :, 1:, 1:] = grelha.cumsum(axis=2).cumsum(axis=3)
+        return acumulada, locais, list(medidas)
+
+    # Somas de cada medida por local no retângulo anos [ano_ini, ano_fim] × meses [mes_ini, mes_fim] (inclusive)
+    def somar(self, granularity: str, anos: Sequence[int], meses: Sequence[int] = (1, 12)) -> pd.DataFrame:
+        acumulada, locais, nomes = self.get(granularity)
+        a0, a1 = np.searchsorted(self.anos, int(anos[0]), "left"), np.searchsorted(self.anos, int(anos[-1]), "right")
+        m0, m1 = max(int(meses[0]), 1) - 1, min(int(meses[-1]), N_MESES)
+        if a1 <= a0 or m1 <= m0:
+            return pd.DataFrame(0.0, index=pd.Index(locais, name=granularity), columns=nomes)
+        total = acumulada[:, :, a1, m1] - acumulada[:, :, a0, m1] - acumulada[:, :, a1, m0] + acumulada[:, :, a0, m0]
+        return pd.DataFrame(total.T, index=pd.Index(locais, name=granularity), columns=nomes)
+
+    # Agregado do mapa principal para o intervalo, com as colunas de `figuras.agregar_mapa` (uma linha por local com incêndios)
+    def agregar_mapa(self, granularity: str, anos: Sequence[int], meses: Sequence[int] = (1, 12)) -> pd.DataFrame:
+        somas = self.somar(granularity, anos, meses)
+        somas = somas[somas["N"] > 0.5]
+        n = somas["N"]
+        agg = pd.DataFrame({
+            "LAT": somas["LAT_SOMA"] / n, "LON": somas["LON_SOMA"] / n,
+            "DURACAO_MEDIA_RAW_MIN": (somas["DURACAO_SOMA_MIN"] / somas["DURACAO_CONTAGEM_VALIDA"].where(somas["DURACAO_CONTAGEM_VALIDA"] > 0)).fillna(0),
+        })
+        colunas_num = [coluna_tipo(t) for t in self.tipos]
+        contagens_tipo = somas[colunas_num].round().astype(np.int64)
+        agg["TIPO_PREDOMINANTE"] = np.asarray(self.tipos, dtype=object)[contagens_tipo.to_numpy().argmax(axis=1)] if self.tipos else "desconhecido"
+        agg[colunas_num] = contagens_tipo
+        agg["NUM_INCENDIOS_TOTAL"] = contagens_tipo.sum(axis=1)
+        colunas_area = [coluna_area_tipo(t) for t in self.tipos]
+        agg[colunas_area] = somas[colunas_area]
+        agg["AREA_ARDIDA_TOTAL"] = somas[colunas_area].sum(axis=1)
+        return agg.reset_index()
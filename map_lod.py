@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# constantes
+NIVEIS_LOD = ["DISTRITO", "CONCELHO", "FREGUESIA", "INCENDIO"]
+CHAVES_LOD: Dict[str, List[str]] = { # chaves geográficas de cada nível agregado
+    "DISTRITO": ["DISTRITO"],
+    "CONCELHO": ["DISTRITO", "CONCELHO"],
+    "FREGUESIA": ["DISTRITO", "CONCELHO", "FREGUESIA"],
+}
+MAX_MARCADORES_LOD = 1500 # orçamento de marcadores enviados ao browser nos níveis mais finos
+
+# Nomes das colunas de contagem por tipo (os restantes tipos usam o nome em maiúsculas)
+COLUNAS_TIPO = {"Florestal": "NUM_INCENDIOS_FLORESTAL", "Agrícola": "NUM_INCENDIOS_AGRICOLA",
+                "Urbano": "NUM_INCENDIOS_URBANO", "Desconhecido": "NUM_INCENDIOS_DESCONHECIDO"}
+
+
+def coluna_tipo(tipo: str) -> str:
+    return COLUNAS_TIPO.get(tipo, f"NUM_INCENDIOS_{str(tipo).upper()}")
+
+
+# Escolhe o nível de detalhe a partir do zoom do mapa.
+# `limiares` é uma lista (zoom_maximo, nivel) por ordem crescente; acima do último mostra incêndios individuais.
+def nivel_lod(zoom: Optional[float], limiares: Sequence[Tuple[float, str]]) -> str:
+    if zoom is None:
+        return limiares[0][1]
+    for zoom_maximo, nivel in limiares:
+        if zoom < zoom_maximo:
+            return nivel
+    return "INCENDIO"
+
+
+# Agregações pré-calculadas por (ANO, MES, local) para cada nível de detalhe do mapa principal.
+# Guardam somas e contagens, pelo que qualquer combinação de meses se obtém por soma.
+# Com `motor` (`consultas_sql.MotorSQL`) cada nível é agregado numa consulta aos ficheiros Parquet, sem o DF.
+class AgregadosLOD:
+    def __init__(self, df: Optional[pd.DataFrame] = None, motor: Optional[Any] = None):
+        self._df = df
+        self._motor = motor
+        self._tabelas: Dict[str, pd.DataFrame] = {}
+        tipos = motor.distintos("TIPO") if motor is not None else df["TIPO"].dropna().unique()
+        self.tipos = sorted(tipos) # ordem alfabética = desempate de `Series.mode`
+
+    def get(self, nivel: str) -> pd.DataFrame:
+        if nivel not in self._tabelas:
+            self._tabelas[nivel] = self._construir(nivel)
+        return self._tabelas[nivel]
+
+    def _construir(self, nivel: str) -> pd.DataFrame:
+        if self._motor is not None:
+            return self._motor.agregar_lod(nivel, self.tipos)
+        chaves = CHAVES_LOD[nivel]
+        base = self._df.dropna(subset=["LAT", "LON", chaves[-1]])
+        grupos = ["ANO", "MES", *chaves]
+        tabela = base.groupby(grupos, dropna=False, sort=True).agg(
+            LAT_SOMA=("LAT", "sum"), LON_SOMA=("LON", "sum"),
+            AREA_ARDIDA_TOTAL=("AREATOTAL", "sum"),
+            DURACAO_SOMA_MIN=("DURACAO", "sum"), DURACAO_CONTAGEM_VALIDA=("DURACAO", "count"),
+        )
+        por_tipo = base.groupby([*grupos, "TIPO"], dropna=False).size().unstack("TIPO", fill_value=0)
+        por_tipo = por_tipo.reindex(columns=self.tipos, fill_value=0).rename(columns=coluna_tipo)
+        tabela = tabela.join(por_tipo).reset_index()
+        tabela["NUM_INCENDIOS_TOTAL"] = tabela[[coluna_tipo(t) for t in self.tipos]].sum(axis=1)
+        return tabela
+
+    # Soma os meses selecionados e devolve uma linha por local, no formato usado por `fig_mapa`
+    def consultar(self, nivel: str, ano: int, mes_val: int, viewport: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        tabela = self.get(nivel)
+        mask = tabela["ANO"] == int(ano)
+        if mes_val:
+            mask &= tabela["MES"] == int(mes_val)
+        chaves = CHAVES_LOD[nivel]
+        colunas_soma = [c for c in tabela.columns if c not in ["ANO", "MES", *chaves]]
+        agg = tabela.loc[mask].groupby(chaves, dropna=False, sort=True)[colunas_soma].sum().reset_index()
+
+        n = agg["NUM_INCENDIOS_TOTAL"].where(agg["NUM_INCENDIOS_TOTAL"] > 0)
+        agg["LAT"] = agg.pop("LAT_SOMA") / n
+        agg["LON"] = agg.pop("LON_SOMA") / n
+        agg["DURACAO_MEDIA_RAW_MIN"] = (agg["DURACAO_SOMA_MIN"] / agg["DURACAO_CONTAGEM_VALIDA"].where(agg["DURACAO_CONTAGEM_VALIDA"] > 0)).fillna(0)
+        contagens_tipo = agg[[coluna_tipo(t) for t in self.tipos]].to_numpy()
+        agg["TIPO_PREDOMINANTE"] = np.asarray(self.tipos, dtype=object)[contagens_tipo.argmax(axis=1)] if len(self.tipos) else "Desconhecido"
+        agg = agg[agg["NUM_INCENDIOS_TOTAL"] > 0]
+        if viewport is not None:
+            agg = filtrar_viewport(agg, viewport)
+        return agg.reset_index(drop=True)
+
+
+# Mantém apenas as linhas com LAT/LON dentro do viewport
+def filtrar_viewport(df: pd.DataFrame, viewport: Dict[str, Any]) -> pd.DataFrame:
+    return df[df["LAT"].between(viewport["lat_min"], viewport["lat_max"]) & df["LON"].between(viewport["lon_min"], viewport["lon_max"])]
+
+
+# Nível "INCENDIO": um marcador por incêndio, com as mesmas colunas das agregações
+def incendios_individuais(df_rows: pd.DataFrame, tipos: Sequence[str]) -> pd.DataFrame:
+    df_rows = df_rows.dropna(subset=["LAT", "LON", "CONCELHO"])
+    out = pd.DataFrame({
+        "DISTRITO": df_rows["DISTRITO"], "CONCELHO": df_rows["CONCELHO"], "FREGUESIA": df_rows["FREGUESIA"],
+        "LOCAL": df_rows["LOCAL"], "LAT": df_rows["LAT"], "LON": df_rows["LON"],
+        "NUM_INCENDIOS_TOTAL": 1, "AREA_ARDIDA_TOTAL": df_rows["AREATOTAL"].fillna(0),
+        "DURACAO_MEDIA_RAW_MIN": df_rows["DURACAO"].fillna(0), "TIPO_PREDOMINANTE": df_rows["TIPO"],
+    })
+    for tipo in tipos:
+        out[coluna_tipo(tipo)] = (df_rows["TIPO"] == tipo).astype(int)
+    return out.reset_index(drop=True)
+
+
+# Limita o nº de marcadores ao orçamento, mantendo os locais com maior valor na métrica de tamanho
+def limitar_marcadores(df: pd.DataFrame, coluna_metrica: str, maximo: int = MAX_MARCADORES_LOD) -> pd.DataFrame:
+    if len(df) <= maximo:
+        return df
+    return df.nlargest(maximo, coluna_metrica).reset_index(drop=True)
@@ -0,0 +1,160 @@
+import json
+import struct
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# constantes
+RISCO_CACHE_DIR = Path(__file__).resolve().parent / "data" / "cache" / "risco"
+RISCO_VERSAO = 1 # incrementar quando o cálculo mudar (invalida a cache em disco)
+EXTENSAO_RISCO = (36.9, 42.2, -9.6, -6.1) # lat_min, lat_max, lon_min, lon_max (Portugal Continental)
+PASSO_RISCO_GRAUS = 0.02 # largura de cada célula da grelha em longitude
+LARGURA_BANDA_GRAUS = 0.06 # desvio-padrão do kernel gaussiano da KDE
+NIVEIS_QUANTIZACAO = 255 # densidades guardadas em uint8 (0 = sem risco)
+
+# Escala de cor da camada (RGBA); valores baixos ficam transparentes para não tapar o mapa base
+ESCALA_RISCO: List[Tuple[float, Tuple[int, int, int, int]]] = [
+    (0.0, (255, 255, 178, 0)), (0.15, (254, 217, 118, 90)), (0.4, (253, 141, 60, 150)),
+    (0.7, (240, 59, 32, 190)), (1.0, (189, 0, 38, 220)),
+]
+
+
+def _mercator_y(lat: np.ndarray) -> np.ndarray:
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+
+def _lat_de_mercator(y: np.ndarray) -> np.ndarray:
+    return np.degrees(2 * np.arctan(np.exp(y)) - np.pi / 2)
+
+
+# Bordas da grelha: uniformes em longitude e em y de Mercator (cada célula é um pixel quadrado no mapa,
+# por isso a imagem sobrepõe-se ao mapa web sem distorção)
+def bordas_grelha(extensao: Tuple[float, float, float, float] = EXTENSAO_RISCO, passo: float = PASSO_RISCO_GRAUS) -> Tuple[np.ndarray, np.ndarray]:
+    lat_min, lat_max, lon_min, lon_max = extensao
+    bordas_lon = np.arange(lon_min, lon_max + passo / 2, passo)
+    y_min, y_max = _mercator_y(np.array([lat_min, lat_max]))
+    passo_y = np.radians(passo)
+    bordas_y = np.arange(y_min, y_max + passo_y / 2, passo_y)
+    return bordas_y, bordas_lon
+
+
+def _matriz_gaussiana(centros: np.ndarray, sigma: float) -> np.ndarray:
+    dif = centros[:, None] - centros[None, :]
+    return np.exp(-0.5 * (dif / sigma) ** 2)
+
+
+# KDE gaussiana sobre grelha: histograma 2D seguido de convolução separável (K_y @ H @ K_x).
+# O resultado conserva o nº de pontos (cada ignição distribui peso 1 pelas células vizinhas).
+def kde_grelha(lat: np.ndarray, lon: np.ndarray, bordas_y: np.ndarray, bordas_lon: np.ndarray,
+               largura_banda: float = LARGURA_BANDA_GRAUS) -> np.ndarray:
+    validos = np.isfinite(lat) & np.isfinite(lon)
+    hist, _, _ = np.histogram2d(_mercator_y(lat[validos]), lon[validos], bins=[bordas_y, bordas_lon])
+    centros_y = (bordas_y[:-1] + bordas_y[1:]) / 2; centros_lon = (bordas_lon[:-1] + bordas_lon[1:]) / 2
+    k_y = _matriz_gaussiana(centros_y, np.radians(largura_banda) / np.cos(np.radians(np.mean(EXTENSAO_RISCO[:2]))))
+    k_lon = _matriz_gaussiana(centros_lon, largura_banda)
+    k_y /= k_y.sum(axis=0, keepdims=True); k_lon /= k_lon.sum(axis=0, keepdims=True) # cada ponto soma 1
+    return k_y @ hist @ k_lon.T
+
+
+# Impressão digital das colunas usadas (deteta dados alterados para recalcular a cache)
+def impressao_risco(df: pd.DataFrame) -> str:
+    hashes = pd.util.hash_pandas_object(df[["ANO", "MES", "LAT", "LON"]], index=False)
+    return f"{RISCO_VERSAO}-{int(hashes.sum()):x}-{len(df)}"
+
+
+# Densidade histórica de ignições por mês do ano (índice 0 = mês médio), em ignições por célula num ano típico.
+# Os valores são quantizados (raiz quadrada, uint8) numa escala comum a todos os meses, para serem comparáveis.
+def calcular_tiles_risco(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    bordas_y, bordas_lon = bordas_grelha()
+    n_anos = max(int(df["ANO"].nunique()), 1)
+    lat = df["LAT"].to_numpy(dtype=float); lon = df["LON"].to_numpy(dtype=float); meses = df["MES"].to_numpy()
+
+    densidades = np.zeros((13, len(bordas_y) - 1, len(bordas_lon) - 1))
+    for mes in range(1, 13):
+        sel = meses == mes
+        densidades[mes] = kde_grelha(lat[sel], lon[sel], bordas_y, bordas_lon) / n_anos
+    densidades[0] = densidades[1:].mean(axis=0)
+
+    maximo = float(densidades.max()) or 1.0
+    quantizado = np.round(np.sqrt(densidades / maximo) * NIVEIS_QUANTIZACAO).astype(np.uint8)
+    lat_min, lat_max = _lat_de_mercator(bordas_y[[0, -1]])
+    return {"densidade": quantizado, "maximo": np.array(maximo),
+            "extensao": np.array([lat_min, lat_max, bordas_lon[0], bordas_lon[-1]])}
+
+
+# Codifica uma imagem RGBA (altura x largura x 4, uint8) em PNG, sem dependências externas
+def png_rgba(imagem: np.ndarray) -> bytes:
+    altura, largura, _ = imagem.shape
+    linhas = np.hstack([np.zeros((altura, 1), dtype=np.uint8), imagem.reshape(altura, largura * 4)]) # filtro 0 por linha
+
+    def bloco(tipo: bytes, dados: bytes) -> bytes:
+        return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados) & 0xFFFFFFFF)
+
+    cabecalho = struct.pack(">IIBBBBB", largura, altura, 8, 6, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + bloco(b"IHDR", cabecalho) + bloco(b"IDAT", zlib.compress(linhas.tobytes(), 9)) + bloco(b"IEND", b"")
+
+
+# Tabela de cores (256 entradas RGBA) interpolada a partir de ESCALA_RISCO
+def _tabela_cores() -> np.ndarray:
+    posicoes = np.array([p for p, _ in ESCALA_RISCO]); cores = np.array([c for _, c in ESCALA_RISCO], dtype=float)
+    x = np.linspace(0, 1, NIVEIS_QUANTIZACAO + 1)
+    return np.stack([np.interp(x, posicoes, cores[:, i]) for i in range(4)], axis=1).round().astype(np.uint8)
+
+
+# Camada de risco histórico: calculada uma vez (ou lida do disco) e servida como imagens PNG por mês
+class CamadaRisco:
+    def __init__(self, df: pd.DataFrame, cache_dir: Optional[Path] = RISCO_CACHE_DIR):
+        self.versao = impressao_risco(df)
+        self.periodo = (int(df["ANO"].min()), int(df["ANO"].max())) # anos cobertos (para a legenda)
+        self._cache_dir = Path(cache_dir) if cache_dir is not None else None
+        tiles = self._carregar() if self._cache_dir is not None else None
+        if tiles is None:
+            tiles = calcular_tiles_risco(df)
+            self._guardar(tiles)
+        self.densidade = tiles["densidade"]
+        self.maximo = float(tiles["maximo"])
+        self.extensao = tuple(float(v) for v in tiles["extensao"])
+        self._imagem_png = lru_cache(maxsize=13)(self._gerar_png)
+
+    # Cantos da imagem (sentido horário a partir do canto superior esquerdo), como pedido pelas camadas do mapbox
+    @property
+    def coordenadas(self) -> List[List[float]]:
+        lat_min, lat_max, lon_min, lon_max = self.extensao
+        return [[lon_min, lat_max], [lon_max, lat_max], [lon_max, lat_min], [lon_min, lat_min]]
+
+    def imagem_png(self, mes: int) -> bytes:
+        return self._imagem_png(int(mes))
+
+    def _gerar_png(self, mes: int) -> bytes:
+        cores = _tabela_cores()[self.densidade[mes]]
+        return png_rgba(np.ascontiguousarray(cores[::-1])) # linha 0 da imagem = norte
+
+    def _ficheiro(self) -> Path:
+        return self._cache_dir / "risco.npz"
+
+    def _carregar(self) -> Optional[Dict[str, np.ndarray]]:
+        try:
+            with np.load(self._ficheiro()) as dados:
+                if str(dados["versao"]) != self.versao:
+                    return None
+                return {k: dados[k] for k in ("densidade", "maximo", "extensao")}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _guardar(self, tiles: Dict[str, np.ndarray]) -> None:
+        if self._cache_dir is None:
+            return
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(self._ficheiro(), versao=np.array(self.versao), **tiles)
+
+
+if __name__ == "__main__":
+    # Pré-calcula a camada (o dashboard também a calcula no primeiro acesso se a cache não existir)
+    from dados import DF
+    camada = CamadaRisco(DF)
+    print(json.dumps({"ficheiro": str(RISCO_CACHE_DIR / "risco.npz"), "grelha": list(camada.densidade.shape[1:]),
+                      "max_ignicoes_celula_ano": round(camada.maximo, 3)}))
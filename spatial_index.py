@@ -0,0 +1,117 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# constantes
+PASSO_GRELHA_GRAUS = 0.05 # tamanho da célula do índice (~5 km)
+PASSO_AGREGADO_GRAUS = 0.25 # células grosseiras usadas para resumir os pontos fora da vista
+TILE_SIZE_PX = 512 # tamanho de tile do mapbox/maplibre (usado para estimar a vista a partir de centro/zoom)
+
+
+# Índice espacial em grelha uniforme sobre LAT/LON.
+# Os pontos ficam ordenados por célula (formato CSR: `ordem` + `offsets`), por isso uma consulta
+# por retângulo só visita as células que o intersetam e devolve posições (iloc) do DataFrame original.
+class GridIndex:
+    def __init__(self, lat: Sequence[float], lon: Sequence[float], passo: float = PASSO_GRELHA_GRAUS):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.n = len(self.lat)
+        self.passo = passo
+
+        validos = np.isfinite(self.lat) & np.isfinite(self.lon)
+        if validos.any():
+            self.lat0 = np.floor(self.lat[validos].min() / passo) * passo
+            self.lon0 = np.floor(self.lon[validos].min() / passo) * passo
+            self.n_linhas = int((self.lat[validos].max() - self.lat0) // passo) + 1
+            self.n_colunas = int((self.lon[validos].max() - self.lon0) // passo) + 1
+        else: # índice vazio
+            self.lat0 = self.lon0 = 0.0
+            self.n_linhas = self.n_colunas = 1
+
+        posicoes = np.flatnonzero(validos)
+        celulas = self._celula(self.lat[posicoes], self.lon[posicoes])
+        ordem_local = np.argsort(celulas, kind="stable")
+        self.ordem = posicoes[ordem_local] # posições agrupadas por célula
+        contagens = np.bincount(celulas, minlength=self.n_linhas * self.n_colunas)
+        self.offsets = np.concatenate(([0], np.cumsum(contagens))) # início de cada célula em `ordem`
+
+    def _celula(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        linha = np.clip(((lat - self.lat0) // self.passo).astype(int), 0, self.n_linhas - 1)
+        coluna = np.clip(((lon - self.lon0) // self.passo).astype(int), 0, self.n_colunas - 1)
+        return linha * self.n_colunas + coluna
+
+    # Devolve as posições (ordenadas) dos pontos dentro do retângulo [lat_min, lat_max] x [lon_min, lon_max]
+    def query_bbox(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> np.ndarray:
+        l0 = int(np.clip((lat_min - self.lat0) // self.passo, 0, self.n_linhas - 1))
+        l1 = int(np.clip((lat_max - self.lat0) // self.passo, 0, self.n_linhas - 1))
+        c0 = int(np.clip((lon_min - self.lon0) // self.passo, 0, self.n_colunas - 1))
+        c1 = int(np.clip((lon_max - self.lon0) // self.passo, 0, self.n_colunas - 1))
+        if lat_max < self.lat0 or lon_max < self.lon0 or l0 > l1 or c0 > c1:
+            return np.empty(0, dtype=int)
+
+        # as células de uma linha da grelha entre c0 e c1 são contíguas em `ordem`
+        fatias = [self.ordem[self.offsets[l * self.n_colunas + c0]:self.offsets[l * self.n_colunas + c1 + 1]] for l in range(l0, l1 + 1)]
+        candidatos = np.concatenate(fatias) if fatias else np.empty(0, dtype=int)
+        # filtro exato (as células da fronteira podem ter pontos fora do retângulo)
+        lat_c = self.lat[candidatos]; lon_c = self.lon[candidatos]
+        dentro = (lat_c >= lat_min) & (lat_c <= lat_max) & (lon_c >= lon_min) & (lon_c <= lon_max)
+        return np.sort(candidatos[dentro])
+
+    # Máscara booleana (tamanho n) dos pontos dentro de um viewport
+    def mascara_viewport(self, viewport: Dict[str, float]) -> np.ndarray:
+        mascara = np.zeros(self.n, dtype=bool)
+        mascara[self.query_bbox(viewport["lat_min"], viewport["lat_max"], viewport["lon_min"], viewport["lon_max"])] = True
+        return mascara
+
+
+# Converte o relayoutData de um mapa (mapbox ou maplibre) nos limites visíveis.
+# Devolve None quando o evento não altera a vista (ex: autosize), para o callback não recalcular nada.
+def viewport_de_relayout(relayout: Optional[dict], largura_px: int = 500, altura_px: int = 500) -> Optional[Dict[str, float]]:
+    if not relayout:
+        return None
+    for prefixo in ("mapbox", "map"):
+        derivado = relayout.get(f"{prefixo}._derived")
+        centro = relayout.get(f"{prefixo}.center")
+        zoom = relayout.get(f"{prefixo}.zoom")
+        if derivado and derivado.get("coordinates"): # cantos exatos enviados pelo plotly.js
+            lons = [c[0] for c in derivado["coordinates"]]; lats = [c[1] for c in derivado["coordinates"]]
+            viewport = {"lat_min": min(lats), "lat_max": max(lats), "lon_min": min(lons), "lon_max": max(lons)}
+        elif centro is not None and zoom is not None: # estimativa a partir do centro e zoom (projeção web mercator)
+            graus_por_px = 360.0 / (TILE_SIZE_PX * 2 ** zoom)
+            meia_lon = graus_por_px * largura_px / 2
+            meia_lat = graus_por_px * altura_px / 2 * np.cos(np.radians(centro["lat"]))
+            viewport = {"lat_min": centro["lat"] - meia_lat, "lat_max": centro["lat"] + meia_lat,
+                        "lon_min": centro["lon"] - meia_lon, "lon_max": centro["lon"] + meia_lon}
+        else:
+            continue
+        if centro is not None and zoom is not None: # guarda a vista para a figura seguinte não saltar
+            viewport["center"] = {"lat": centro["lat"], "lon": centro["lon"]}
+            viewport["zoom"] = zoom
+        return viewport
+    return None
+
+
+# Resume pontos em células grosseiras: uma linha por célula (e por chave extra, ex: DIA),
+# com LAT/LON médios, média das colunas de valor e nº de pontos agregados.
+def agregado_grosseiro(df: pd.DataFrame, colunas_media: List[str], chaves_extra: Optional[List[str]] = None,
+                       colunas_angulo: Optional[List[str]] = None, passo: float = PASSO_AGREGADO_GRAUS) -> pd.DataFrame:
+    chaves_extra = [c for c in (chaves_extra or []) if c in df.columns]
+    colunas_angulo = colunas_angulo or []
+    if df.empty:
+        return pd.DataFrame(columns=["LAT", "LON", *colunas_media, *colunas_angulo, *chaves_extra, "N_AGREGADOS"])
+
+    base = df.assign(_CEL_LAT=(df["LAT"] // passo).astype(int), _CEL_LON=(df["LON"] // passo).astype(int))
+    for col in colunas_angulo: # ângulos (graus) agregados pela média circular
+        rad = np.radians(base[col])
+        base = base.assign(**{f"_{col}_SIN": np.sin(rad), f"_{col}_COS": np.cos(rad)})
+
+    agg_config = {"LAT": ("LAT", "mean"), "LON": ("LON", "mean"), "N_AGREGADOS": ("LAT", "size")}
+    agg_config.update({col: (col, "mean") for col in colunas_media})
+    for col in colunas_angulo:
+        agg_config[f"_{col}_SIN"] = (f"_{col}_SIN", "mean"); agg_config[f"_{col}_COS"] = (f"_{col}_COS", "mean")
+    agregado = base.groupby(["_CEL_LAT", "_CEL_LON", *chaves_extra], sort=False).agg(**agg_config).reset_index()
+
+    for col in colunas_angulo:
+        agregado[col] = np.degrees(np.arctan2(agregado.pop(f"_{col}_SIN"), agregado.pop(f"_{col}_COS"))) % 360
+    return agregado.drop(columns=["_CEL_LAT", "_CEL_LON"])
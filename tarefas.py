@@ -0,0 +1,175 @@
+import os
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Union
+
+import pandas as pd
+
+import dados
+from densidade import resumo_violino
+from feature_store import perfil_horario, serie_diaria
+from figuras import (create_empty_figure, fig_calendario, fig_concorrencia, fig_meteo_map, fig_perfil_horario_agregado, fig_pie_causas, fig_relacao_metricas,
+                     fig_scatter_meteo, fig_serie_diaria, fig_violin_distribution, fig_violin_kde, get_time_period_string, img_nuvem_palavras)
+
+# Construtores de figuras executados nos processos do `ExecutorFiguras`.
+# Recebem só filtros (e não os dados do store) e leem a fatia do DF no próprio processo;
+# devolvem o dicionário da figura, mais barato de passar entre processos do que um go.Figure (que é revalidado).
+
+# constantes
+PAINEIS = ("perfil", "meteo_mapa", "dispersao", "violino", "causas", "relacao", "concorrencia") # painéis do render consolidado
+COLUNAS_METEO = ["TEMPERATURA", "HUMIDADERELATIVA", "VENTOINTENSIDADE"]
+VIOLINO_NO_SERVIDOR = os.environ.get("CRONOFOGO_VIOLINO", "servidor").lower() != "browser" # "browser" volta ao px.violin (KDE no browser)
+MAX_RESUMOS_VIOLINO = 64 # fatias (ano, mês, local) com as densidades do violino em memória
+
+
+# Inicialização de cada processo: carrega os dados e o índice espacial (com `fork` já vêm do processo principal).
+# Com o motor SQL não há nada a carregar: as fatias e as agregações (feature store, níveis do mapa, simultâneos)
+# são consultas aos ficheiros Parquet e o DF completo nunca é lido.
+def iniciar_processo() -> None:
+    if dados.SQL is None:
+        dados.DF
+        dados.SPATIAL_INDEX
+
+
+# Dados partilhados pelos painéis de uma interação: a fatia (ano, mês, local) é resolvida uma só vez
+# e as colunas meteorológicas (dispersão e violino) são convertidas uma só vez.
+class PacotePaineis:
+    def __init__(self, ano: int, mes_val: int, sel_dist: str, sel_conc: str):
+        self.ano, self.mes_val = ano, mes_val
+        self.local = (sel_dist, sel_conc)
+        self.df, self.nome_local = dados.fatia_local(ano, mes_val, sel_dist, sel_conc)
+        self.periodo = get_time_period_string(ano, mes_val)
+        self._meteo: Optional[pd.DataFrame] = None
+
+    @property
+    def meteo(self) -> pd.DataFrame:
+        if self._meteo is None:
+            meteo = self.df[COLUNAS_METEO + ["TIPO"]].copy()
+            meteo["VENTOINTENSIDADE"] = pd.to_numeric(meteo["VENTOINTENSIDADE"], errors="coerce")
+            self._meteo = meteo
+        return self._meteo
+
+    def vazio(self, mensagem: str, height: int) -> Dict[str, Any]:
+        return create_empty_figure(f"{mensagem}<br>({self.nome_local.lower()} - {self.periodo.lower()}).", height=height).to_dict()
+
+
+@lru_cache(maxsize=8)
+def pacote_paineis(ano: int, mes_val: int, sel_dist: str, sel_conc: str) -> PacotePaineis:
+    return PacotePaineis(ano, mes_val, sel_dist, sel_conc)
+
+
+# Perfil horário somado a partir dos acumuladores horários da feature store (não precisa da fatia de incêndios)
+def _figura_perfil(ano: int, mes_val: int, sel_dist: str, sel_conc: str, metric: str, height: int) -> Dict[str, Any]:
+    perfil = perfil_horario(dados.FEATURES, metric, ano=ano, mes_val=mes_val, sel_dist=sel_dist, sel_conc=sel_conc)
+    return fig_perfil_horario_agregado(perfil, metric, dados.nome_local(sel_dist, sel_conc), ano, mes_val, height=height).to_dict()
+
+
+def _figura_dispersao(pacote: PacotePaineis, height: int, x_range: Optional[Tuple[float, float]] = None,
+                      y_range: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    if pacote.df.empty:
+        return pacote.vazio("Sem dados para Temp/Hum/Vento", height)
+    return fig_scatter_meteo(pacote.meteo, pacote.nome_local, pacote.ano, pacote.mes_val, height=height, x_range=x_range, y_range=y_range).to_dict()
+
+
+# Dispersão meteo refinada à zona visível (zoom): a amostra é refeita só com os incêndios dessa zona
+def figura_dispersao(ano: int, mes_val: int, sel_dist: str, sel_conc: str, height: int,
+                     x_range: Optional[Tuple[float, float]] = None, y_range: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    return _figura_dispersao(pacote_paineis(ano, mes_val, sel_dist, sel_conc), height, x_range, y_range)
+
+
+def _figura_violino(pacote: PacotePaineis, height: int) -> Dict[str, Any]:
+    if pacote.df.empty:
+        return create_empty_figure(f"Sem dados meteorológicos para<br>distribuição ({pacote.nome_local.lower()} - {pacote.periodo.lower()}).", height=height).to_dict()
+    if VIOLINO_NO_SERVIDOR:
+        resumos = resumos_violino(pacote.ano, pacote.mes_val, *pacote.local)
+        return fig_violin_kde(resumos, pacote.nome_local, pacote.ano, pacote.mes_val, height=height).to_dict()
+    return fig_violin_distribution(pacote.meteo, pacote.nome_local, pacote.ano, pacote.mes_val, height=height).to_dict()
+
+
+# Densidades e quartis de cada variável meteorológica por fatia: calculados uma vez e reutilizados
+# em qualquer altura do painel (e depois de o pacote da fatia sair da sua cache, que é mais pequena)
+@lru_cache(maxsize=MAX_RESUMOS_VIOLINO)
+def resumos_violino(ano: int, mes_val: int, sel_dist: str, sel_conc: str) -> Dict[str, Any]:
+    meteo = pacote_paineis(ano, mes_val, sel_dist, sel_conc).meteo
+    return {coluna: resumo_violino(meteo[coluna]) for coluna in COLUNAS_METEO}
+
+
+# Tipos de causa (gráfico) ou famílias de causa (nuvem de palavras: imagem base64 ou mensagem)
+def _figura_causas(pacote: PacotePaineis, metric: str, nuvem: bool, height: int) -> Union[Dict[str, Any], str]:
+    if pacote.df.empty:
+        return f"Sem dados de causas para {pacote.nome_local.lower()}<br>({pacote.periodo.lower()})."
+    if nuvem:
+        return img_nuvem_palavras(pacote.df, metric, pacote.nome_local, pacote.ano, pacote.mes_val, width=400, height=height)
+    return fig_pie_causas(pacote.df, metric, pacote.nome_local, pacote.ano, pacote.mes_val, height=height).to_dict()
+
+
+# Relação entre métricas: todos os meses do ano, lidos da feature store (não depende do mês selecionado)
+def _figura_relacao(ano: int, sel_dist: str, sel_conc: str, height: int) -> Dict[str, Any]:
+    df_ano_mensal = dados.FEATURES.consultar("mensal", ano=ano)
+    if df_ano_mensal.empty:
+        return create_empty_figure(f"Sem dados para o ano de {ano}.", height=height).to_dict()
+    nome = "Portugal Continental"; df_chart_data = df_ano_mensal
+    if sel_conc != "Todos":
+        df_chart_data = dados.FEATURES.consultar("mensal", ano=ano, sel_conc=sel_conc)
+        # Adiciona nome do distrito ao título do concelho para contexto
+        dist_of_conc = dados.FEATURES.consultar("mensal", sel_conc=sel_conc)["DISTRITO"].dropna().unique()
+        dist_suffix = f" (Dist. {dist_of_conc[0].title()})" if len(dist_of_conc) > 0 else ""
+        nome = f"Concelho de {sel_conc.title()}{dist_suffix}"
+    elif sel_dist != "Todos":
+        df_chart_data = dados.FEATURES.consultar("mensal", ano=ano, sel_dist=sel_dist)
+        nome = f"Distrito de {sel_dist.title()}"
+    return fig_relacao_metricas(df_chart_data, ano, nome, altura_grafico=height).to_dict()
+
+
+# Incêndios ativos em simultâneo: a linha temporal da fatia (ano, mês) fica em cache no processo
+def _figura_concorrencia(ano: int, mes_val: int, sel_dist: str, sel_conc: str, height: int) -> Dict[str, Any]:
+    tempos, ativos, picos = dados.CONCORRENCIA.get(ano, mes_val).para_local(sel_dist, sel_conc)
+    return fig_concorrencia(tempos, ativos, picos, dados.nome_local(sel_dist, sel_conc), ano, mes_val, height=height).to_dict()
+
+
+def _figura_meteo_mapa(variable: str, sel_dist: str, sel_conc: str, ano: int, mes_val: int, height: int) -> Dict[str, Any]:
+    if mes_val == 0: # Mapas meteo requerem um mês específico
+        return create_empty_figure("⚠️<br>Seleciona um mês específico<br>para ver o mapa meteorológico.", height=height).to_dict()
+    return figura_mapa_meteo(variable, sel_dist, sel_conc, ano, mes_val)
+
+
+# Render consolidado: constrói os painéis pedidos (painel -> opções) a partir do mesmo pacote de dados
+def renderizar_paineis(ano: int, mes_val: int, sel_dist: str, sel_conc: str, pedidos: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    pacote = lambda: pacote_paineis(ano, mes_val, sel_dist, sel_conc) # só é criado se algum painel precisar da fatia
+    construtores = {
+        "perfil": lambda o: _figura_perfil(ano, mes_val, sel_dist, sel_conc, o["metric"], o["height"]),
+        "meteo_mapa": lambda o: _figura_meteo_mapa(o["variable"], sel_dist, sel_conc, ano, mes_val, o["height"]),
+        "dispersao": lambda o: _figura_dispersao(pacote(), o["height"]),
+        "violino": lambda o: _figura_violino(pacote(), o["height"]),
+        "causas": lambda o: _figura_causas(pacote(), o["metric"], o["nuvem"], o["height"]),
+        "relacao": lambda o: _figura_relacao(ano, sel_dist, sel_conc, o["height"]),
+        "concorrencia": lambda o: _figura_concorrencia(ano, mes_val, sel_dist, sel_conc, o["height"]),
+    }
+    return {painel: construtores[painel](opcoes) for painel, opcoes in pedidos.items()}
+
+
+# Com o motor SQL recebe já a fatia (ano, mês, local); os pontos fora da vista continuam a seguir resumidos
+def figura_mapa_meteo(variable: str, sel_dist: str, sel_conc: str, ano: int, mes_val: int,
+                      viewport: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    if dados.SQL is not None:
+        df = dados.SQL.fatia(ano, mes_val, sel_dist, sel_conc)
+        return fig_meteo_map(df, variable, sel_dist, sel_conc, ano, mes_val, viewport=viewport).to_dict()
+    indice = dados.SPATIAL_INDEX if viewport is not None else None
+    return fig_meteo_map(dados.DF, variable, sel_dist, sel_conc, ano, mes_val, viewport=viewport, indice_espacial=indice).to_dict()
+
+
+# Série diária (todos os anos) de cada local, calculada uma vez a partir da agregação diária da feature store
+@lru_cache(maxsize=32)
+def serie_diaria_local(sel_dist: str, sel_conc: str) -> pd.DataFrame:
+    return serie_diaria(dados.FEATURES, sel_dist, sel_conc)
+
+
+# Série diária reduzida (LTTB) ao intervalo visível; `x_range` None = todos os anos
+def figura_serie_diaria(metric: str, sel_dist: str, sel_conc: str, height: int,
+                        x_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None) -> Dict[str, Any]:
+    return fig_serie_diaria(serie_diaria_local(sel_dist, sel_conc), metric, dados.nome_local(sel_dist, sel_conc), x_range, height=height).to_dict()
+
+
+# Calendário de um ano: fatia (local, ano) do array denso do calendário, sem reagregar os dados diários
+def figura_calendario(metric: str, ano: int, sel_dist: str, sel_conc: str, height: int) -> Dict[str, Any]:
+    valores = dados.CALENDARIO.valores(ano, metric, sel_dist, sel_conc)
+    return fig_calendario(valores, ano, metric, dados.nome_local(sel_dist, sel_conc), height=height).to_dict()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos do projeto estão na raiz do repositório (não há pacote)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
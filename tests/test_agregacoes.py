@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregacoes import codificar, desvio_padrao_acumulado, moda, predominante
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+# Moda por grupo contra o value_counts do pandas (empate -> menor código; grupo vazio -> -1)
+def test_moda_igual_ao_pandas(rng):
+    n, n_grupos, n_categorias = 5000, 40, 6
+    codigos = rng.integers(-1, n_grupos - 3, n) # os últimos grupos ficam vazios; -1 = em falta
+    categorias = rng.integers(-1, n_categorias, n)
+    resultado = moda(codigos, categorias, n_grupos, n_categorias)
+
+    df = pd.DataFrame({"g": codigos, "c": categorias})
+    df = df[(df["g"] >= 0) & (df["c"] >= 0)]
+    for grupo in range(n_grupos):
+        contagens = df.loc[df["g"] == grupo, "c"].value_counts()
+        esperado = -1 if contagens.empty else int(contagens[contagens == contagens.max()].index.min())
+        assert resultado[grupo] == esperado
+
+
+def test_moda_sem_categorias():
+    assert moda(np.array([0, 1]), np.array([-1, -1]), 2, 0).tolist() == [-1, -1]
+
+
+# Com poucas categorias os empates são frequentes: o desempate tem de ser o do Series.mode()[0]
+def test_predominante_igual_ao_mode(rng):
+    df = pd.DataFrame({"DISTRITO": rng.choice(["Braga", "Porto", "Faro", "Beja"], 400),
+                       "TIPO": rng.choice(["Agrícola", "Florestal", None], 400)})
+    df.loc[df["DISTRITO"] == "Beja", "TIPO"] = None # grupo só com valores em falta
+    resultado = predominante(df, "DISTRITO", "TIPO")
+    esperado = df.groupby("DISTRITO")["TIPO"].agg(lambda s: s.mode()[0] if s.notna().any() else "desconhecido")
+    pd.testing.assert_series_equal(resultado, esperado.rename("TIPO"), check_index_type=False)
+
+
+# Desvio-padrão a partir de (n, Σx, Σx²) contra o std do pandas, por grupo e depois de somar acumuladores de grupos
+def test_desvio_padrao_acumulado_igual_ao_pandas(rng):
+    df = pd.DataFrame({"g": rng.integers(0, 30, 3000), "x": rng.normal(25, 7, 3000)})
+    df = pd.concat([df, pd.DataFrame({"g": [30, 31, 31, 31], "x": [4.0, 2.5, 2.5, 2.5]})]) # um valor só; todos iguais
+    acumulados = df.assign(x2=df["x"] ** 2).groupby("g").agg(n=("x", "size"), s=("x", "sum"), s2=("x2", "sum"))
+    resultado = desvio_padrao_acumulado(acumulados["n"], acumulados["s"], acumulados["s2"])
+    np.testing.assert_allclose(resultado, df.groupby("g")["x"].std(ddof=1).to_numpy(), rtol=1e-9, equal_nan=True)
+    assert np.isnan(resultado[-2]) and resultado[-1] == 0
+
+    pares = acumulados.groupby(acumulados.index // 2).sum() # os acumuladores somam-se entre grupos sem perda
+    np.testing.assert_allclose(desvio_padrao_acumulado(pares["n"], pares["s"], pares["s2"]),
+                               df.groupby(df["g"] // 2)["x"].std(ddof=1).to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+def test_codificar_ordenado():
+    codigos, categorias = codificar(["b", None, "a", "b"])
+    assert categorias.tolist() == ["a", "b"] and codigos.tolist() == [1, -1, 0, 1]
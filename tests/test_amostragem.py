@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from amostragem import N_CELULAS_AMOSTRA, _obrigatorios, amostra_estratificada, lttb
+
+
+# LTTB tal como descrito por Steinarsson (2013), ponto a ponto
+def _lttb_referencia(x, y, n_pontos):
+    n = len(x)
+    limite = lambda i: i * (n - 2) // (n_pontos - 2) + 1 # ⌊i × (n - 2) / (n_pontos - 2)⌋ + 1, sem arredondamentos
+    escolhidos = [0]
+    a = 0
+    for i in range(n_pontos - 2):
+        ini, fim = limite(i), limite(i + 1)
+        seg_ini, seg_fim = fim, min(limite(i + 2), n)
+        mx, my = np.mean(x[seg_ini:seg_fim]), np.mean(y[seg_ini:seg_fim])
+        melhor, area_max = ini, -1.0
+        for j in range(ini, fim):
+            area = abs((x[a] - mx) * (y[j] - y[a]) - (x[a] - x[j]) * (my - y[a])) / 2
+            if area > area_max:
+                melhor, area_max = j, area
+        escolhidos.append(melhor)
+        a = melhor
+    return np.array(escolhidos + [n - 1])
+
+
+@pytest.mark.parametrize("n, n_pontos", [(1000, 100), (1001, 37), (50, 3), (500, 499)])
+def test_lttb_igual_a_referencia(n, n_pontos):
+    rng = np.random.default_rng(n)
+    x = np.sort(rng.uniform(0, 100, n)); y = np.cumsum(rng.normal(0, 1, n))
+    np.testing.assert_array_equal(lttb(x, y, n_pontos), _lttb_referencia(x, y, n_pontos))
+
+
+def test_lttb_dentro_do_orcamento():
+    x = np.arange(10.0)
+    assert lttb(x, x ** 2, 20).tolist() == list(range(10))
+    assert lttb(x, x ** 2, 2).tolist() == list(range(10))
+
+
+@pytest.fixture(scope="module")
+def nuvem():
+    rng = np.random.default_rng(2)
+    n = 20_000
+    colunas = [rng.normal(22, 6, n), rng.normal(45, 15, n), rng.gamma(2, 6, n)]
+    return colunas, rng.integers(0, 8, n)
+
+
+@pytest.mark.parametrize("n_pontos", [1, 10, 47, 400, 3000, 19_999])
+def test_amostra_dentro_do_orcamento(nuvem, n_pontos):
+    colunas, estratos = nuvem
+    indices = amostra_estratificada(colunas, estratos, n_pontos)
+    assert len(indices) <= n_pontos
+    assert np.array_equal(indices, np.unique(indices)) # ordenados e sem repetidos
+    np.testing.assert_array_equal(indices, amostra_estratificada(colunas, estratos, n_pontos)) # semente fixa
+
+
+def test_amostra_cabe_inteira(nuvem):
+    colunas, estratos = nuvem
+    assert len(amostra_estratificada(colunas, estratos, len(estratos))) == len(estratos)
+
+
+# Com folga no orçamento, o mínimo e o máximo de cada coluna em cada estrato (groupby do pandas) ficam sempre
+def test_amostra_mantem_extremos_por_estrato(nuvem):
+    colunas, estratos = nuvem
+    indices = set(amostra_estratificada(colunas, estratos, 1000).tolist())
+    for valores in colunas:
+        por_estrato = pd.Series(valores).groupby(estratos)
+        assert set(por_estrato.idxmin()) <= indices and set(por_estrato.idxmax()) <= indices
+
+
+# Mais grupos (estrato × célula) do que orçamento: a parte por densidade não pode ficar vazia
+def test_amostra_com_mais_grupos_do_que_orcamento(nuvem):
+    colunas, estratos = nuvem
+    n_pontos = 400
+    indices = amostra_estratificada(colunas, estratos, n_pontos)
+    assert len(indices) == n_pontos
+
+
+# Regra das quotas verificada por força bruta: depois de tirar os pontos obrigatórios, cada grupo (estrato × célula,
+# contado com um groupby) com c pontos fica com k = min(c, ⌈λ·√c⌉) para um mesmo λ. Cada grupo dá um intervalo de λ
+# compatível com o seu k; os intervalos de todos os grupos têm de se intersetar.
+def test_amostra_segue_regra_das_quotas(nuvem):
+    colunas, estratos = nuvem
+    n_pontos = 3000
+    indices = amostra_estratificada(colunas, estratos, n_pontos)
+    obrigatorios = _obrigatorios(colunas, estratos, n_pontos // 2)
+    assert set(obrigatorios.tolist()) <= set(indices.tolist())
+
+    celula = np.zeros(len(estratos), dtype=np.int64)
+    for valores in colunas[:2]:
+        passo = (valores.max() - valores.min()) / N_CELULAS_AMOSTRA
+        celula = celula * N_CELULAS_AMOSTRA + np.clip((valores - valores.min()) // passo, 0, N_CELULAS_AMOSTRA - 1).astype(np.int64)
+    grupo = pd.Series(estratos * N_CELULAS_AMOSTRA ** 2 + celula).drop(obrigatorios)
+    contagens = pd.DataFrame({"c": grupo.value_counts(), "k": grupo[grupo.index.isin(indices)].value_counts()}).fillna(0)
+    raiz = np.sqrt(contagens["c"])
+    parciais = contagens["k"] < contagens["c"]
+    inferior = ((contagens["k"] - 1) / raiz).max() # ⌈λ√c⌉ = k  =>  (k - 1)/√c < λ
+    superior = (contagens["k"][parciais] / raiz[parciais]).min() # e λ ≤ k/√c nos grupos que não ficam inteiros
+    assert inferior < superior
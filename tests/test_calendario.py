@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from calendario import CalendarioIncendios, datas_do_ano
+from feature_store import agregar_frequencia
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(10)
+    n = 5000
+    datas = pd.Timestamp("2016-01-01") + pd.to_timedelta(rng.integers(0, 731, n), unit="D") # 2016 (bissexto) e 2017
+    concelhos = {"Fafe": "Braga", "Maia": "Porto", "Loulé": "Faro"}
+    concelho = rng.choice(list(concelhos), n)
+    df = pd.DataFrame({
+        "id": np.arange(n), "ANO": datas.year, "MES": datas.month, "DIA": datas.day.astype(float), "HORA": rng.integers(0, 24, n),
+        "AREATOTAL": rng.gamma(0.5, 20, n), "DURACAO": rng.gamma(2, 90, n),
+        "DISTRITO": [concelhos[c] for c in concelho], "CONCELHO": concelho,
+        "TEMPERATURA": 20.0, "HUMIDADERELATIVA": 50.0, "VENTOINTENSIDADE": 10.0,
+    })
+    df.loc[rng.random(n) < 0.1, "DURACAO"] = np.nan
+    # 29 de fevereiro e 31 de dezembro sempre com incêndios
+    extra = df.iloc[:3].assign(ANO=[2016, 2016, 2017], MES=[2, 12, 12], DIA=[29.0, 31.0, 31.0])
+    return pd.concat([df, extra], ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def calendario(df):
+    return CalendarioIncendios(agregar_frequencia(df, "diario"))
+
+
+# Medidas por dia do ano agrupadas diretamente a partir dos incêndios
+def _por_dia(df, ano, coluna=None, local=None):
+    fatia = df[df["ANO"] == ano]
+    if coluna is not None:
+        fatia = fatia[fatia[coluna] == local]
+    dia = pd.to_datetime(pd.DataFrame({"year": fatia["ANO"], "month": fatia["MES"], "day": fatia["DIA"]})).dt.dayofyear - 1
+    n_dias = len(datas_do_ano(ano))
+    grupos = fatia.groupby(dia)
+    return {
+        "NUM_INCENDIOS": grupos["id"].count().reindex(range(n_dias), fill_value=0).to_numpy(dtype=float),
+        "AREA_ARDIDA": grupos["AREATOTAL"].sum().reindex(range(n_dias), fill_value=0).to_numpy(dtype=float),
+        "DURACAO_MEDIA": (grupos["DURACAO"].mean() / 60).reindex(range(n_dias)).to_numpy(dtype=float),
+    }
+
+
+@pytest.mark.parametrize("ano", [2016, 2017])
+@pytest.mark.parametrize("sel_dist, sel_conc, coluna, local", [("Todos", "Todos", None, None), ("porto", "Todos", "DISTRITO", "Porto"),
+                                                               ("Braga", "Fafe", "CONCELHO", "Fafe")])
+def test_valores_iguais_ao_pandas(calendario, df, ano, sel_dist, sel_conc, coluna, local):
+    esperado = _por_dia(df, ano, coluna, local)
+    for metric, valores in esperado.items():
+        obtido = calendario.valores(ano, metric, sel_dist, sel_conc)
+        assert len(obtido) == (366 if ano == 2016 else 365)
+        np.testing.assert_allclose(obtido, valores, rtol=1e-5) # float32 no calendário
+
+
+def test_ano_bissexto(calendario, df):
+    medidas = calendario.medidas(2016)
+    assert len(medidas["NUM_INCENDIOS"]) == 366
+    assert medidas["NUM_INCENDIOS"][59] == ((df["ANO"] == 2016) & (df["MES"] == 2) & (df["DIA"] == 29)).sum()
+    assert len(calendario.medidas(2017)["NUM_INCENDIOS"]) == 365
+
+
+@pytest.mark.parametrize("ano, sel_dist, sel_conc, n_dias", [(2016, "Lisboa", "Todos", 366), (2017, "Todos", "Sintra", 365),
+                                                              (2015, "Todos", "Todos", 365), (2020, "Braga", "Todos", 366)])
+def test_sem_dados_da_zeros(calendario, ano, sel_dist, sel_conc, n_dias):
+    medidas = calendario.medidas(ano, sel_dist, sel_conc)
+    assert all(len(v) == n_dias and not v.any() for v in medidas.values())
+    assert np.isnan(calendario.valores(ano, "DURACAO_MEDIA", sel_dist, sel_conc)).all()
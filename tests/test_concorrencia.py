@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from concorrencia import LinhaConcorrencia, intervalos, varrer
+
+
+@pytest.fixture(scope="module")
+def eventos():
+    rng = np.random.default_rng(3)
+    n = 400
+    inicio = rng.integers(0, 200, n) # tempos inteiros pequenos: muitos empates entre inícios e fins
+    fim = inicio + rng.integers(1, 30, n)
+    return inicio, fim, rng.integers(0, 5, n)
+
+
+# Ativos em t por força bruta: intervalos [início, fim) que contêm t
+def _ativos_em(inicio, fim, t):
+    return int(((inicio <= t) & (t < fim)).sum())
+
+
+# Depois do último evento de cada instante, a soma acumulada é o nº de intervalos que contêm esse instante
+def test_varrer_igual_a_forca_bruta(eventos):
+    inicio, fim, _ = eventos
+    tempos, ativos, _ = varrer(inicio, fim)
+    ultimo = np.r_[tempos[1:] != tempos[:-1], True]
+    assert [_ativos_em(inicio, fim, t) for t in tempos[ultimo]] == ativos[ultimo].tolist()
+    assert ativos.max() == max(_ativos_em(inicio, fim, t) for t in range(0, 240))
+    assert ativos[-1] == 0
+
+
+def test_varrer_por_grupo(eventos):
+    inicio, fim, codigos = eventos
+    tempos, ativos, grupos = varrer(inicio, fim, codigos)
+    assert (np.diff(grupos) >= 0).all()
+    for g in np.unique(codigos):
+        mask = codigos == g
+        no_grupo = grupos == g
+        assert ativos[no_grupo].max() == max(_ativos_em(inicio[mask], fim[mask], t) for t in range(0, 240))
+        ultimo = np.r_[tempos[no_grupo][1:] != tempos[no_grupo][:-1], True]
+        esperado = [_ativos_em(inicio[mask], fim[mask], t) for t in tempos[no_grupo][ultimo]]
+        assert ativos[no_grupo][ultimo].tolist() == esperado
+
+
+# Um incêndio que termina quando outro começa não conta como simultâneo
+def test_varrer_intervalos_encostados():
+    _, ativos, _ = varrer(np.array([0, 5]), np.array([5, 10]))
+    assert ativos.max() == 1
+
+
+def test_varrer_vazio():
+    tempos, ativos, grupos = varrer(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    assert len(tempos) == len(ativos) == len(grupos) == 0
+
+
+def test_intervalos_ignora_invalidos():
+    df = pd.DataFrame({
+        "DHINICIO": pd.to_datetime(["2017-06-17 14:00", None, "2017-06-18 10:00", "2017-06-18 12:00"]),
+        "DHFIM": pd.to_datetime(["2017-06-17 20:00", "2017-06-17 20:00", "2017-06-18 09:00", "2017-06-18 12:00"]),
+    })
+    inicio, fim, validos = intervalos(df)
+    assert validos.tolist() == [True, False, False, False]
+    assert (fim - inicio).tolist() == [6 * 3600 * 10 ** 9]
+
+
+# Picos por distrito contra o máximo por força bruta de cada distrito
+def test_picos_por_distrito(eventos):
+    inicio, fim, codigos = eventos
+    base = np.datetime64("2017-06-01T00:00", "ns")
+    distritos = np.array(["Braga", "Porto", "Faro", "Leiria", "Viseu"])[codigos]
+    df = pd.DataFrame({"DHINICIO": base + inicio.astype("timedelta64[h]"), "DHFIM": base + fim.astype("timedelta64[h]"),
+                       "DISTRITO": distritos, "CONCELHO": distritos})
+    picos = LinhaConcorrencia(df).picos("DISTRITO").set_index("DISTRITO")["PICO_ATIVOS"]
+    for distrito in np.unique(distritos):
+        mask = distritos == distrito
+        assert picos[distrito] == max(_ativos_em(inicio[mask], fim[mask], t) for t in range(0, 240))
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from dados import FORMATOS_DATAS, converter_datas, preparar_datas
+
+
+def test_converter_datas_formato_alternativo():
+    valores = pd.Series(["05-02-2018 19:48:00", "23-03-2021", "05-02-2018 19:48:00", None, "ontem", " 01-01-2020 00:30:00 "])
+    convertidas = converter_datas(valores, FORMATOS_DATAS["DHFIM"])
+    esperado = [pd.Timestamp("2018-02-05 19:48"), pd.Timestamp("2021-03-23"), pd.Timestamp("2018-02-05 19:48"), pd.NaT, pd.NaT,
+                pd.Timestamp("2020-01-01 00:30")]
+    pd.testing.assert_series_equal(convertidas, pd.Series(esperado, index=valores.index, dtype="datetime64[ns]"), check_dtype=False)
+
+
+# Cada valor contra o `to_datetime` do pandas com o primeiro formato que o converte (NaT se nenhum converter)
+def test_converter_datas_igual_ao_pandas():
+    rng = np.random.default_rng(8)
+    instantes = pd.Timestamp("2012-01-01") + pd.to_timedelta(rng.integers(0, 10 * 365 * 24 * 60, 500), unit="min")
+    textos = pd.Series(np.where(rng.random(500) < 0.2, instantes.strftime("%Y-%m-%d"), instantes.strftime("%Y-%m-%d %H:%M:%S")))
+    textos[rng.random(500) < 0.05] = "31-31-2020"
+    formatos = FORMATOS_DATAS["DHINICIO"]
+    esperado = pd.to_datetime(textos, format=formatos[0], errors="coerce").fillna(pd.to_datetime(textos, format=formatos[1], errors="coerce"))
+    pd.testing.assert_series_equal(converter_datas(textos, formatos), esperado, check_dtype=False)
+
+
+def test_converter_datas_ja_convertida():
+    datas = pd.Series(pd.to_datetime(["2017-06-17", None]))
+    assert converter_datas(datas, FORMATOS_DATAS["DHINICIO"]) is datas
+
+
+# DURACAO e HORA vêm das datas; as do CSV só ficam onde as datas faltam ou o fim é anterior ao início
+def test_preparar_datas_usa_csv_so_sem_datas_validas():
+    df = pd.DataFrame({
+        "DHINICIO": ["2017-06-17 14:00:00", "2017-06-17 14:00:00", None, "2017-06-18"],
+        "DHFIM": ["17-06-2017 16:30:00", "17-06-2017 13:00:00", "17-06-2017 16:30:00", "19-06-2017"],
+        "DURACAO": [1.0, 25.0, 40.0, 2.0],
+        "HORA": [3.0, 3.0, 7.0, 3.0],
+    })
+    df = preparar_datas(df)
+    assert df["DURACAO"].tolist() == [150.0, 25.0, 40.0, 24 * 60.0]
+    assert df["HORA"].tolist() == [14.0, 14.0, 7.0, 0.0]
+    assert pd.api.types.is_datetime64_any_dtype(df["DHINICIO"]) and pd.api.types.is_datetime64_any_dtype(df["DHFIM"])
+
+
+def test_preparar_datas_sem_duracao_no_csv():
+    df = preparar_datas(pd.DataFrame({"DHINICIO": ["2017-06-17 14:00:00", "x"], "DHFIM": ["17-06-2017 13:00:00", "x"]}))
+    assert df["DURACAO"].isna().all() and df["HORA"].iloc[0] == 14.0 and np.isnan(df["HORA"].iloc[1])
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from densidade import kde_grelha, largura_silverman, resumo_violino
+
+
+# KDE gaussiana pela soma direta dos kernels em cada ponto da grelha
+def _kde_direta(valores, grelha, largura):
+    z = (grelha[:, None] - valores[None, :]) / largura
+    return np.exp(-0.5 * z ** 2).sum(axis=1) / (len(valores) * largura * np.sqrt(2 * np.pi))
+
+
+@pytest.mark.parametrize("largura", [0.05, 0.3, 1.0])
+def test_kde_grelha_igual_a_soma_direta(largura):
+    valores = np.random.default_rng(5).normal(0, 1, 5000)
+    grelha, densidade = kde_grelha(valores, -4, 4, largura)
+    esperado = _kde_direta(valores, grelha, largura)
+    assert np.abs(densidade - esperado).max() < 1e-2 * esperado.max()
+
+
+# Cauda longa (áreas ardidas): a largura de banda é muito menor do que o intervalo e a curva continua a integrar ~1
+def test_resumo_violino_cauda_longa():
+    valores = np.random.default_rng(6).lognormal(0, 2, 20000)
+    resumo = resumo_violino(valores)
+    grelha, densidade = resumo["grelha"], resumo["densidade"]
+    dentro = (valores >= grelha[0]) & (valores <= grelha[-1])
+    assert np.trapezoid(densidade, grelha) == pytest.approx(dentro.mean(), rel=0.02)
+    esperado = _kde_direta(valores, grelha, resumo["largura_banda"])
+    assert np.abs(densidade - esperado).max() < 1e-2 * esperado.max()
+
+
+# Valores muito fora da grelha não se acumulam nas pontas: não contam para a curva, mas contam no total
+def test_kde_grelha_valores_fora():
+    valores = np.r_[np.zeros(100), np.full(100, 1e6)]
+    grelha, densidade = kde_grelha(valores, -1, 1, 0.1)
+    assert densidade[0] < 1e-6 and densidade[-1] < 1e-6
+    assert np.trapezoid(densidade, grelha) == pytest.approx(0.5, rel=1e-3)
+
+
+def test_resumo_violino_estatisticas():
+    valores = np.r_[np.arange(1.0, 101.0), np.nan, 1000.0]
+    resumo = resumo_violino(valores)
+    finitos = valores[np.isfinite(valores)]
+    assert resumo["n"] == 101
+    assert resumo["mediana"] == np.median(finitos)
+    assert resumo["max"] == 1000.0 and resumo["bigode_sup"] == 100.0
+    assert resumo["largura_banda"] == largura_silverman(finitos, resumo["q1"], resumo["q3"])
+    assert resumo_violino([np.nan]) is None
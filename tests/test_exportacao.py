@@ -0,0 +1,92 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from exportacao import ArmazemIncendios, filtrar_lote, impressao_origem, impressoes_guardadas, origem_guardada, transmitir
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(7)
+    n = 2000
+    return pd.DataFrame({
+        "ANO": rng.integers(2015, 2018, n), "MES": rng.integers(1, 13, n),
+        "DISTRITO": rng.choice(["Braga", "Porto", "Faro"], n), "CONCELHO": rng.choice(["Fafe", "Maia", "Loulé"], n),
+        "AREATOTAL": rng.gamma(1, 5, n),
+    })
+
+
+def _lotes(df, tamanho=300):
+    return [df.iloc[i:i + tamanho] for i in range(0, len(df), tamanho)]
+
+
+def _ler(formato, dados):
+    if formato == "csv":
+        return pd.read_csv(io.BytesIO(dados))
+    if formato == "parquet":
+        return pq.read_table(io.BytesIO(dados)).to_pandas()
+    return pa.ipc.open_stream(io.BytesIO(dados)).read_all().to_pandas()
+
+
+# O ficheiro transmitido em lotes é igual à concatenação dos lotes
+@pytest.mark.parametrize("formato", ["csv", "parquet", "arrow"])
+def test_transmitir_ida_e_volta(df, formato):
+    lido = _ler(formato, b"".join(transmitir(_lotes(df), formato)))
+    pd.testing.assert_frame_equal(lido, df.reset_index(drop=True), check_dtype=False)
+
+
+# Sem lotes (filtro sem resultados) o ficheiro continua válido, com as colunas do esquema
+@pytest.mark.parametrize("formato", ["csv", "parquet", "arrow"])
+def test_transmitir_sem_lotes(df, formato):
+    esquema = pa.Schema.from_pandas(df.head(0), preserve_index=False)
+    lido = _ler(formato, b"".join(transmitir([], formato, esquema=esquema, colunas=list(df.columns))))
+    assert lido.empty and list(lido.columns) == list(df.columns)
+
+
+# Lotes com tipos diferentes (inteiros num, decimais noutro) são convertidos para o esquema comum
+@pytest.mark.parametrize("formato", ["parquet", "arrow"])
+def test_transmitir_esquema_comum(formato):
+    esquema = pa.schema([("ANO", pa.int64()), ("AREATOTAL", pa.float64())])
+    lotes = [pd.DataFrame({"ANO": [2017], "AREATOTAL": [3]}), pd.DataFrame({"AREATOTAL": [0.5], "ANO": [2017]})]
+    lido = _ler(formato, b"".join(transmitir(lotes, formato, esquema=esquema)))
+    assert lido["AREATOTAL"].tolist() == [3.0, 0.5] and lido["ANO"].tolist() == [2017, 2017]
+
+
+def test_transmitir_formato_invalido():
+    with pytest.raises(ValueError):
+        list(transmitir([], "xlsx"))
+
+
+# Lotes do armazém (ficheiros Parquet por ano) contra o mesmo filtro aplicado ao DF inteiro
+@pytest.mark.parametrize("filtros", [{}, {"ano": 2016}, {"ano": 2017, "mes_val": 8, "sel_dist": "braga"}, {"sel_conc": "Maia"}])
+def test_armazem_lotes(df, tmp_path, filtros):
+    armazem = ArmazemIncendios(df, cache_dir=tmp_path)
+    lido = pd.concat(list(armazem.lotes(tamanho=100, **filtros)), ignore_index=True)
+    base = df if "ano" not in filtros else df[df["ANO"] == filtros["ano"]]
+    esperado = filtrar_lote(base, **{k: v for k, v in filtros.items() if k != "ano"})
+    esperado = esperado.sort_values(["ANO"], kind="stable").reset_index(drop=True)
+    pd.testing.assert_frame_equal(lido, esperado, check_dtype=False)
+    assert armazem.colunas() == list(df.columns) and armazem.esquema().names == list(df.columns)
+
+
+# A origem fica no manifesto; ao reescrever, só os anos alterados mudam e os que deixaram de existir saem do armazém
+def test_armazem_atualiza_anos_da_origem(df, tmp_path):
+    csv = tmp_path / "origem.csv"
+    csv.write_text("x")
+    ArmazemIncendios(df, cache_dir=tmp_path / "armazem", origem=impressao_origem([csv, tmp_path / "falta.csv"])).preparar()
+    assert origem_guardada(tmp_path / "armazem") == impressao_origem([csv])
+    antes = impressoes_guardadas(tmp_path / "armazem")
+
+    alterado = df[df["ANO"] != 2015].copy()
+    alterado.loc[alterado["ANO"] == 2017, "AREATOTAL"] += 1
+    csv.write_text("xy")
+    ArmazemIncendios(alterado, cache_dir=tmp_path / "armazem", origem=impressao_origem([csv])).preparar()
+    depois = impressoes_guardadas(tmp_path / "armazem")
+    assert sorted(depois) == [2016, 2017] and depois[2016] == antes[2016] and depois[2017] != antes[2017]
+    assert sorted(f.name for f in (tmp_path / "armazem").glob("ANO=*.parquet")) == ["ANO=2016.parquet", "ANO=2017.parquet"]
+    assert impressao_origem([csv]) is not None and origem_guardada(tmp_path / "armazem") == impressao_origem([csv])
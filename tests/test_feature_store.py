@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_store import BANDA_NUM_INCENDIOS, METEO_COLS, N_HORAS, FeatureStore, PARQUET_DISPONIVEL, perfil_horario
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(9)
+    n = 4000
+    concelhos = {"Fafe": "Braga", "Guimarães": "Braga", "Maia": "Porto", "Loulé": "Faro"}
+    concelho = rng.choice(list(concelhos), n)
+    df = pd.DataFrame({
+        "id": np.arange(n), "ANO": rng.integers(2015, 2018, n), "MES": rng.integers(1, 13, n), "DIA": rng.integers(1, 29, n),
+        "HORA": rng.integers(0, 24, n).astype(float), "AREATOTAL": rng.gamma(0.5, 20, n), "DURACAO": rng.gamma(2, 90, n),
+        "DISTRITO": [concelhos[c] for c in concelho], "CONCELHO": concelho,
+        **{col: rng.normal(20, 5, n) for col in METEO_COLS},
+    })
+    df.loc[rng.random(n) < 0.05, "HORA"] = np.nan
+    df.loc[rng.random(n) < 0.1, "DURACAO"] = np.nan
+    df.loc[rng.random(n) < 0.05, "AREATOTAL"] = np.nan
+    return df
+
+
+@pytest.fixture(params=["memoria", "disco"])
+def store(request, df, tmp_path):
+    if request.param == "disco" and not PARQUET_DISPONIVEL:
+        pytest.skip("sem pyarrow")
+    return FeatureStore(df, cache_dir=tmp_path, persistir=request.param == "disco")
+
+
+# Perfil horário calculado diretamente sobre a fatia de incêndios (média e desvio-padrão por hora com o pandas)
+def _perfil_pandas(df, metric, ano, mes_val, sel_dist, sel_conc):
+    fatia = df[df["HORA"].notna() & (df["ANO"] == ano)]
+    if mes_val:
+        fatia = fatia[fatia["MES"] == mes_val]
+    fatia = fatia[fatia["CONCELHO"] == sel_conc] if sel_conc != "Todos" else fatia[fatia["DISTRITO"] == sel_dist] if sel_dist != "Todos" else fatia
+    por_hora = fatia.groupby(fatia["HORA"].astype(int))
+    if metric == "NUM_INCENDIOS":
+        media = por_hora["id"].count()
+        return pd.DataFrame({"VALOR_MEAN": media, "VALOR_STD": media * BANDA_NUM_INCENDIOS}).reindex(range(N_HORAS)).fillna(0)
+    coluna = "AREATOTAL" if metric == "AREA_ARDIDA" else "DURACAO"
+    return pd.DataFrame({"VALOR_MEAN": por_hora[coluna].mean(), "VALOR_STD": por_hora[coluna].std(),
+                         "COUNT_FOR_STD": por_hora[coluna].count()}).reindex(range(N_HORAS)).fillna(0)
+
+
+@pytest.mark.parametrize("metric", ["NUM_INCENDIOS", "AREA_ARDIDA", "DURACAO_MEDIA"])
+@pytest.mark.parametrize("ano, mes_val, sel_dist, sel_conc", [(2016, 0, "Braga", "Todos"), (2017, 8, "braga", "Todos"),
+                                                               (2015, 0, "Todos", "Guimarães"), (2016, 3, "Todos", "Todos")])
+def test_perfil_horario_igual_ao_pandas(store, df, metric, ano, mes_val, sel_dist, sel_conc):
+    perfil = perfil_horario(store, metric, ano=ano, mes_val=mes_val, sel_dist=sel_dist, sel_conc=sel_conc)
+    esperado = _perfil_pandas(df, metric, ano, mes_val, sel_dist.title(), sel_conc)
+    assert perfil["HORA"].tolist() == list(range(N_HORAS))
+    for coluna in esperado.columns:
+        np.testing.assert_allclose(perfil[coluna].to_numpy(dtype=float), esperado[coluna].to_numpy(dtype=float), rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize("metric", ["NUM_INCENDIOS", "AREA_ARDIDA"])
+def test_perfil_horario_vazio_mantem_colunas(store, metric):
+    perfil = perfil_horario(store, metric, ano=1999)
+    assert perfil.empty and {"HORA", "VALOR_MEAN", "VALOR_STD"} <= set(perfil.columns)
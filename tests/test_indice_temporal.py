@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indice_temporal import IndiceTemporal, coluna_area_tipo
+from map_lod import coluna_tipo
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(1)
+    n = 3000
+    df = pd.DataFrame({
+        "ANO": rng.integers(2012, 2018, n), "MES": rng.integers(1, 13, n),
+        "TIPO": rng.choice(["Florestal", "Agrícola", "Urbano", "Falso Alarme"], n),
+        "DISTRITO": rng.choice(["Braga", "Porto", "Faro"], n), "CONCELHO": rng.choice(["Fafe", "Maia", "Loulé", "Tavira", None], n),
+        "LAT": rng.uniform(37, 42, n), "LON": rng.uniform(-9.5, -6, n),
+        "AREATOTAL": rng.gamma(1, 5, n), "DURACAO": rng.gamma(2, 60, n),
+    })
+    df.loc[rng.random(n) < 0.05, "LAT"] = np.nan # sem coordenadas: fora do mapa
+    df.loc[rng.random(n) < 0.1, "DURACAO"] = np.nan
+    return df
+
+
+# Somas do retângulo (anos × meses) por local, calculadas diretamente com o pandas
+def _somas_pandas(df, granularity, anos, meses):
+    base = df.dropna(subset=["LAT", "LON", granularity])
+    base = base[base["ANO"].between(*anos) & base["MES"].between(*meses)]
+    grupos = base.groupby(granularity)
+    esperado = pd.DataFrame({"N": grupos.size(), "LAT_SOMA": grupos["LAT"].sum(), "LON_SOMA": grupos["LON"].sum(),
+                             "DURACAO_SOMA_MIN": grupos["DURACAO"].sum(), "DURACAO_CONTAGEM_VALIDA": grupos["DURACAO"].count()})
+    for tipo, parte in base.groupby("TIPO"):
+        esperado[coluna_tipo(tipo)] = parte.groupby(granularity).size()
+        esperado[coluna_area_tipo(tipo)] = parte.groupby(granularity)["AREATOTAL"].sum()
+    return esperado.fillna(0.0)
+
+
+@pytest.mark.parametrize("granularity", ["DISTRITO", "CONCELHO"])
+@pytest.mark.parametrize("anos, meses", [((2012, 2017), (1, 12)), ((2014, 2016), (6, 9)), ((2013, 2013), (8, 8)), ((2016, 2030), (11, 12))])
+def test_somar_igual_ao_pandas(df, granularity, anos, meses):
+    resultado = IndiceTemporal(df).somar(granularity, anos, meses)
+    esperado = _somas_pandas(df, granularity, anos, meses)
+    resultado = resultado.loc[resultado["N"] > 0, esperado.columns]
+    pd.testing.assert_frame_equal(resultado, esperado.astype(float), check_names=False, check_like=True, rtol=1e-9)
+
+
+def test_somar_intervalo_vazio(df):
+    indice = IndiceTemporal(df)
+    assert (indice.somar("DISTRITO", (2030, 2031)).to_numpy() == 0).all()
+    assert (indice.somar("DISTRITO", (2012, 2017), (9, 6)).to_numpy() == 0).all()